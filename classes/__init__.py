@@ -0,0 +1 @@
+# lets the plugins import these as classes.mygtk, classes.point etc. - Python 2 needs this file to treat the folder as a package
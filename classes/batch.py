@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Batch v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Runs a MyGTK plugin over a list of parameter sets and a list of images, all in
+# the one gimp session - does nothing on its own. Every plugin gets a second pdb
+# procedure, its own name plus "-batch", eg. from the command line:
+#
+#   gimp -i -b '(python-fu-koch_curves-batch RUN-NONINTERACTIVE "sets.csv" "2000x2000" "out/{image}-{set}.png")' -b '(gimp-quit 0)'
+#
+# The parameter sets are either a JSON list of {variable: value} objects, or a
+# CSV file with the variable names along the top and one set per row. Anything
+# left out (or left blank) keeps the plugin's default. Colors can be "#rrggbb"
+# or [r,g,b], and dropdowns can be given the option's label instead of its
+# number. Three extra keys are allowed in each set: "name", for the output file
+# name, "seed", to make the random numbers repeatable, and "geometry", for a
+# file of lines already plotted by headless/farm.py.
+#
+# The images are files (or globs) and/or WIDTHxHEIGHT for a new blank image,
+# separated by semicolons. Each one is loaded just the once, and copied for
+# each set of parameters.
+#
+# The output pattern can use {image} (the source file name without its
+# extension, or WIDTHxHEIGHT), {set} (the set's name, or its number) and
+# {index} (counting up across the whole batch). Saving to .xcf keeps the
+# layers; anything else gets flattened first.
+#
+
+import os, re, csv, json, glob, random
+import gimpcolor
+from gimpfu import *
+from widgets import *
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+RESERVED_KEYS = ('name', 'seed', 'geometry')
+TRUE_WORDS = ('1', 'true', 'yes', 'on', 'y')
+NEW_IMAGE = re.compile(r'^\s*(\d+)\s*x\s*(\d+)\s*$', re.IGNORECASE)
+
+
+
+# a JSON or CSV file -> list of {variable: value} dictionaries, in the order they're in the file
+def read_parameter_sets(filename):
+	with open(filename, 'rb') as f:
+		if filename.lower().endswith('.csv'):
+			sets = [dict((key.strip(), value) for key, value in row.items() if key and value is not None and value.strip() != '') for row in csv.DictReader(f)]
+		else:
+			sets = json.load(f)
+			if isinstance(sets, dict):
+				sets = sets['sets'] if 'sets' in sets else [sets]
+
+	if not sets:
+		raise ValueError("No parameter sets in {}".format(filename))
+	return sets
+
+
+# "in/*.png; 1920x1080" -> [('in/a.png', 'a'), ('in/b.png', 'b'), ((1920, 1080), '1920x1080')]
+def image_sources(text):
+	sources = []
+	for item in re.split(r'[;\n]', text):
+		item = item.strip()
+		if not item:
+			continue
+
+		size = NEW_IMAGE.match(item)
+		if size:
+			sources.append(((int(size.group(1)), int(size.group(2))), '{}x{}'.format(size.group(1), size.group(2))))
+			continue
+
+		filenames = sorted(glob.glob(os.path.expanduser(item)))
+		if not filenames:
+			raise IOError("No image files match {}".format(item))
+		sources.extend((filename, os.path.splitext(os.path.basename(filename))[0]) for filename in filenames)
+
+	if not sources:
+		raise ValueError("No images given")
+	return sources
+
+
+# gimp color, FOREGROUND/BACKGROUND, "#rrggbb", [r,g,b] of 0-255 ints or of 0-1 floats -> gimp color
+def to_color(value):
+	if isinstance(value, gimpcolor.RGB):
+		return value
+	if value == FOREGROUND:
+		return pdb.gimp_context_get_foreground()
+	if value == BACKGROUND:
+		return pdb.gimp_context_get_background()
+
+	if isinstance(value, basestring):
+		value = value.strip().lstrip('#')
+		if len(value) == 3:
+			value = ''.join(c + c for c in value)
+		return gimpcolor.RGB(*[int(value[i:i+2], 16) for i in range(0, 6, 2)])
+
+	value = tuple(value)[:3]
+	if all(isinstance(c, float) and c <= 1.0 for c in value):
+		return gimpcolor.RGB(*value)
+	return gimpcolor.RGB(*[int(c) for c in value])
+
+
+# whatever came out of the JSON/CSV file -> the type the plugin's widget would have handed over
+def param_value(widget, value):
+	kind = widget['type']
+	if issubclass(kind, ColorPicker):
+		return to_color(value)
+
+	if isinstance(value, basestring):
+		value = value.strip()
+		if issubclass(kind, Toggle):
+			return value.lower() in TRUE_WORDS
+
+		if issubclass(kind, DropDown) and not re.match(r'^-?\d+$', value):
+			labels = [str(option).lower() for option in widget.get('options', ())]
+			if value.lower() not in labels:
+				raise ValueError("'{}' isn't one of the options for {}: {}".format(value, widget['variable'], ', '.join(widget.get('options', ()))))
+			return labels.index(value.lower())
+
+	if issubclass(kind, Toggle):
+		return bool(value)
+	if issubclass(kind, (IntSlider, IntEntry, DropDown)):
+		return int(float(value))
+	if issubclass(kind, Slider):
+		return float(value)
+	if issubclass(kind, Entry):
+		return str(value)
+	return value
+
+
+
+def open_source(source):
+	if isinstance(source, tuple):
+		width, height = source
+		image = pdb.gimp_image_new(width, height, RGB)
+		layer = pdb.gimp_layer_new(image, width, height, RGB_IMAGE, 'Background', 100.0, LAYER_MODE_NORMAL)
+		pdb.gimp_image_insert_layer(image, layer, None, 0)
+		pdb.gimp_drawable_fill(layer, FILL_BACKGROUND)
+		return image
+	return pdb.gimp_file_load(source, source)
+
+
+def save_image(image, filename):
+	folder = os.path.dirname(filename)
+	if folder and not os.path.isdir(folder):
+		os.makedirs(folder)
+
+	if filename.lower().endswith('.xcf'):
+		drawable = pdb.gimp_image_get_active_drawable(image)
+	else:
+		drawable = pdb.gimp_image_flatten(image)
+	pdb.gimp_file_save(image, drawable, filename, filename)
+
+
+
+# every set of parameters on (a copy of) every image, saving each result; returns how many were saved
+def run_batch(plugin, parameters, images, output):
+	if not output:
+		raise ValueError("A batch needs an output file pattern, eg. out/{image}-{set}.png")
+
+	sets = [plugin.batch_values(values) for values in read_parameter_sets(parameters)]
+	sources = image_sources(images)
+
+	saved, failed, index = 0, [], 0
+	for source, image_name in sources:
+		original = open_source(source)
+
+		for set_number, (values, name, seed) in enumerate(sets, 1):
+			index += 1
+			filename = output.format(image=image_name, set=name if name is not None else '{:03d}'.format(set_number), index='{:04d}'.format(index))
+
+			image = pdb.gimp_image_duplicate(original)
+			pdb.gimp_image_undo_disable(image)
+			drawable = pdb.gimp_image_get_active_drawable(image)
+
+			if seed is not None:
+				random.seed(seed)
+				if numpy is not None:
+					numpy.random.seed(seed)
+
+			# one bad set shouldn't lose the rest of the batch
+			pdb.gimp_context_push()
+			try:
+				plugin.run_code((image, drawable, values))
+				save_image(image, filename)
+				saved += 1
+			except Exception as e:
+				failed.append("{}: {}".format(filename, e))
+			finally:
+				pdb.gimp_context_pop()
+				pdb.gimp_image_delete(image)
+
+		pdb.gimp_image_delete(original)
+
+	if failed:
+		pdb.gimp_message("{} of {} failed:\n{}".format(len(failed), index, "\n".join(failed)))
+	return saved
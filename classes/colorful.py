@@ -71,7 +71,12 @@ class Colorful(object):
 		self.r = self.lerp(self.r, other.r, amount)
 		self.g = self.lerp(self.g, other.g, amount)
 		self.b = self.lerp(self.b, other.b, amount)
-		
+
+	# the colors from this one towards another at each amount (0 - 1), as 8 bit (r,g,b) tuples - every one worked out
+	# from this color, where blend moves this color along so each call starts from where the last one left it
+	def ramp(self, other, amounts):
+		return [tuple(int(round(self.lerp(start, end, amount) * 255.0)) for start, end in ((self.r, other.r), (self.g, other.g), (self.b, other.b))) for amount in amounts]
+
 	def lighten(self, amount):
 		white = Colorful([255,255,255, 255])
 		self.blend(white, amount)
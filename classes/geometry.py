@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Geometry v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Saves and loads the lines a plugin has plotted, so the plotting can be done
+# somewhere else (see headless/farm.py) and gimp only has to draw them - does
+# nothing on its own
+#
+# A geometry file is one line saying what it is, one line of JSON describing
+# the image and each buffer of points, then all the points as 32 bit floats -
+# plenty for pixel coords, and half the size of the doubles PointBuffer keeps.
+# (The cache keeps the doubles, so a cached plot is exactly the same as a new one.)
+#
+
+import os, sys, json, hashlib, tempfile
+from array import array
+from point import PointBuffer
+import gimp
+
+
+MAGIC = 'GEOMETRY 1'
+
+CACHE_VARIABLE = 'GIMP_PLUGIN_CACHE'	# where to keep the cache (or "off" for no cache)
+CACHE_LIMIT = 500						# files kept in each cache; the least recently used go first
+
+
+
+# info is anything JSON can hold (the image size at least); items is a list of (details, PointBuffer)
+def geometry_bytes(info, items, typecode='f'):
+	header = {
+		'info'		: info,
+		'byteorder'	: sys.byteorder,
+		'typecode'	: typecode,
+		'items'		: [dict(details, count=len(points.coords)) for details, points in items],
+	}
+	data = array(typecode)
+	for details, points in items:
+		data.extend(array(typecode, points.coords))
+	return MAGIC + "\n" + json.dumps(header) + "\n" + data.tostring()
+
+
+def read_geometry(data):
+	parts = data.split("\n", 2)
+	if len(parts) != 3 or parts[0] != MAGIC:
+		raise ValueError("Not a geometry file")
+	magic, header, data = parts
+	header = json.loads(header)
+
+	coords = array(header.get('typecode', 'f'))
+	coords.fromstring(data)
+	if header['byteorder'] != sys.byteorder:
+		coords.byteswap()
+
+	items, offset = [], 0
+	for details in header['items']:
+		count = details.pop('count')
+		items.append((details, PointBuffer(array('d', coords[offset:offset+count]))))
+		offset += count
+	if offset != len(coords):
+		raise ValueError("Geometry file has {} coords, but its items add up to {}".format(len(coords), offset))
+	return header['info'], items
+
+
+def save_geometry(filename, info, items, typecode='f'):
+	with open(filename, 'wb') as f:
+		f.write(geometry_bytes(info, items, typecode))
+
+
+def load_geometry(filename):
+	with open(filename, 'rb') as f:
+		return read_geometry(f.read())
+
+
+# the items already plotted for this run, if it's been given a geometry file to use, or None to plot them here; a file
+# that can't be read or has nothing in it is an error, not a reason to quietly plot them all over again
+def geometry_for(image, args):
+	filename = args.get('geometry')
+	if not filename:
+		return None
+
+	try:
+		info, items = load_geometry(filename)
+	except (ValueError, KeyError, TypeError) as error:
+		raise ValueError("{} isn't a geometry file that can be used: {}".format(filename, error))
+	if not items:
+		raise ValueError("{} has nothing plotted in it".format(filename))
+	if (info['width'], info['height']) != (image.width, image.height):
+		raise ValueError("{} was plotted for a {}x{} image, not {}x{}".format(filename, info['width'], info['height'], image.width, image.height))
+	return items
+
+
+
+def cache_directory(name):
+	folder = os.environ.get(CACHE_VARIABLE, '').strip()
+	if folder.lower() in ('0', 'no', 'false', 'off'):
+		return None
+	if not folder:
+		folder = os.path.join(getattr(gimp, 'directory', None) or tempfile.gettempdir(), 'plugin-cache')
+	return os.path.join(os.path.expanduser(folder), name)
+
+
+# plot() -> items, unless they're already in the cache under this key (anything JSON can hold - the settings that
+# change the geometry, and none of the ones that don't); either way the items come back the same
+def cached_geometry(name, key, plot):
+	folder = cache_directory(name)
+	if folder is None:
+		return plot()
+
+	key = json.loads(json.dumps(key, sort_keys=True))		# tuples -> lists etc, same as it'll be when loaded
+	filename = os.path.join(folder, hashlib.md5(json.dumps(key, sort_keys=True)).hexdigest() + '.geometry')
+
+	if os.path.isfile(filename):
+		try:
+			info, items = load_geometry(filename)
+			if info.get('key') == key:
+				os.utime(filename, None)							# still wanted, so keep it for longer
+				return items
+		except (IOError, OSError, ValueError, KeyError):
+			pass													# half written or from an older version; plot it again
+
+	items = plot()
+
+	# the cache is only ever a shortcut, so not being able to write it is no reason to stop
+	try:
+		if not os.path.isdir(folder):
+			os.makedirs(folder)
+		save_geometry(filename, { 'key': key }, items, 'd')
+		prune_cache(folder)
+	except (IOError, OSError):
+		pass
+	return items
+
+
+def prune_cache(folder, limit=CACHE_LIMIT):
+	files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.geometry')]
+	if len(files) > limit:
+		files.sort(key=os.path.getmtime)
+		for filename in files[:len(files) - limit]:
+			os.remove(filename)
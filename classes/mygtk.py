@@ -24,6 +24,8 @@ sys.path.append(this_directory)
 
 
 from widgets import *
+from profiler import phase, profiled
+import batch				# not "from batch import ...", as batch imports widgets, which imports this
 #from collections import OrderedDict, defaultdict
 
 import gtk, gimp, gimpui, gobject, gimpshelf
@@ -42,6 +44,22 @@ JUSTIFY_RIGHT	= gtk.JUSTIFY_RIGHT
 import logging
 
 
+# the pdb type each widget's value gets registered as (first match wins, so the int versions go before their parents)
+PARAM_TYPES = [
+	(IntSlider,		PDB_INT32),
+	(IntEntry,		PDB_INT32),
+	(Slider,		PDB_FLOAT),
+	(Entry,			PDB_STRING),
+	(ColorPicker,	PDB_COLOR),
+]
+
+def param_type(widget):
+	for kind, _type in PARAM_TYPES:
+		if issubclass(widget['type'], kind):
+			return _type
+	return PDB_INT32		# dropdowns, toggles
+
+
 class PythonFu(object):
 
 	def __init__(self, *args, **kwargs):
@@ -57,6 +75,7 @@ class PythonFu(object):
 			'widgets'			: [], # list of widget dictionaries that make up the gtk gui
 			'help_text'			: {}, # single InfoLabel widget that will be shown/hidden when the help button is clicked
 			'code_function'		: None, # the real plugin code that the gtk wrapper calls
+			'plot_function'		: None, # (optional) just the geometry part of that, for plotting outside gimp (see headless/farm.py)
 
 			'help'				: '', # (optional) short help text (else full help text)
 			'copyright'			: '', # (optional) copyright holder (else author)
@@ -73,6 +92,7 @@ class PythonFu(object):
 		#logging.warn(self)
 
 		self.proc_name = 'python-fu-' + self.title.lower().replace(' ', '_')
+		self.batch_name = self.proc_name + '-batch'
 		self.proc_type = PLUGIN
 
 		if self.help_text and not self.help:
@@ -87,6 +107,7 @@ class PythonFu(object):
 
 		self.register_params = []	# the format we need for install_procedure
 		self.param_defaults = {}	# a dictionary of key / default value for each param
+		self.param_widgets = []		# the widget behind each param, in register_params order
 		self.return_vals = []
 
 
@@ -108,15 +129,12 @@ class PythonFu(object):
 
 		# TODO: check for required fields - variable / type / label / default
 		for widget in widget_list:
-			_type = PDB_INT32
-			#if widget['type'] in (DropDown, IntSlider, Toggle):
-			#	_type = PDB_INT32
-
 			if 'variable' in widget.keys():
 				key = widget['variable']
-				_this_param = (_type, key, widget['label'])
+				_this_param = (param_type(widget), key, widget['label'])
 				self.register_params.append(_this_param)
 				self.param_defaults[key] = widget['default']
+				self.param_widgets.append(widget)
 			
 			elif 'repeats' in widget.keys():
 				repeated_widgets = []
@@ -146,13 +164,55 @@ class PythonFu(object):
 		gimp.install_procedure(self.proc_name, self.description, self.help, self.author, self.copyright, self.date, self.menu_label, self.image_types, self.proc_type, self.register_params, self.return_vals)
 		gimp.menu_register(self.proc_name, self.menu_path)
 
+		# and the batch version, which has no menu entry and is only for scripts (see batch.py)
+		batch_params = [
+			(PDB_INT32, 'run_mode', 'Run Mode'),
+			(PDB_STRING, 'parameters', 'JSON or CSV file of parameter sets'),
+			(PDB_STRING, 'images', 'Image files, globs or WIDTHxHEIGHT for new ones, separated by ;'),
+			(PDB_STRING, 'output', 'Output file pattern, eg. out/{image}-{set}.png'),
+		]
+		gimp.install_procedure(self.batch_name, self.description + ' (batch)', self.help, self.author, self.copyright, self.date, '', '', self.proc_type, batch_params, [(PDB_INT32, 'saved', 'Number of images saved')])
+
+
+	# the plugin defaults, with the color pickers' FOREGROUND/BACKGROUND turned into actual colors
+	def defaults(self):
+		values = dict(self.param_defaults)
+		for widget in self.param_widgets:
+			if issubclass(widget['type'], ColorPicker):
+				values[widget['variable']] = batch.param_value(widget, values[widget['variable']])
+		return values
+
+	# a set of values from a batch file -> (the full set of plugin values, name, seed)
+	def batch_values(self, values):
+		widgets = dict((widget['variable'], widget) for widget in self.param_widgets)
+		unknown = [key for key in values.keys() if key not in widgets and key not in batch.RESERVED_KEYS]
+		if unknown:
+			raise ValueError("{} has no setting(s) called {}".format(self.title, ', '.join(sorted(unknown))))
+
+		settings = self.defaults()
+		for key, value in values.items():
+			if key in widgets:
+				settings[key] = batch.param_value(widgets[key], value)
+		if values.get('geometry'):
+			settings['geometry'] = values['geometry']
+		seed = values.get('seed')
+		return settings, values.get('name'), int(seed) if seed is not None else None
+
 
 	def call_plugin(self, proc_name, args):
-		run_mode, image, drawable = args
+		if proc_name == self.batch_name:
+			return self.call_batch(args)
+
+		run_mode, image, drawable = args[:3]
 		
 		# load up previous settings from this gimp session
 		proc_name = 'python-fu-save--' + proc_name
-		defaults = gimpshelf.shelf[proc_name] if gimpshelf.shelf.has_key(proc_name) else self.param_defaults
+		defaults = gimpshelf.shelf[proc_name] if gimpshelf.shelf.has_key(proc_name) else self.defaults()
+
+		# or use the ones we were called with, if a script has given us them all
+		if run_mode == RUN_NONINTERACTIVE and len(args) == len(self.register_params):
+			defaults = dict(defaults)
+			defaults.update((widget['variable'], value) for widget, value in zip(self.param_widgets, args[3:]))
 
 		#logging.warn(defaults)
 		pdb.gimp_image_undo_group_start(image)
@@ -161,7 +221,7 @@ class PythonFu(object):
 
 		# replay the prior call
 		if run_mode != RUN_INTERACTIVE:
-			self.code_function((image, drawable, defaults))
+			self.run_code((image, drawable, defaults))
 
 		# or pop up the settings dialog and ask again
 		else:
@@ -178,7 +238,7 @@ class PythonFu(object):
 			for item in self.connect:
 				gui.widgets[item['key']].connect(item['signal'], getattr(gui, item['does']), item['key'], item['controls'])
 		
-			gui.set_code_to_run(self.code_function, (image, drawable, gui.vars))
+			gui.set_code_to_run(self.run_code, (image, drawable, gui.vars))
 			gui.main()
 
 
@@ -189,6 +249,17 @@ class PythonFu(object):
 		pdb.gimp_displays_flush()
 		pdb.gimp_progress_end()
 
+
+	def call_batch(self, args):
+		run_mode, parameters, images, output = args
+		saved = batch.run_batch(self, parameters, images, output)
+		return saved
+
+
+	# the plugin code itself, timed and counted if GIMP_PLUGIN_PROFILE is set (see profiler.py)
+	def run_code(self, params):
+		return profiled(self.proc_name, self.code_function, params)
+
 		
 
 
@@ -12,7 +12,15 @@
 # perlin noise from https://github.com/bradykieffer/SimplexNoise/blob/master/simplexnoise/noise.py
 #
 
-import math, random
+import math, random, hashlib
+from array import array
+from collections import OrderedDict
+
+# numpy is optional; without it the batch functions just fall back to the scalar code
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # see also https://www.redblobgames.com/articles/noise/introduction.html
 
@@ -21,7 +29,12 @@ DEFAULT_NOISE_SCALE = -1  # Check noise_scale against this
 DEFAULT_1D_NOISE_SCALE = 0.188
 DEFAULT_LACUNARITY = 2.0
 DEFAULT_GAIN = 0.65
-DEFAULT_SHUFFLES = 100
+PERMUTATION_TABLES = 1024  # how many different permutation tables the octaves pick from
+PERMUTATION_CACHE = 512  # how many of those are kept built at once (least recently used go first)
+
+def random_stream(*key):
+    """ a random.Random of its own, seeded from key - the same key always gives the same numbers, on any machine """
+    return random.Random(int(hashlib.md5(repr(key)).hexdigest()[:16], 16))
 
 def normalize(x):
     res = (1.0 + x) / 2.0
@@ -34,15 +47,48 @@ def normalize(x):
 
     return res
 
-class PerlinNoiseOctave(object):
+def normalize_batch(values):
+    """ normalize() for a whole array of noise values at once """
+    if numpy is None:
+        return [normalize(x) for x in values]
+
+    return numpy.clip((1.0 + numpy.asarray(values, dtype=numpy.float64)) / 2.0, 0, 1)
+
+class PermutationPool(object):
+    """
+        The permutation tables the octaves use, made on demand and kept for reuse. Table n is always the same
+        one shuffle of 0-255 (one shuffle is already as random as a permutation gets), doubled up to save
+        wrapping the index, as 512 bytes - plus a numpy view of those same bytes for the batch functions.
+    """
+
+    def __init__(self, limit=PERMUTATION_CACHE):
+        self.limit = limit
+        self.tables = OrderedDict()
+
+    def table(self, index):
+        """ (table, numpy view of it or None) for table number index """
+        if index in self.tables:
+            tables = self.tables.pop(index)
+        else:
+            p_supply = range(256)
+            random_stream('permutation', index).shuffle(p_supply)
+            perm = array('B', p_supply * 2)
+            tables = (perm, numpy.frombuffer(perm, dtype=numpy.uint8) if numpy is not None else None)
 
-    def __init__(self, num_shuffles=DEFAULT_SHUFFLES):
-        self.p_supply = [i for i in xrange(0, 256)]
+            while len(self.tables) >= self.limit:
+                self.tables.popitem(last=False)
 
-        for i in xrange(num_shuffles):
-            random.shuffle(self.p_supply)
+        self.tables[index] = tables  # (back) to the most recently used end
+        return tables
 
-        self.perm = self.p_supply * 2
+permutations = PermutationPool()
+
+
+class PerlinNoiseOctave(object):
+
+    def __init__(self, rng=random):
+        """ rng picks which of the pool's permutation tables this octave uses """
+        self.perm, self.perm_array = permutations.table(rng.randrange(PERMUTATION_TABLES))
 
     def noise(self, xin, noise_scale):
         ix0 = int(math.floor(xin))
@@ -58,6 +104,26 @@ class PerlinNoiseOctave(object):
 
         return noise_scale * self.lerp(s, n0, n1)
 
+    def noise_batch(self, xin, noise_scale):
+        """ noise() for a whole array of x coords at once, same results as the scalar version """
+        if numpy is None:
+            return [self.noise(x, noise_scale) for x in xin]
+
+        xin = numpy.asarray(xin, dtype=numpy.float64)
+        ix0 = numpy.floor(xin)
+        fx0 = xin - ix0
+        fx1 = fx0 - 1.0
+        ix0 = ix0.astype(numpy.int64)
+        ix1 = (ix0 + 1) & 255
+        ix0 = ix0 & 255
+
+        s = self.fade(fx0)
+
+        n0 = self.grad_batch(self.perm_array[ix0], fx0)
+        n1 = self.grad_batch(self.perm_array[ix1], fx1)
+
+        return noise_scale * self.lerp(s, n0, n1)
+
     def lerp(self, t, a, b):
         return a + t * (b - a)
 
@@ -71,6 +137,12 @@ class PerlinNoiseOctave(object):
             grad = -grad  # Add a random sign
         return grad * x
 
+    def grad_batch(self, hash, x):
+        h = hash & 15
+        grad = 1.0 + (h & 7)
+        grad = numpy.where(h & 8, -grad, grad)
+        return grad * x
+
 
 class PerlinNoise(object):
     """ 
@@ -78,7 +150,8 @@ class PerlinNoise(object):
         https://github.com/stegu/perlin-noise/blob/master/src/noise1234.c
     """
 
-    def __init__(self, num_octaves, persistence, noise_scale=DEFAULT_NOISE_SCALE):
+    def __init__(self, num_octaves, persistence, noise_scale=DEFAULT_NOISE_SCALE, rng=None):
+        """ rng: a random.Random for the octaves to pick their permutation tables with, or None for the random module """
         self.num_octaves = num_octaves
 
         if DEFAULT_NOISE_SCALE == noise_scale:
@@ -86,7 +159,7 @@ class PerlinNoise(object):
         else:
             self.noise_scale = noise_scale
 
-        self.octaves = [PerlinNoiseOctave() for i in xrange(self.num_octaves)]
+        self.octaves = [PerlinNoiseOctave(rng=rng or random) for i in xrange(self.num_octaves)]
         self.frequencies = [1.0 / pow(2, i) for i in xrange(self.num_octaves)]
         self.amplitudes = [pow(persistence, len(self.octaves) - i)
                            for i in xrange(self.num_octaves)]
@@ -119,3 +192,23 @@ class PerlinNoise(object):
 
         return sum(noise)
 
+    def fractal_batch(self, x, hgrid, lacunarity=DEFAULT_LACUNARITY, gain=DEFAULT_GAIN):
+        """ fractal() for a whole array of x coords at once - one numpy pass per octave instead of per coord """
+        if numpy is None:
+            return [self.fractal(i, hgrid, lacunarity, gain) for i in x]
+
+        x = numpy.asarray(x, dtype=numpy.float64)
+        noise = numpy.zeros(x.shape)
+        frequency = 1.0 / hgrid
+        amplitude = gain
+
+        for i in xrange(self.num_octaves):
+            noise += self.octaves[i].noise_batch(
+                xin=x * frequency,
+                noise_scale=self.noise_scale
+            ) * amplitude
+
+            frequency *= lacunarity
+            amplitude *= gain
+
+        return noise
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Noise Field v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# 2D and 3D Perlin and simplex noise, worked out for a whole image (or a tile of
+# one) at a time as numpy arrays - for glows, bark, clouds etc. that would
+# otherwise be several blurs and filters on top of each other. Does nothing on
+# its own.
+#
+# fractal() adds up octaves just like PerlinNoise.fractal does in noise.py, so
+# the same hgrid/lacunarity/gain settings give the same sort of look. Perlin
+# noise can also tile, ie. repeat every so many pixels, for seamless textures.
+#
+# see https://weber.itn.liu.se/~stegu/simplexnoise/simplexnoise.pdf for the
+# simplex noise, and https://mrl.cs.nyu.edu/~perlin/noise/ for the Perlin
+#
+
+import math, random
+from noise import permutations, PERMUTATION_TABLES, DEFAULT_LACUNARITY, DEFAULT_GAIN
+
+# numpy is NOT optional here; check AVAILABLE first
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+AVAILABLE = numpy is not None
+
+
+PERLIN = 0
+SIMPLEX = 1
+NOISE_KINDS = ('Perlin', 'Simplex')
+
+TILE_CHUNK = 1 << 20		# max pixels worked on at once by tile(), to keep memory down
+
+F2, G2 = 0.5 * (math.sqrt(3.0) - 1.0), (3.0 - math.sqrt(3.0)) / 6.0		# skewing into and out of the simplex grid
+F3, G3 = 1.0 / 3.0, 1.0 / 6.0
+SIMPLEX2_SCALE = 70.0		# brings each of them out to roughly -1 to 1
+SIMPLEX3_SCALE = 32.0
+
+# gradient directions, by (hash & 7) for 2D Perlin and (hash & 15) for 3D / (hash % 12) for simplex
+GRADIENTS_2D = ((1,1), (-1,1), (1,-1), (-1,-1), (1,0), (-1,0), (0,1), (0,-1))
+GRADIENTS_3D = ((1,1,0), (-1,1,0), (1,-1,0), (-1,-1,0), (1,0,1), (-1,0,1), (1,0,-1), (-1,0,-1),
+				(0,1,1), (0,-1,1), (0,1,-1), (0,-1,-1), (1,1,0), (0,-1,1), (-1,1,0), (0,-1,-1))
+
+if numpy is not None:
+	GRAD2 = numpy.array(GRADIENTS_2D, dtype=numpy.float32).T
+	GRAD3 = numpy.array(GRADIENTS_3D, dtype=numpy.float32).T
+
+
+
+def fade(t):
+	return t * t * t * (t * (t * 6.0 - 15.0) + 10.0)
+
+def lerp(t, a, b):
+	return a + t * (b - a)
+
+
+# coords -> (lattice cell, the next cell along, how far into the cell), with the cells wrapped every period if there is one
+def lattice(x, period=None):
+	cell = numpy.floor(x)
+	offset = (x - cell).astype(numpy.float32)			# plenty, and a lot quicker than doubles
+	cell = cell.astype(numpy.intp)
+	if period:
+		return (cell % period) & 255, ((cell + 1) % period) & 255, offset
+	return cell & 255, (cell + 1) & 255, offset
+
+
+
+class NoiseField(object):
+	def __init__(self, num_octaves, kind=PERLIN, noise_scale=1.0, rng=None):
+		''' rng: a random.Random to pick each octave's permutation table with, or None for the random module '''
+		self.num_octaves = num_octaves
+		self.kind = kind
+		self.noise_scale = noise_scale
+
+		rng = rng or random
+		self.perms = [numpy.asarray(permutations.table(rng.randrange(PERMUTATION_TABLES))[1], dtype=numpy.intp) for i in xrange(num_octaves)]
+
+
+	##### single octaves; x, y, z are arrays (or anything that broadcasts together) of lattice coords #####
+
+	def perlin2(self, perm, x, y, period=(None, None)):
+		X0, X1, xf = lattice(x, period[0])
+		Y0, Y1, yf = lattice(y, period[1])
+		u, v = fade(xf), fade(yf)
+		gx, gy = GRAD2[0][perm & 7], GRAD2[1][perm & 7]		# each hash's gradient, so it's one lookup per corner
+
+		def grad(corner, x, y):
+			return gx[corner] * x + gy[corner] * y
+
+		a, b = perm[X0], perm[X1]
+		return lerp(v,
+			lerp(u, grad(a + Y0, xf, yf), grad(b + Y0, xf - 1.0, yf)),
+			lerp(u, grad(a + Y1, xf, yf - 1.0), grad(b + Y1, xf - 1.0, yf - 1.0)))
+
+	def perlin3(self, perm, x, y, z, period=(None, None, None)):
+		X0, X1, xf = lattice(x, period[0])
+		Y0, Y1, yf = lattice(y, period[1])
+		Z0, Z1, zf = lattice(z, period[2])
+		u, v, w = fade(xf), fade(yf), fade(zf)
+		gx, gy, gz = GRAD3[0][perm & 15], GRAD3[1][perm & 15], GRAD3[2][perm & 15]
+
+		def grad(corner, x, y, z):
+			return gx[corner] * x + gy[corner] * y + gz[corner] * z
+
+		a, b = perm[X0], perm[X1]
+		aa, ab, ba, bb = perm[a + Y0], perm[a + Y1], perm[b + Y0], perm[b + Y1]
+		return lerp(w,
+			lerp(v,
+				lerp(u, grad(aa + Z0, xf, yf, zf), grad(ba + Z0, xf - 1.0, yf, zf)),
+				lerp(u, grad(ab + Z0, xf, yf - 1.0, zf), grad(bb + Z0, xf - 1.0, yf - 1.0, zf))),
+			lerp(v,
+				lerp(u, grad(aa + Z1, xf, yf, zf - 1.0), grad(ba + Z1, xf - 1.0, yf, zf - 1.0)),
+				lerp(u, grad(ab + Z1, xf, yf - 1.0, zf - 1.0), grad(bb + Z1, xf - 1.0, yf - 1.0, zf - 1.0))))
+
+	# each corner of the triangle the point is in adds (0.5 - distance^2)^4 * gradient.offset, if it's close enough
+	def simplex2(self, perm, x, y):
+		x, y = numpy.broadcast_arrays(x, y)
+		s = (x + y) * F2
+		i, j = numpy.floor(x + s), numpy.floor(y + s)
+		t = (i + j) * G2
+		x0, y0 = (x - (i - t)).astype(numpy.float32), (y - (j - t)).astype(numpy.float32)
+
+		i1 = (x0 > y0).astype(numpy.uint8)			# lower or upper triangle of the square (uint8 to keep the sums below in float32)
+		j1 = 1 - i1
+		corners = (
+			(0, 0, x0, y0),
+			(i1, j1, x0 - i1 + G2, y0 - j1 + G2),
+			(1, 1, x0 - 1.0 + 2.0 * G2, y0 - 1.0 + 2.0 * G2),
+		)
+
+		ii, jj = i.astype(numpy.intp) & 255, j.astype(numpy.intp) & 255
+		gx, gy = GRAD3[0][perm % 12], GRAD3[1][perm % 12]
+		total = numpy.zeros(x.shape, dtype=numpy.float32)
+		for di, dj, cx, cy in corners:
+			falloff = numpy.maximum(0.5 - cx * cx - cy * cy, 0.0)
+			falloff *= falloff
+			corner = ii + di + perm[jj + dj]
+			total += falloff * falloff * (gx[corner] * cx + gy[corner] * cy)
+		return SIMPLEX2_SCALE * total
+
+	def simplex3(self, perm, x, y, z):
+		x, y, z = numpy.broadcast_arrays(x, y, z)
+		s = (x + y + z) * F3
+		i, j, k = numpy.floor(x + s), numpy.floor(y + s), numpy.floor(z + s)
+		t = (i + j + k) * G3
+		x0, y0, z0 = (x - (i - t)).astype(numpy.float32), (y - (j - t)).astype(numpy.float32), (z - (k - t)).astype(numpy.float32)
+
+		# which of the six tetrahedra in the cube the point is in, from the order of x0, y0, z0
+		xy, yz, xz = x0 >= y0, y0 >= z0, x0 >= z0
+		i1 = (xy & xz).astype(numpy.uint8)
+		j1 = (~xy & yz).astype(numpy.uint8)
+		k1 = (~xz & ~yz).astype(numpy.uint8)
+		i2 = (xy | xz).astype(numpy.uint8)
+		j2 = (~xy | yz).astype(numpy.uint8)
+		k2 = (~(xz & yz)).astype(numpy.uint8)
+		corners = (
+			(0, 0, 0, x0, y0, z0),
+			(i1, j1, k1, x0 - i1 + G3, y0 - j1 + G3, z0 - k1 + G3),
+			(i2, j2, k2, x0 - i2 + 2.0 * G3, y0 - j2 + 2.0 * G3, z0 - k2 + 2.0 * G3),
+			(1, 1, 1, x0 - 1.0 + 3.0 * G3, y0 - 1.0 + 3.0 * G3, z0 - 1.0 + 3.0 * G3),
+		)
+
+		ii, jj, kk = i.astype(numpy.intp) & 255, j.astype(numpy.intp) & 255, k.astype(numpy.intp) & 255
+		gx, gy, gz = GRAD3[0][perm % 12], GRAD3[1][perm % 12], GRAD3[2][perm % 12]
+		total = numpy.zeros(x.shape, dtype=numpy.float32)
+		for di, dj, dk, cx, cy, cz in corners:
+			falloff = numpy.maximum(0.6 - cx * cx - cy * cy - cz * cz, 0.0)
+			falloff *= falloff
+			corner = ii + di + perm[jj + dj + perm[kk + dk]]
+			total += falloff * falloff * (gx[corner] * cx + gy[corner] * cy + gz[corner] * cz)
+		return SIMPLEX3_SCALE * total
+
+	def octave(self, perm, x, y, z=None, period=(None, None, None)):
+		if self.kind == SIMPLEX:
+			if any(period):
+				raise ValueError("Simplex noise can't tile; use Perlin noise for that")
+			return self.simplex2(perm, x, y) if z is None else self.simplex3(perm, x, y, z)
+		return self.perlin2(perm, x, y, period[:2]) if z is None else self.perlin3(perm, x, y, z, period)
+
+
+	##### octaves added together #####
+
+	# a period in pixels -> the period in lattice cells at this frequency, which has to be a whole number for the noise to tile
+	@staticmethod
+	def lattice_periods(period, frequency):
+		if period is None:
+			return (None, None, None)
+		if not isinstance(period, (tuple, list)):
+			period = (period, period, None)
+
+		periods = []
+		for p in tuple(period) + (None,) * (3 - len(period)):
+			if p is None:
+				periods.append(None)
+				continue
+			cells = p * frequency
+			if cells < 1 or abs(cells - round(cells)) > 1e-6:
+				raise ValueError("A period of {} pixels isn't a whole number of noise cells at frequency {} - make it a multiple of hgrid, and keep lacunarity a whole number".format(p, frequency))
+			periods.append(int(round(cells)))
+		return tuple(periods)
+
+	def fractal(self, x, y, z=None, hgrid=1.0, lacunarity=DEFAULT_LACUNARITY, gain=DEFAULT_GAIN, period=None):
+		''' PerlinNoise.fractal in 2D (or 3D with z), for whole arrays of coords at once; period is None, pixels, or (x, y[, z]) pixels '''
+		x = numpy.asarray(x, dtype=numpy.float64)
+		y = numpy.asarray(y, dtype=numpy.float64)
+		z = numpy.asarray(z, dtype=numpy.float64) if z is not None else None
+
+		noise = 0.0
+		frequency = 1.0 / hgrid
+		amplitude = gain
+
+		for perm in self.perms:
+			noise = noise + self.octave(perm, x * frequency, y * frequency, z * frequency if z is not None else None, self.lattice_periods(period, frequency)) * amplitude
+			frequency *= lacunarity
+			amplitude *= gain
+
+		return noise * self.noise_scale
+
+	def tile(self, width, height, hgrid, lacunarity=DEFAULT_LACUNARITY, gain=DEFAULT_GAIN, x=0, y=0, z=None, period=None, dtype=None):
+		''' fractal() for every pixel of a width x height tile whose top left is at x,y (and at depth z, for 3D) '''
+		noise = numpy.empty((height, width), dtype=dtype or numpy.float32)
+		xs = (x + numpy.arange(width, dtype=numpy.float64))[numpy.newaxis, :]		# a row and a column, which numpy broadcasts
+		rows = max(1, TILE_CHUNK // max(1, width))
+
+		for top in xrange(0, height, rows):
+			ys = (y + numpy.arange(top, min(height, top + rows), dtype=numpy.float64))[:, numpy.newaxis]
+			noise[top:top + len(ys)] = self.fractal(xs, ys, z, hgrid, lacunarity, gain, period)
+		return noise
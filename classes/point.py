@@ -17,8 +17,15 @@
 #
 
 import math, random
+from array import array
 from gimpfu import *
 
+# numpy is optional; PointBuffer falls back to plain python loops without it
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 
 class Point(object):
 	def __init__(self, x=0.0, y=0.0):
@@ -89,8 +96,8 @@ class Point(object):
 		self.y = self.y + ymod
 
 
-	def move_point(self, xmod, ymod):
-		xmod, ymod = random.randint(-int(xmod), int(xmod)), random.randint(-int(ymod), int(ymod))
+	def move_point(self, xmod, ymod, rng=random):
+		xmod, ymod = rng.randint(-int(xmod), int(xmod)), rng.randint(-int(ymod), int(ymod))
 		self.translate(xmod, ymod)
 		
 
@@ -105,4 +112,328 @@ class Point(object):
 		obj.y = int((self.y + other.y) / 2)
 		return obj
 
+
+
+# 2x3 affine matrices, stored flat as (a, b, c, d, e, f) where x' = a*x + b*y + c and y' = d*x + e*y + f, so that a
+# whole chain of rotations/reflections/moves can be worked out once and then applied to a PointBuffer in one go
+def affine_identity():
+	return (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+
+def affine_multiply(m, n):
+	# m applied after n
+	a1, b1, c1, d1, e1, f1 = m
+	a2, b2, c2, d2, e2, f2 = n
+	return (a1*a2 + b1*d2, a1*b2 + b1*e2, a1*c2 + b1*f2 + c1,
+			d1*a2 + e1*d2, d1*b2 + e1*e2, d1*c2 + e1*f2 + f1)
+
+def affine_translate(xmod, ymod):
+	return (1.0, 0.0, xmod, 0.0, 1.0, ymod)
+
+def affine_rotate(radians, origin=None):
+	if not origin: origin = Point()
+	c = math.cos(radians)
+	s = math.sin(radians)
+	return (c, -s, origin.x - (origin.x * c) + (origin.y * s), s, c, origin.y - (origin.x * s) - (origin.y * c))
+
+def affine_reflect_x(origin=None):
+	if not origin: origin = Point()
+	return (-1.0, 0.0, 2.0 * origin.x, 0.0, 1.0, 0.0)
+
+def affine_reflect_y(origin=None):
+	if not origin: origin = Point()
+	return (1.0, 0.0, 0.0, 0.0, -1.0, 2.0 * origin.y)
+
+
+
+# A list of points stored as one flat, contiguous float64 array - [x0,y0, x1,y1, ...] - instead of one Point
+# object per vertex. Transforms work on the whole buffer at once, and the flat array can be handed straight to
+# the pdb drawing functions.
+class PointBuffer(object):
+	def __init__(self, coords=None):
+		if numpy is not None and isinstance(coords, numpy.ndarray):
+			coords = numpy.ascontiguousarray(coords, dtype=numpy.float64).tostring() # raw bytes, much quicker than iterating
+		self.coords = array('d', coords if coords is not None else [])
+		self.padding = 0.05 # image boundary minimum distance (%)
+
+	@classmethod
+	def from_points(cls, points):
+		return cls([c for item in points for c in (item.x, item.y)])
+
+	def __str__(self):
+		return "[{0}]".format(", ".join(str(item) for item in self))
+
+	def __len__(self):
+		return len(self.coords) // 2
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			start, stop, step = index.indices(len(self))
+			if step != 1:
+				raise ValueError("PointBuffer slices can't have a step")
+			obj = PointBuffer(self.coords[start*2:stop*2])
+			obj.padding = self.padding
+			return obj
+
+		if index < 0:
+			index += len(self)
+		if index < 0 or index >= len(self):
+			raise IndexError("PointBuffer index out of range")
+		return Point(self.coords[index*2], self.coords[index*2 + 1])
+
+	def __iter__(self):
+		coords = self.coords
+		for i in xrange(0, len(coords), 2):
+			yield Point(coords[i], coords[i+1])
+
+	# NOTE list-like, so this joins the two buffers together (unlike Point.__add__)
+	def __add__(self, other):
+		obj = self.copy()
+		obj.extend(other)
+		return obj
+
+
+	def copy(self):
+		obj = PointBuffer(self.coords)
+		obj.padding = self.padding
+		return obj
+
+	def append(self, x, y):
+		self.coords.append(x)
+		self.coords.append(y)
+
+	def extend(self, other):
+		if isinstance(other, PointBuffer):
+			self.coords.extend(other.coords)
+		else:
+			self.coords.extend([c for item in other for c in (item.x, item.y)])
+
+	# every point repeated n times in a row, eg. the 3 control points per anchor that a bezier stroke wants
+	def repeat(self, n):
+		if numpy is not None and len(self):
+			return PointBuffer(numpy.repeat(self._view(), n, axis=0))
+		coords = self.coords
+		return PointBuffer([c for i in xrange(0, len(coords), 2) for c in (coords[i], coords[i+1]) * n])
+
+	def flat(self):
+		return self.coords # zero-copy, already in the [x0,y0, x1,y1, ...] order that gimp wants
+
+	def to_points(self):
+		return list(self)
+
+	# a (n,2) numpy view onto our own array, so changes made through it change the buffer in place
+	def _view(self):
+		return numpy.frombuffer(self.coords, dtype=numpy.float64).reshape(-1, 2)
+
+	# the slow path for when we don't have numpy; fn(x, y) returns the new (x, y)
+	def _map(self, fn):
+		coords = self.coords
+		self.coords = array('d', [c for i in xrange(0, len(coords), 2) for c in fn(coords[i], coords[i+1])])
+
+
+	def rotate(self, radians, origin=None):
+		if not origin: origin = Point()
+
+		c = math.cos(radians)
+		s = math.sin(radians)
+
+		if numpy is not None and len(self):
+			xy = self._view()
+			x = xy[:,0] - origin.x
+			y = xy[:,1] - origin.y
+			xy[:,0] = (x * c) - (y * s) + origin.x
+			xy[:,1] = (x * s) + (y * c) + origin.y
+		else:
+			self._map(lambda x, y: (((x - origin.x) * c) - ((y - origin.y) * s) + origin.x, ((x - origin.x) * s) + ((y - origin.y) * c) + origin.y))
+
+
+	def scale(self, factor, origin=None):
+		if not origin: origin = Point()
+		if numpy is not None and len(self):
+			xy = self._view()
+			xy[:,0] = (xy[:,0] - origin.x) * factor + origin.x
+			xy[:,1] = (xy[:,1] - origin.y) * factor + origin.y
+		else:
+			self._map(lambda x, y: ((x - origin.x) * factor + origin.x, (y - origin.y) * factor + origin.y))
+
+
+	def reflect(self, origin=None):
+		if not origin: origin = Point()
+		self.reflect_x(origin)
+		self.reflect_y(origin)
+
+	def reflect_x(self, origin=None):
+		if not origin: origin = Point()
+		if numpy is not None and len(self):
+			xy = self._view()
+			xy[:,0] = 2 * origin.x - xy[:,0]
+		else:
+			self._map(lambda x, y: (2 * origin.x - x, y))
+
+	def reflect_y(self, origin=None):
+		if not origin: origin = Point()
+		if numpy is not None and len(self):
+			xy = self._view()
+			xy[:,1] = 2 * origin.y - xy[:,1]
+		else:
+			self._map(lambda x, y: (x, 2 * origin.y - y))
+
+
+	def translate(self, xmod, ymod):
+		if numpy is not None and len(self):
+			xy = self._view()
+			xy[:,0] += xmod
+			xy[:,1] += ymod
+		else:
+			self._map(lambda x, y: (x + xmod, y + ymod))
+
+	def transform(self, matrix):
+		a, b, c, d, e, f = matrix
+		if numpy is not None and len(self):
+			xy = self._view()
+			x = xy[:,0].copy()
+			xy[:,0] = (a * x) + (b * xy[:,1]) + c
+			xy[:,1] = (d * x) + (e * xy[:,1]) + f
+		else:
+			self._map(lambda x, y: ((a * x) + (b * y) + c, (d * x) + (e * y) + f))
+
+	# drops the fractional part of every coord, same as int() does
+	def truncate(self):
+		if numpy is not None and len(self):
+			xy = self._view()
+			xy[:] = numpy.trunc(xy)
+		else:
+			self._map(lambda x, y: (int(x), int(y)))
+
+
+	def check_bounds(self, max_x, max_y):
+		padding_x, padding_y = (max_x * self.padding), (max_y * self.padding)
+		if numpy is not None and len(self):
+			xy = self._view()
+			numpy.clip(xy[:,0], 0+padding_x, max_x-padding_x, out=xy[:,0])
+			numpy.clip(xy[:,1], 0+padding_y, max_y-padding_y, out=xy[:,1])
+		else:
+			self._map(lambda x, y: (max(0+padding_x, min(max_x-padding_x, x)), max(0+padding_y, min(max_y-padding_y, y))))
+
+	# (x_min, y_min, x_max, y_max)
+	def bounds(self):
+		if not len(self):
+			raise ValueError("PointBuffer is empty")
+		if numpy is not None:
+			xy = self._view()
+			x_min, y_min = xy.min(axis=0)
+			x_max, y_max = xy.max(axis=0)
+			return float(x_min), float(y_min), float(x_max), float(y_max)
+		xs, ys = self.coords[0::2], self.coords[1::2]
+		return min(xs), min(ys), max(xs), max(ys)
+
+	# other is either a single Point or another buffer of the same length
+	def halfway_to(self, other):
+		if isinstance(other, Point):
+			other = PointBuffer([other.x, other.y] * len(self))
+		if len(other) != len(self):
+			raise ValueError("PointBuffers are different lengths")
+
+		if numpy is not None and len(self):
+			return PointBuffer(numpy.trunc((self._view() + other._view()) / 2))
+		return PointBuffer([int((a + b) / 2) for a, b in zip(self.coords, other.coords)])
+
+
+
+# An indexed vertex/edge mesh. Vertices are snapped to a 1/quantize pixel grid and hashed, so a vertex that's reached
+# from two different triangles is only stored once, and an edge is only kept once whichever way round it was added.
+# polylines() then joins the surviving edges back up into as few continuous lines as possible.
+class EdgeMesh(object):
+	def __init__(self, quantize=16):
+		self.quantize = quantize
+		self.vertices = PointBuffer()
+		self.index = {}							# quantized (x, y) -> vertex number
+		self.edges = set()						# (lower, higher) vertex numbers
+		self.added = 0							# every edge ever added, duplicates included
+
+	def __len__(self):
+		return len(self.edges)
+
+	@property
+	def duplicates(self):
+		return self.added - len(self.edges)
+
+	def vertex(self, x, y):
+		key = (int(round(x * self.quantize)), int(round(y * self.quantize)))
+		if key not in self.index:
+			self.index[key] = len(self.vertices)
+			self.vertices.append(x, y)
+		return self.index[key]
+
+	def add_edge(self, x0, y0, x1, y1):
+		self.added += 1
+		a, b = self.vertex(x0, y0), self.vertex(x1, y1)
+		if a != b:								# zero length edges don't draw anything anyway
+			self.edges.add((min(a, b), max(a, b)))
+
+	# buffer holds (start, end) pairs of points, one pair per edge
+	def add_segments(self, buffer):
+		c = buffer.coords
+		for i in xrange(0, len(c) - 3, 4):
+			self.add_edge(c[i], c[i+1], c[i+2], c[i+3])
+
+	# the reverse of the above - every edge as a (start, end) pair of points
+	def segments(self):
+		v = self.vertices.coords
+		return PointBuffer([c for a, b in self.edges for c in (v[a*2], v[a*2+1], v[b*2], v[b*2+1])])
+
+
+	# Splits the edges into the fewest continuous lines: every odd-degree vertex gets linked to one extra, virtual vertex
+	# so that every vertex is even, then a Hierholzer walk finds a closed circuit around each connected part, and
+	# cutting those circuits wherever they use a virtual edge leaves one open line per pair of odd vertices.
+	def polylines(self):
+		edges = list(self.edges)
+		adjacent = {}
+		for eid, (a, b) in enumerate(edges):
+			adjacent.setdefault(a, []).append((b, eid))
+			adjacent.setdefault(b, []).append((a, eid))
+
+		real = len(edges)
+		virtual = -1
+		odd = [v for v, links in adjacent.iteritems() if len(links) % 2]
+		for v in odd:
+			edges.append((virtual, v))
+			adjacent.setdefault(virtual, []).append((v, len(edges)-1))
+			adjacent[v].append((virtual, len(edges)-1))
+
+		used = [False] * len(edges)
+		lines = []
+
+		starts = ([virtual] if odd else []) + list(adjacent.keys())
+		for start in starts:
+			if not adjacent.get(start):
+				continue
+
+			# iterative Hierholzer; circuit ends up as [(vertex, edge to the next vertex along), ...]
+			stack = [(start, None)]
+			circuit = []
+			while stack:
+				v = stack[-1][0]
+				links = adjacent[v]
+				while links and used[links[-1][1]]:
+					links.pop()
+				if links:
+					u, eid = links.pop()
+					used[eid] = True
+					stack.append((u, eid))
+				else:
+					circuit.append(stack.pop())
+
+			line = [circuit[0][0]]
+			for k in xrange(len(circuit) - 1):
+				eid = circuit[k][1]
+				if eid >= real:					# virtual, so this line ends here
+					lines.append(line)
+					line = [circuit[k+1][0]]
+				else:
+					line.append(circuit[k+1][0])
+			lines.append(line)
+
+		v = self.vertices.coords
+		return [PointBuffer([c for i in line for c in (v[i*2], v[i*2+1])]) for line in lines if len(line) > 1 and virtual not in line]
+
 pass
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Profiler v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Counts and times every pdb call a plugin makes, split into phases, and writes
+# it all out once the plugin has finished - does nothing on its own, and nothing
+# at all unless GIMP_PLUGIN_PROFILE is set before gimp starts, eg.
+#
+#   GIMP_PLUGIN_PROFILE=1						appends a line of JSON per run to gimpfu_profile.jsonl
+#   GIMP_PLUGIN_PROFILE=/tmp/runs.jsonl		appends a line of JSON per run to that file instead
+#   GIMP_PLUGIN_PROFILE=/tmp/lightning.json	writes a chrome://tracing (or Perfetto) trace of the last run
+#
+# Phases start by themselves whenever the plugin changes the progress bar text,
+# and plugin code can mark out its own with:
+#
+#   with phase('plot'):
+#       ...
+#
+
+import os, sys, json, time
+import gimp
+
+plugin_directory = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + os.sep
+
+PROFILE_VARIABLE = 'GIMP_PLUGIN_PROFILE'
+DEFAULT_PROFILE = plugin_directory + 'gimpfu_profile.jsonl'		# next to gimpfu_debug.txt
+MAX_TRACE_EVENTS = 500000		# a deep koch curve can make millions of calls, which no trace viewer wants to load
+
+_active = None					# the Profiler for the run in progress, if any
+
+
+
+# where to write the profile (and so whether to profile at all)
+def profile_file():
+	value = os.environ.get(PROFILE_VARIABLE, '').strip()
+	if value.lower() in ('', '0', 'no', 'false', 'off'):
+		return None
+	if value.lower() in ('1', 'yes', 'true', 'on'):
+		return DEFAULT_PROFILE
+	return os.path.expanduser(value)
+
+
+# marks out a phase of the plugin's own choosing; costs nothing when not profiling
+class phase(object):
+	def __init__(self, name):
+		self.name = name
+
+	def __enter__(self):
+		if _active is not None:
+			_active.push(self.name)
+		return self
+
+	def __exit__(self, *exc_info):
+		if _active is not None:
+			_active.pop(self.name)
+		return False
+
+
+# runs code_function(params) under the profiler if one's been asked for, or just runs it if not
+def profiled(proc_name, code_function, params):
+	filename = profile_file()
+	if filename is None:
+		return code_function(params)
+
+	profiler = Profiler(proc_name, filename)
+	profiler.start()
+	try:
+		return code_function(params)
+	except Exception as e:
+		profiler.error = "{}: {}".format(e.__class__.__name__, e)
+		raise
+	finally:
+		profiler.stop()
+		try:
+			profiler.write()
+		except (IOError, OSError) as e:
+			sys.stderr.write("Couldn't write the profile to {}: {}\n".format(filename, e))
+
+
+
+# stands in for gimp.pdb; every procedure looked up through it comes back wrapped so the call gets timed
+class ProfiledPdb(object):
+	def __init__(self, pdb, profiler):
+		self._pdb = pdb
+		self._profiler = profiler
+		self._wrapped = {}
+
+	def _wrap(self, name, procedure):
+		if name not in self._wrapped:
+			proc_name = name.replace('_', '-')
+			profiler = self._profiler
+
+			def call(*args, **kwargs):
+				return profiler.call(proc_name, procedure, args, kwargs)
+			self._wrapped[name] = call
+		return self._wrapped[name]
+
+	def __getattr__(self, name):
+		procedure = getattr(self._pdb, name)
+		if not callable(procedure):
+			return procedure
+		return self._wrap(name, procedure)
+
+	def __getitem__(self, proc_name):
+		return self._wrap(proc_name.replace('-', '_'), self._pdb[proc_name])
+
+
+
+class Profiler(object):
+	def __init__(self, proc_name, filename):
+		self.proc_name = proc_name
+		self.filename = filename
+		self.error = None
+
+		self.procedures = {}		# proc_name: [calls, seconds]
+		self.phases = []			# in the order they started
+		self.stack = []				# the phases open right now, innermost last
+		self.events = []			# (name, category, started, seconds, depth) for the trace
+		self.dropped_events = 0
+		self.trace = filename.lower().endswith('.json')
+
+		self.pdb = None
+		self.replaced = []			# modules that got pointed at our pdb
+
+
+	##### starting and stopping #####
+
+	# swaps our pdb in for the real one everywhere it's been imported to - gimp.pdb, gimpfu.pdb, the plugin's own
+	# module, all the classes etc. - so nothing needs changing to be profiled
+	def start(self):
+		global _active
+		real_pdb = gimp.pdb
+		self.pdb = ProfiledPdb(real_pdb, self)
+
+		for module in list(sys.modules.values()):
+			if module is not None and getattr(module, 'pdb', None) is real_pdb:
+				module.pdb = self.pdb
+				self.replaced.append(module)
+
+		self.started = time.time()
+		self.cpu_started = time.clock()
+		self.push('run')
+		_active = self
+
+	def stop(self):
+		global _active
+		now = time.time()
+		while self.stack:
+			self.end(self.stack.pop(), now)
+		self.seconds = now - self.started
+		self.cpu_seconds = time.clock() - self.cpu_started
+
+		for module in self.replaced:
+			module.pdb = self.pdb._pdb
+		self.replaced = []
+		_active = None
+
+
+	##### phases #####
+
+	def push(self, name, auto=False):
+		record = {
+			'name'		: name,
+			'started'	: time.time() - self.started,
+			'seconds'	: 0.0,
+			'calls'		: 0,
+			'pdb_seconds' : 0.0,
+			'procedures' : {},
+			'depth'		: len(self.stack),
+			'auto'		: auto,
+		}
+		self.phases.append(record)
+		self.stack.append(record)
+
+	def pop(self, name=None):
+		now = time.time()
+		# close anything the plugin opened inside this phase and forgot about (ie. progress text phases)
+		while len(self.stack) > 1:
+			record = self.stack.pop()
+			self.end(record, now)
+			if name is None or record['name'] == name:
+				break
+
+	def end(self, record, now):
+		record['seconds'] = now - self.started - record['started']
+		self.add_event(record['name'], 'phase', record['started'], record['seconds'], record['depth'])
+
+	# the progress bar text is the plugin saying what it's up to, so a new bit of text is a new phase - replacing the
+	# last one of those, but inside any the plugin's marked out itself
+	def progress_text(self, text):
+		name = (text or '').strip().rstrip('.').strip()
+		if not name:
+			return
+		top = self.stack[-1]
+		if top['auto']:
+			if top['name'] == name:
+				return
+			self.end(self.stack.pop(), time.time())
+		self.push(name, auto=True)
+
+
+	##### pdb calls #####
+
+	def call(self, proc_name, procedure, args, kwargs):
+		if proc_name in ('gimp-progress-init', 'gimp-progress-set-text') and args:
+			self.progress_text(args[0])
+
+		started = time.time()
+		try:
+			return procedure(*args, **kwargs)
+		finally:
+			seconds = time.time() - started
+
+			stats = self.procedures.setdefault(proc_name, [0, 0.0])
+			stats[0] += 1
+			stats[1] += seconds
+
+			record = self.stack[-1]
+			record['calls'] += 1
+			record['pdb_seconds'] += seconds
+			stats = record['procedures'].setdefault(proc_name, [0, 0.0])
+			stats[0] += 1
+			stats[1] += seconds
+
+			if self.trace:
+				self.add_event(proc_name, 'pdb', started - self.started, seconds, len(self.stack))
+
+	def add_event(self, name, category, started, seconds, depth):
+		if len(self.events) < MAX_TRACE_EVENTS:
+			self.events.append((name, category, started, seconds, depth))
+		else:
+			self.dropped_events += 1
+
+
+	##### output #####
+
+	@staticmethod
+	def procedure_table(procedures):
+		rows = sorted(procedures.items(), key=lambda item: -item[1][1])		# slowest first
+		return [{ 'procedure': name, 'calls': calls, 'seconds': round(seconds, 6) } for name, (calls, seconds) in rows]
+
+	def as_dict(self):
+		return {
+			'plugin'		: self.proc_name,
+			'date'			: time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+			'seconds'		: round(self.seconds, 6),
+			'cpu_seconds'	: round(self.cpu_seconds, 6),
+			'calls'			: sum(calls for calls, seconds in self.procedures.values()),
+			'pdb_seconds'	: round(sum(seconds for calls, seconds in self.procedures.values()), 6),
+			'error'			: self.error,
+			'procedures'	: self.procedure_table(self.procedures),
+			'phases'		: [{
+				'name'			: record['name'],
+				'depth'			: record['depth'],
+				'started'		: round(record['started'], 6),
+				'seconds'		: round(record['seconds'], 6),
+				'calls'			: record['calls'],
+				'pdb_seconds'	: round(record['pdb_seconds'], 6),
+				'procedures'	: self.procedure_table(record['procedures']),
+			} for record in self.phases],
+		}
+
+	# chrome's trace event format; phases and pdb calls as nested slices on the one thread
+	def as_trace(self):
+		events = [{ 'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': { 'name': self.proc_name } }]
+		for name, category, started, seconds, depth in sorted(self.events, key=lambda e: (e[2], e[4])):
+			events.append({ 'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': started * 1e6, 'dur': seconds * 1e6 })
+
+		summary = self.as_dict()
+		del summary['phases']
+		summary['dropped_events'] = self.dropped_events
+		return { 'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': summary }
+
+	def write(self):
+		if self.trace:
+			with open(self.filename, 'w') as f:
+				json.dump(self.as_trace(), f)
+		else:
+			with open(self.filename, 'a') as f:
+				f.write(json.dumps(self.as_dict(), sort_keys=True) + "\n")
+
+
+	pass
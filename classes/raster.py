@@ -0,0 +1,508 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Raster v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Draws lines into a numpy array instead of asking gimp's paint tools to do it,
+# then hands the finished pixels over in one go - does nothing on its own
+#
+
+import math
+from gimpfu import *
+
+# numpy is NOT optional here, but the plugins check AVAILABLE and carry on with gimp's own tools without it
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+AVAILABLE = numpy is not None
+
+
+# which backend the plugins draw with
+DRAW_WITH_GIMP = 0
+DRAW_WITH_RASTER = 1
+RENDERERS = ('GIMP Paint Tools', 'Local Rasterizer')
+
+PAIR_CHUNK = 1 << 17		# max segment/tile pairs worked on at once when finding a stroke's coverage, to keep memory down
+COVERAGE_TILE = 32			# biggest tile (a power of 2) a stroke's coverage is worked out in, before splitting them
+RADIUS_TO_SIGMA = 0.32		# plug_in_gauss blur radius -> gaussian standard deviation, as gimp 2.10 converts it
+ZOOM_LENGTH = 256.0			# plug_in_mblur zoom length -> gegl's zoom factor (1.0 being all the way to the centre)
+ZOOM_SAMPLES = 16			# samples along each pixel's line for a zoom blur
+TRANSPARENT = 0.5 / 255		# any less alpha than this would round to nothing in an 8 bit layer
+LINEAR_STEPS = 1 << 16		# steps in the srgb <-> linear light lookup tables
+
+
+# should this run use the rasterizer? (and tell the user why not if they asked for it but can't have it)
+def use_raster(renderer):
+	if renderer != DRAW_WITH_RASTER:
+		return False
+	if not AVAILABLE:
+		pdb.gimp_message("The local rasterizer needs NumPy, which GIMP's Python doesn't have - using GIMP's paint tools instead.")
+		return False
+	return True
+
+
+# a flat [x0,y0, x1,y1, ...] list, array or PointBuffer -> numpy array
+def as_array(coords):
+	coords = getattr(coords, 'coords', coords)				# PointBuffer
+	return numpy.asarray(coords, dtype=numpy.float64).ravel()
+
+
+# gimpcolor.RGB, a (r,g,b[,a]) tuple of 0-255 ints, or of 0-1 floats -> (r,g,b) floats
+def to_rgb(color):
+	if hasattr(color, 'r'):
+		return (float(color.r), float(color.g), float(color.b))
+	rgb = [float(c) for c in tuple(color)[:3]]
+	if any(c > 1.0 for c in rgb) or all(isinstance(c, int) for c in tuple(color)[:3]):
+		rgb = [c / 255.0 for c in rgb]
+	return tuple(rgb)
+
+
+# the x_min, y_min, x_max, y_max of a list of flat [x0,y0, x1,y1, ...] coord lists (or PointBuffers), or None if
+# there aren't any coords at all - works without numpy too
+def lines_bounds(strokes):
+	boxes = []
+	for coords in strokes:
+		if hasattr(coords, 'bounds'):
+			if len(coords):
+				boxes.append(coords.bounds())
+		elif len(coords) >= 2:
+			if numpy is not None:
+				xy = as_array(coords).reshape(-1, 2)
+				boxes.append(tuple(xy.min(axis=0)) + tuple(xy.max(axis=0)))
+			else:
+				boxes.append((min(coords[0::2]), min(coords[1::2]), max(coords[0::2]), max(coords[1::2])))
+	if not boxes:
+		return None
+	return min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes)
+
+
+# x_min, y_min, x_max, y_max of some lines -> left, top, width, height of a layer holding them with margin pixels to
+# spare (for the brush, and any blurs to come), kept inside the image and at least a pixel big
+def layer_bounds(image, bounds, margin=0):
+	x_min, y_min, x_max, y_max = bounds
+	left = min(image.width - 1, max(0, int(math.floor(x_min)) - margin))
+	top = min(image.height - 1, max(0, int(math.floor(y_min)) - margin))
+	right = max(left + 1, min(image.width, int(math.ceil(x_max)) + margin + 1))
+	bottom = max(top + 1, min(image.height, int(math.ceil(y_max)) + margin + 1))
+	return left, top, right - left, bottom - top
+
+
+# a new transparent layer covering just those bounds, rather than the whole image (which is what None gets)
+def new_layer(image, name, bounds=None, parent=None, position=0, opacity=100.0, mode=LAYER_MODE_NORMAL):
+	left, top, width, height = bounds or (0, 0, image.width, image.height)
+	layer_type = RGBA_IMAGE if image.base_type == RGB else GRAYA_IMAGE
+	layer = pdb.gimp_layer_new(image, width, height, layer_type, name, opacity, mode)
+	pdb.gimp_image_insert_layer(image, layer, parent, position)
+	if left or top:
+		layer.set_offsets(left, top)
+	return layer
+
+
+# flat image coords -> coords on a layer offset by x,y, which is what gimp's paint tools want
+def layer_coords(coords, x, y):
+	if not x and not y:
+		return coords
+	return [c - (x, y)[i & 1] for i, c in enumerate(coords)]
+
+
+# where plug_in_whirl_pinch (with no whirl) takes each pixel of a width x height layer from; x,y are arrays of image
+# coords - see gegl's whirl-pinch
+def pinch_map(x, y, width, height, pinch, radius):
+	cx, cy = width / 2.0, height / 2.0
+	scale_x, scale_y = (cy / cx, 1.0) if cx < cy else (1.0, cx / cy)
+	radius2 = (max(cx, cy) * radius) ** 2
+
+	dx, dy = (x - cx) * scale_x, (y - cy) * scale_y
+	d = dx * dx + dy * dy
+	distance = numpy.sqrt(numpy.minimum(d / radius2, 1.0))
+	factor = numpy.where(d < radius2, numpy.power(numpy.maximum(numpy.sin(math.pi / 2 * distance), 1e-9), -pinch), 1.0)
+	return cx + dx * factor / scale_x, cy + dy * factor / scale_y
+
+
+# 0-1 srgb colors <-> linear light, which gimp 2.10 composites layers in - looked up, as the powers take twice as long
+def linear_tables(steps):
+	values = numpy.linspace(0, 1, steps + 1)
+	to = numpy.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+	back = numpy.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+	return to.astype(numpy.float32), back.astype(numpy.float32)
+
+LINEAR_TABLES = linear_tables(LINEAR_STEPS) if numpy is not None else None
+
+def to_linear(values):
+	return LINEAR_TABLES[0].take(numpy.rint(values * LINEAR_STEPS).astype(numpy.intp), mode='clip')
+
+def from_linear(values):
+	return LINEAR_TABLES[1].take(numpy.rint(values * LINEAR_STEPS).astype(numpy.intp), mode='clip')
+
+
+# gimp's hard light blend of straight srgb colors (arrays, or single colors)
+def hard_light(upper, lower):
+	return numpy.where(upper <= 0.5, 2.0 * upper * lower, 1.0 - 2.0 * (1.0 - upper) * (1.0 - lower))
+
+# gimp_drawable_brightness_contrast (ie. gimp's brightness-contrast operation) of straight srgb colors - its brightness
+# only goes half way, so -1 to 1 moves the colors up to half of the range
+def brightness_contrast_colors(rgb, brightness, contrast):
+	brightness /= 2.0
+	if brightness < 0:
+		rgb = rgb * (1.0 + brightness)
+	else:
+		rgb = rgb + (1.0 - rgb) * brightness
+	slant = math.tan((contrast + 1.0) * math.pi / 4)
+	return numpy.clip((rgb - 0.5) * slant + 0.5, 0, 1)
+
+
+# where each run of pairs in the same tile starts, for pairs kept in runs like that
+def tile_starts(tx, ty):
+	return numpy.nonzero(numpy.concatenate(([True], (tx[1:] != tx[:-1]) | (ty[1:] != ty[:-1]))))[0]
+
+
+class Raster(object):
+	def __init__(self, width, height, offset_x=0, offset_y=0):
+		self.width, self.height = max(1, int(width)), max(1, int(height))
+		self.offsets = (int(offset_x), int(offset_y))				# where the top left of this buffer sits in the image
+		self.pixels = numpy.zeros((self.height, self.width, 4), dtype=numpy.float32)	# premultiplied rgba, 0-1
+
+	# left, top, right, bottom of the part that isn't transparent (in buffer coords), or None if it all is
+	def bounds(self):
+		alpha = self.pixels[:,:,3] > TRANSPARENT
+		rows = numpy.nonzero(alpha.any(axis=1))[0]
+		if not len(rows):
+			return None
+		columns = numpy.nonzero(alpha.any(axis=0))[0]
+		return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+
+	# Anti-aliased coverage of a stroke along some line segments, as a distance field worked out a tile at a time. Each
+	# segment starts off paired with every coarse tile near it; a pair's distance from the tile's centre bounds how much
+	# the segment can cover anywhere in the tile, so tiles something certainly covers are filled in whole, pairs that
+	# can't beat another in their tile are dropped, and what's left is split into quarters - down to single pixels that
+	# get their exact distance to the few segments still in the running. The pixels in the middle of a wide stroke cost
+	# next to nothing, and the work follows the stroke's edges rather than the number of segments or their length.
+	# segments is an (n,4) array of x0,y0,x1,y1 image coords; width is a brush size, or an (n,2) array of start/end
+	# sizes to taper each segment from one to the other; alpha is None or an (n,2) array of start/end opacities.
+	# Coords are in gimp's terms, ie. pixel x covers x to x+1. Returns (mask, x, y) where x,y is the mask's top left.
+	def coverage(self, segments, width, alpha=None):
+		segments = numpy.asarray(segments, dtype=numpy.float64).reshape(-1, 4)
+		width = numpy.asarray(width, dtype=numpy.float64)
+		if width.ndim:
+			radii = numpy.maximum(0.5, width.reshape(-1, 2) / 2.0)
+		else:
+			radii = numpy.empty((len(segments), 2))
+			radii.fill(max(0.5, float(width) / 2.0))
+
+		x0 = segments[:,0] - self.offsets[0] - 0.5			# pixel centres are at +0.5
+		y0 = segments[:,1] - self.offsets[1] - 0.5
+		dx = segments[:,2] - segments[:,0]
+		dy = segments[:,3] - segments[:,1]
+		length2 = numpy.maximum(dx*dx + dy*dy, 1e-12)
+		length = numpy.sqrt(length2)
+		high = radii.max(axis=1)
+
+		# only need a mask as big as the segments (plus brush) cover
+		x_min, x_max = numpy.minimum(x0, x0 + dx) - high - 1, numpy.maximum(x0, x0 + dx) + high + 1
+		y_min, y_max = numpy.minimum(y0, y0 + dy) - high - 1, numpy.maximum(y0, y0 + dy) + high + 1
+		left, top = max(0, int(math.floor(x_min.min()))), max(0, int(math.floor(y_min.min())))
+		right, bottom = min(self.width, int(math.ceil(x_max.max())) + 1), min(self.height, int(math.ceil(y_max.max())) + 1)
+		if right <= left or bottom <= top:
+			return None, 0, 0
+
+		# worked on a whole number of the biggest tiles, cut back to size at the end
+		size = COVERAGE_TILE
+		rows, columns = -(-(bottom - top) // size), -(-(right - left) // size)
+		field = numpy.zeros((rows * size, columns * size), dtype=numpy.float32)
+
+		# every tile in each segment's box
+		tx0 = numpy.clip(numpy.floor((x_min - left) / size), 0, columns - 1).astype(numpy.int64)
+		tx1 = numpy.clip(numpy.floor((x_max - left) / size), -1, columns - 1).astype(numpy.int64)
+		ty0 = numpy.clip(numpy.floor((y_min - top) / size), 0, rows - 1).astype(numpy.int64)
+		ty1 = numpy.clip(numpy.floor((y_max - top) / size), -1, rows - 1).astype(numpy.int64)
+		across, down = numpy.maximum(0, tx1 - tx0 + 1), numpy.maximum(0, ty1 - ty0 + 1)
+		counts = across * down
+		seg = numpy.repeat(numpy.arange(len(segments)), counts)
+		step = numpy.arange(len(seg)) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+		tx, ty = tx0[seg] + step % across[seg], ty0[seg] + step // across[seg]
+
+		# kept in runs of the same tile from here on, so the best in each is one reduceat - and as no tile cares about any
+		# other, worked through a bit at a time to keep memory down
+		order = numpy.argsort(ty * columns + tx, kind='mergesort')
+		pending = [(seg[order], tx[order], ty[order], size)]
+		while pending:
+			seg, tx, ty, size = pending.pop()
+			start = tile_starts(tx, ty)
+			if len(seg) > PAIR_CHUNK and len(start) > 1:
+				cut = start[min(len(start) - 1, max(1, numpy.searchsorted(start, len(seg) // 2)))]
+				pending += [(seg[cut:], tx[cut:], ty[cut:], size), (seg[:cut], tx[:cut], ty[:cut], size)]
+				continue
+
+			centre = (size - 1) / 2.0
+			px, py = left + tx * size + centre, top + ty * size + centre
+			ax, ay, sdx, sdy = x0[seg], y0[seg], dx[seg], dy[seg]
+			along = numpy.clip(((px - ax) * sdx + (py - ay) * sdy) / length2[seg], 0, 1)
+			distance = numpy.hypot(px - (ax + sdx * along), py - (ay + sdy * along))
+			if size == 1:
+				value = numpy.clip(radii[seg,0] + (radii[seg,1] - radii[seg,0]) * along + 0.5 - distance, 0, 1)
+				if alpha is not None:
+					value *= alpha[seg,0] + (alpha[seg,1] - alpha[seg,0]) * along
+
+				# max (not sum) of every segment reaching a pixel, so overlapping segments don't build up
+				field[ty[start], tx[start]] = numpy.maximum.reduceat(value, start)
+				continue
+
+			# the least and most the segment covers anywhere in the tile (none of whose pixels is further than spread from
+			# its centre, nor any further along the segment), and the best least in each tile
+			spread = centre * math.sqrt(2.0)
+			slack = spread / length[seg]
+			ends = numpy.clip(along - slack, 0, 1), numpy.clip(along + slack, 0, 1)
+			r0, r1 = [radii[seg,0] + (radii[seg,1] - radii[seg,0]) * t for t in ends]
+			most = numpy.clip(numpy.maximum(r0, r1) + 0.5 - (distance - spread), 0, 1)
+			least = numpy.clip(numpy.minimum(r0, r1) + 0.5 - (distance + spread), 0, 1)
+			if alpha is not None:
+				a0, a1 = [alpha[seg,0] + (alpha[seg,1] - alpha[seg,0]) * t for t in ends]
+				most *= numpy.maximum(a0, a1)
+				least *= numpy.minimum(a0, a1)
+			best = numpy.maximum.reduceat(least, start)
+
+			full = best >= 1.0
+			if full.any():
+				view = field.reshape(field.shape[0] // size, size, field.shape[1] // size, size)
+				view[ty[start[full]], :, tx[start[full]], :] = 1.0
+
+			best = numpy.repeat(best, numpy.diff(numpy.append(start, len(seg))))
+			keep = (most > 0) & (most >= best) & (best < 1.0)
+			seg, tx, ty = seg[keep], tx[keep], ty[keep]
+			if not len(seg):
+				continue
+
+			# split each tile in four, with all of its pairs in the top left quarter, then all in the top right, etc.
+			start = tile_starts(tx, ty)
+			runs = numpy.diff(numpy.append(start, len(seg)))
+			offset = numpy.repeat(start * 3, runs) + numpy.arange(len(seg))
+			run = numpy.repeat(runs, runs)
+			quarters = [numpy.empty(len(seg) * 4, dtype=numpy.int64) for _ in xrange(3)]
+			for i, (x, y) in enumerate(((0, 0), (1, 0), (0, 1), (1, 1))):
+				at = offset + run * i
+				quarters[0][at], quarters[1][at], quarters[2][at] = seg, tx * 2 + x, ty * 2 + y
+			pending.append(tuple(quarters) + (size // 2,))
+
+		return field[:bottom - top, :right - left], left, top
+
+
+	# paints color over whatever's already in the buffer, mask deep
+	def composite(self, mask, x, y, color, opacity=1.0):
+		if mask is None:
+			return
+		r, g, b = to_rgb(color)
+		a = (mask * float(opacity))[:,:,None]
+		area = self.pixels[y:y+mask.shape[0], x:x+mask.shape[1]]
+		area *= (1.0 - a)
+		area += a * numpy.array([r, g, b, 1.0], dtype=numpy.float32)
+
+
+	# segments as a flat [x0,y0, x1,y1, ...] list (or PointBuffer) of start/end pairs; width can also be an (n,2) array
+	# of start/end sizes, one row per segment, for tapered segments (round ended, so they join up without notches)
+	def draw_segments(self, coords, color, width=1.0, opacity=1.0):
+		coords = as_array(coords)
+		if len(coords) < 4:
+			return
+		mask, x, y = self.coverage(coords.reshape(-1, 4), width)
+		self.composite(mask, x, y, color, opacity)
+
+	# one continuous line through a flat [x0,y0, x1,y1, ...] list (or PointBuffer); fade=True takes the opacity
+	# from full at the start down to nothing at the end
+	def draw_polyline(self, coords, color, width=1.0, opacity=1.0, fade=False):
+		xy = as_array(coords).reshape(-1, 2)
+		if len(xy) < 2:
+			return
+		segments = numpy.column_stack((xy[:-1], xy[1:]))
+
+		alpha = None
+		if fade:
+			steps = 1.0 - numpy.arange(len(xy)) / float(len(xy))
+			alpha = numpy.column_stack((steps[:-1], steps[1:]))
+
+		mask, x, y = self.coverage(segments, width, alpha)
+		self.composite(mask, x, y, color, opacity)
+
+
+	# top over this buffer, as gimp_image_merge_down does it with top's layer mode (normal or hard light) - gimp 2.10
+	# composites in linear light, a normal layer as the union of the two and a hard light one clipped to what's already
+	# below it, with the hard light blend itself done on the srgb colors; both buffers must be the same area
+	def merge(self, top, mode=LAYER_MODE_NORMAL, opacity=1.0):
+		top_alpha = top.pixels[:,:,3:4] * float(opacity)
+		alpha = self.pixels[:,:,3:4]
+		upper, lower = top.straight(), self.straight()
+
+		if mode == LAYER_MODE_HARDLIGHT:
+			blend = hard_light(upper, lower)
+			lower = to_linear(lower)
+			rgb = lower + (to_linear(blend) - lower) * top_alpha
+		else:
+			rgb = to_linear(upper) * top_alpha + to_linear(lower) * alpha * (1.0 - top_alpha)
+			alpha = top_alpha + alpha * (1.0 - top_alpha)
+			rgb /= numpy.maximum(alpha, 1e-6)
+
+		self.pixels[:,:,:3] = from_linear(rgb) * alpha
+		self.pixels[:,:,3:4] = alpha
+
+	# fills this buffer with layers that are each the one color (coverage masks the size of this buffer, and their
+	# colors) merged down in turn from the first, with modes[i] being the mode of what's above layer i+1 - the same as
+	# composite and merge would do, but only the colors need making linear rather than every pixel of every layer. Only
+	# the first merge can be hard light, while what's above is still the one color
+	def merge_colors(self, masks, colors, modes):
+		alpha = masks[0][:,:,None]
+		upper = numpy.asarray(to_rgb(colors[0]), dtype=numpy.float32)
+		rgb = to_linear(upper) * alpha
+
+		for mask, color, mode in zip(masks[1:], colors[1:], modes):
+			mask = mask[:,:,None]
+			lower = numpy.asarray(to_rgb(color), dtype=numpy.float32)
+			if mode == LAYER_MODE_HARDLIGHT:
+				blend, lower = to_linear(hard_light(upper, lower)), to_linear(lower)
+				rgb = (lower + (blend - lower) * alpha) * mask
+				alpha = mask
+			else:
+				rgb += to_linear(lower) * mask * (1.0 - alpha)
+				alpha = alpha + mask * (1.0 - alpha)
+
+		self.pixels[:,:,:3] = from_linear(rgb / numpy.maximum(alpha, 1e-6)) * alpha
+		self.pixels[:,:,3:4] = alpha
+
+	# gimp_drawable_brightness_contrast on the straight colors, leaving the alpha be
+	def brightness_contrast(self, brightness, contrast):
+		self.pixels[:,:,:3] = brightness_contrast_colors(self.straight(), brightness, contrast) * self.pixels[:,:,3:4]
+
+	# plug_in_mblur's zoom blur towards cx,cy, looked up at image coords x,y (arrays of any shape, nearest pixel) - the
+	# average of samples along each one's line to the centre, length/ZOOM_LENGTH of the way there
+	def zoom_blur_at(self, x, y, cx, cy, length, samples=ZOOM_SAMPLES):
+		# a transparent border to clamp everything off the buffer to, rather than checking every sample
+		padded = numpy.zeros((self.height + 2, self.width + 2, 4), dtype=numpy.float32)
+		padded[1:-1,1:-1] = self.pixels
+		pixels = padded.reshape(-1, 4)
+
+		x, y = x - (self.offsets[0] - 1), y - (self.offsets[1] - 1)
+		cx, cy = cx - (self.offsets[0] - 1), cy - (self.offsets[1] - 1)
+		factor = min(1.0, length / ZOOM_LENGTH)
+		total = 0
+		for i in xrange(samples):
+			scale = 1.0 - factor * i / float(samples)
+			px = numpy.clip(cx + (x - cx) * scale, 0, self.width + 1).astype(numpy.intp)
+			py = numpy.clip(cy + (y - cy) * scale, 0, self.height + 1).astype(numpy.intp)
+			total = total + pixels[py * (self.width + 2) + px]
+		return total * (1.0 / samples)
+
+	# a coarse grid of this buffer, each pixel the average of a step x step block of the image (so the offsets are in
+	# steps too, and the blocks line up with the image's rather than this buffer's corner)
+	def scaled_down(self, step):
+		left, top = self.offsets[0] // step, self.offsets[1] // step
+		right, bottom = -(-(self.offsets[0] + self.width) // step), -(-(self.offsets[1] + self.height) // step)
+		x, y = self.offsets[0] - left * step, self.offsets[1] - top * step
+
+		padded = numpy.zeros(((bottom - top) * step, (right - left) * step, 4), dtype=numpy.float32)
+		padded[y:y+self.height, x:x+self.width] = self.pixels
+		coarse = Raster(right - left, bottom - top, left, top)
+		coarse.pixels[:] = padded.reshape(bottom - top, step, right - left, step, 4).mean(axis=(1, 3))
+		return coarse
+
+	# this buffer is a coarse grid over a width x height image (pixel i standing for pixels i*step to (i+1)*step), so
+	# scale it back up smoothly, but only over the part that isn't transparent
+	def scaled_up(self, step, width, height):
+		box = self.bounds()
+		if box is None:
+			return None
+		left, top = max(0, (box[0] - 1) * step), max(0, (box[1] - 1) * step)
+		right, bottom = min(width, (box[2] + 1) * step), min(height, (box[3] + 1) * step)
+
+		pixels = self.pixels
+		for axis, start, end in ((0, top, bottom), (1, left, right)):
+			size = pixels.shape[axis]
+			position = numpy.clip((numpy.arange(start, end) + 0.5) / step - 0.5, 0, size - 1)
+			before = numpy.floor(position).astype(numpy.intp)
+			after = numpy.minimum(before + 1, size - 1)
+			weight = (position - before).astype(numpy.float32).reshape([-1 if i == axis else 1 for i in range(3)])
+			pixels = numpy.take(pixels, before, axis) * (1.0 - weight) + numpy.take(pixels, after, axis) * weight
+
+		scaled = Raster(right - left, bottom - top, left, top)
+		scaled.pixels[:] = pixels
+		return scaled
+
+
+	# gaussian blur of the whole buffer, approximated by three box blurs in each direction (each one a couple of
+	# cumsums, so the cost doesn't depend on the radius); radius is in plug_in_gauss terms
+	def blur(self, radius):
+		for c in range(4):				# a channel at a time keeps the cumsums down to a quarter of the size
+			if self.pixels[:,:,c].any():
+				self.pixels[:,:,c] = self.gaussian(self.pixels[:,:,c], radius)
+
+	# the same blur of a single channel (or coverage mask)
+	@classmethod
+	def gaussian(cls, pixels, radius):
+		sigma = radius * RADIUS_TO_SIGMA
+		if sigma < 0.5:
+			return pixels
+		for box in cls.box_sizes(sigma, 3):
+			pixels = cls.box_blur(cls.box_blur(pixels, box, 0), box, 1)
+		return pixels
+
+	@staticmethod
+	def box_sizes(sigma, n):
+		# http://www.peterkovesi.com/papers/FastGaussianSmoothing.pdf
+		ideal = math.sqrt((12.0 * sigma * sigma / n) + 1)
+		lower = int(math.floor(ideal))
+		if lower % 2 == 0:
+			lower -= 1
+		upper = lower + 2
+		m = int(round((12.0 * sigma * sigma - n * lower * lower - 4 * n * lower - 3 * n) / (-4.0 * lower - 4)))
+		return [lower if i < m else upper for i in range(n)]
+
+	@staticmethod
+	def box_blur(pixels, size, axis):
+		# running sum along the axis; the difference of two sums size apart is the box total
+		half = size // 2
+		pad = [(0, 0)] * pixels.ndim
+		pad[axis] = (half + 1, half)
+		total = numpy.cumsum(numpy.pad(pixels, pad, 'constant'), axis=axis, dtype=numpy.float32)
+		if axis == 0:
+			total = total[size:] - total[:-size]
+		else:
+			total = total[:,size:] - total[:,:-size]
+		total *= 1.0 / size
+		return total
+
+
+	# straight (not premultiplied) colors, 0-1
+	def straight(self):
+		alpha = self.pixels[:,:,3:4]
+		return numpy.where(alpha > 0, self.pixels[:,:,:3] / numpy.maximum(alpha, 1e-6), 0).astype(numpy.float32)
+
+	# straight 8 bit rgba, or gray + alpha
+	def to_bytes(self, gray=False):
+		alpha = self.pixels[:,:,3:4]
+		rgb = self.straight()
+		if gray:
+			rgb = (rgb * numpy.array([0.2126, 0.7152, 0.0722], dtype=numpy.float32)).sum(axis=2, keepdims=True)
+		out = numpy.concatenate((rgb, alpha), axis=2)
+		return (numpy.clip(out, 0, 1) * 255 + 0.5).astype(numpy.uint8).tostring()
+
+	# makes a new layer the size of this buffer, where it sits in the image, and writes all the pixels to it through
+	# one pixel region
+	def to_layer(self, image, name, parent=None, position=0, opacity=100.0, mode=LAYER_MODE_NORMAL):
+		layer = new_layer(image, name, self.offsets + (self.width, self.height), parent, position, opacity, mode)
+
+		region = layer.get_pixel_rgn(0, 0, self.width, self.height, True, True)
+		region[0:self.width, 0:self.height] = self.to_bytes(image.base_type != RGB)
+		layer.flush()
+		layer.merge_shadow(True)
+		layer.update(0, 0, self.width, self.height)
+		return layer
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Strokes v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Hands lines over to gimp's paint tools in manageable chunks, or draws them all
+# locally with the rasterizer and adds the finished layer - does nothing on its own
+#
+
+import math
+import gimp
+from gimpfu import *
+from raster import *
+
+
+DEFAULT_CHUNK_SIZE = 2048		# points (not coords) sent to gimp per paint tool call
+LAYER_MARGIN = 16				# minimum space left around the lines when sizing a new layer for them
+
+# paint tools that can draw a list of coords, and the pdb procedure that does it
+PAINT_TOOLS = {
+	'gimp-airbrush'		: 'gimp_airbrush_default',
+	'gimp-paintbrush'	: 'gimp_paintbrush_default',
+	'gimp-pencil'		: 'gimp_pencil',
+	'gimp-convolve'		: 'gimp_convolve_default',
+	'gimp-dodge-burn'	: 'gimp_dodgeburn_default',
+	'gimp-eraser'		: 'gimp_eraser_default',
+	'gimp-smudge'		: 'gimp_smudge_default',
+}
+NEW_LAYER_TOOLS = ['gimp-airbrush', 'gimp-paintbrush', 'gimp-pencil']	# the ones that add paint rather than alter what's already there
+
+BEZIER_KAPPA = 0.5522847498		# bezier handle length for a quarter circle, as a fraction of its radius
+
+SVG_DOCUMENT = '<svg xmlns="http://www.w3.org/2000/svg" width="{0}px" height="{1}px" viewBox="0 0 {0} {1}"><path d="{2}"/></svg>'
+
+
+
+# start/end pairs (a flat coord list or a PointBuffer) -> svg path data, every segment its own subpath (ie. stroke)
+def segments_path_data(segments):
+	coords = segments.flat() if hasattr(segments, 'flat') else segments
+	return ' '.join('M%.2f,%.2fL%.2f,%.2f' % tuple(coords[i:i+4]) for i in xrange(0, len(coords) - 3, 4))
+
+
+# svg path data (two bezier curves, carrying on from wherever the path is) for half a circle round x,y - from r along
+# the unit vector e, through r along f (at right angles to it), to r along -e
+def half_circle_path_data(x, y, r, ex, ey, fx, fy):
+	k = BEZIER_KAPPA * r
+	return ''.join('C%.2f,%.2f %.2f,%.2f %.2f,%.2f' % (x + r*e1x + k*e2x, y + r*e1y + k*e2y, x + r*e2x + k*e1x, y + r*e2y + k*e1y, x + r*e2x, y + r*e2y) for e1x, e1y, e2x, e2y in ((ex, ey, fx, fy), (fx, fy, -ex, -ey)))
+
+
+# start/end pairs -> a (bounding box, svg path data) shape for each segment, start_width wide at its start and tapering
+# to end_width at its end, with round ends (the same shape Raster.draw_segments gives a tapered segment) so branches
+# that meet at an angle join up without a notch - for filling rather than stroking
+def tapered_shapes(segments, start_width, end_width):
+	coords = segments.flat() if hasattr(segments, 'flat') else segments
+	a, b = start_width / 2.0, end_width / 2.0
+	shapes = []
+	for i in xrange(0, len(coords) - 3, 4):
+		x0, y0, x1, y1 = coords[i:i+4]
+		length = math.hypot(x1 - x0, y1 - y0)
+		ux, uy = ((x1 - x0) / length, (y1 - y0) / length) if length else (1.0, 0.0)		# along the segment ...
+		nx, ny = -uy, ux																	# ... and across it
+
+		# down one side, half way round the tip, back up the other side and half way round the base
+		path = 'M%.2f,%.2fL%.2f,%.2f' % (x0 + nx*a, y0 + ny*a, x1 + nx*b, y1 + ny*b)
+		path += half_circle_path_data(x1, y1, b, nx, ny, ux, uy)
+		path += 'L%.2f,%.2f' % (x0 - nx*a, y0 - ny*a)
+		path += half_circle_path_data(x0, y0, a, -nx, -ny, -ux, -uy)
+		r = max(a, b)
+		shapes.append(((min(x0, x1) - r, min(y0, y1) - r, max(x0, x1) + r, max(y0, y1) + r), path + 'Z'))
+	return shapes
+
+
+# shapes as (bounding box, svg path data) -> as few batches of them as it takes for no two shapes in a batch to overlap,
+# each batch as svg path data. Gimp turns a path into a selection by the even-odd rule, so shapes overlapping in the
+# one path (like every fork, where the branches start on top of each other) would cancel out where they meet. Or None
+# if it'd take more than limit batches, which is as good as giving up on filling them.
+def overlap_batches(shapes, limit=None):
+	if not shapes:
+		return []
+	cell = max(max(box[2] - box[0], box[3] - box[1]) for box, path in shapes)		# so a shape only spans a few cells
+	batches = []				# (paths, {cell: [box, ...]}) - where each batch's shapes are, to check new ones against
+
+	for box, path in shapes:
+		cells = [(i, j) for i in xrange(int(box[0] // cell), int(box[2] // cell) + 1) for j in xrange(int(box[1] // cell), int(box[3] // cell) + 1)]
+		for paths, grid in batches:
+			if not any(box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3] for c in cells for other in grid.get(c, ())):
+				break
+		else:
+			if limit is not None and len(batches) >= limit:
+				return None
+			paths, grid = [], {}
+			batches.append((paths, grid))
+
+		paths.append(path)
+		for c in cells:
+			grid.setdefault(c, []).append(box)
+
+	return [' '.join(paths) for paths, grid in batches]
+
+
+# a whole gimp path of strokes in the one pdb call, rather than a call per stroke
+def import_vectors(image, name, path_data):
+	if not path_data:
+		vectors = pdb.gimp_vectors_new(image, name)
+		pdb.gimp_image_insert_vectors(image, vectors, None, 0)
+		return vectors
+
+	svg = SVG_DOCUMENT.format(image.width, image.height, path_data)
+	num_vectors, vectors_ids = pdb.gimp_vectors_import_from_string(image, svg, len(svg), True, False)
+	vectors = gimp.Item.from_id(vectors_ids[0])
+	vectors.name = name
+	return vectors
+
+
+# a (color, brush size) style per group -> each style and the indices of the groups using it, in the order the styles
+# first turn up, so everything drawn the same way can go over together
+def style_groups(styles):
+	order, indices = [], {}
+	for index, style in enumerate(styles):
+		if style not in indices:
+			indices[style] = []
+			order.append(style)
+		indices[style].append(index)
+	return [(style, indices[style]) for style in order]
+
+
+# the biggest brush size in a list of (color, brush size) styles, where a size can also be a (start, end) taper
+def largest_brush(styles):
+	return max([max(size) if isinstance(size, tuple) else size for color, size in styles] + [0])
+
+
+
+class StrokeSubmitter(object):
+	def __init__(self, image, layer, layer_name, tools=None, chunk_size=DEFAULT_CHUNK_SIZE, renderer=DRAW_WITH_GIMP):
+		self.image = image
+		self.layer = layer
+		self.layer_name = layer_name
+		self.tools = tools if tools is not None else PAINT_TOOLS.keys()
+		self.chunk_size = max(2, int(chunk_size))
+		self.style = (None, None)			# the last (color, brush size) set_style gave the context
+
+		# the rasterizer draws with the current color/brush size/opacity and doesn't need a tool or layer set up
+		self.raster = use_raster(renderer)
+		if self.raster:
+			return
+
+		# use the current tool if it can draw, else the pencil
+		self.tool = pdb.gimp_context_get_paint_method()
+		if self.tool not in self.tools:
+			self.tool = 'gimp-pencil'
+			pdb.gimp_context_set_paint_method(self.tool)
+
+		# the new layer waits until there's something to draw, so it can be just big enough for it
+		if self.tool in NEW_LAYER_TOOLS:
+			self.layer = None
+
+
+	# a new layer just big enough for these lines (list of flat coord lists or PointBuffers), plus margin for the
+	# brush - or the whole image, if the lines aren't known
+	def make_layer(self, strokes=None, margin=None):
+		if margin is None:
+			margin = max(LAYER_MARGIN, int(math.ceil(pdb.gimp_context_get_brush_size())) + 2)
+		bounds = lines_bounds(strokes) if strokes is not None else None
+		self.layer = new_layer(self.image, self.layer_name, layer_bounds(self.image, bounds, margin) if bounds is not None else None)
+		return self.layer
+
+
+	# splits a flat [x0,y0, x1,y1, ...] list into chunks of up to chunk_size points; each chunk starts on the last
+	# point of the one before so the line stays continuous
+	def chunks(self, coords):
+		size = self.chunk_size * 2
+		step = size - 2
+		if len(coords) <= size:
+			yield coords
+			return
+
+		for i in xrange(0, len(coords) - 2, step):
+			yield coords[i:i+size]
+
+
+	# strokes is a list of flat coord lists (or PointBuffers), one per continuous line
+	def draw(self, strokes):
+		if self.raster:
+			return self.rasterize(strokes, joined=True)
+
+		strokes = [getattr(s, 'coords', s) for s in strokes]			# PointBuffers hand over their flat coords
+		strokes = [s for s in strokes if len(s) >= 2]
+		paint = getattr(pdb, PAINT_TOOLS[self.tool])
+		if self.layer is None:
+			self.make_layer(strokes)
+		x, y = self.layer.offsets
+
+		todo = sum(len(s) for s in strokes)
+		done = 0
+		pdb.gimp_progress_update(0.0)
+
+		for coords in strokes:
+			for chunk in self.chunks(coords):
+				paint(self.layer, len(chunk), layer_coords(chunk, x, y))
+
+				done += len(chunk)
+				pdb.gimp_progress_update(min(1.0, float(done) / float(todo)))
+
+
+	# draws groups of separate segments with the rasterizer - groups is a list of flat segment lists, [x0,y0, x1,y1, ...]
+	# start/end pairs, with before(index) called ahead of each group just like stroke_items
+	def draw_groups(self, groups, before=None):
+		return self.rasterize(groups, joined=False, before=before)
+
+
+	# (raster only) groups of flat segment lists like draw_groups, but with a (color, brush size) style per group given
+	# up front instead of read back from the context - so the groups sharing a style get drawn in one go, with no pdb
+	# calls at all until the finished layer goes over; a (start, end) brush size tapers every segment in the group
+	def draw_styled(self, groups, styles):
+		groups = [as_array(g) for g in groups]
+		raster = self.raster_for(groups, largest_brush(styles))
+		if raster is None:
+			return None
+
+		opacity = pdb.gimp_context_get_opacity() / 100.0
+		todo = style_groups(styles)
+		pdb.gimp_progress_update(0.0)
+
+		for done, ((color, size), indices) in enumerate(todo):
+			coords = numpy.concatenate([groups[i] for i in indices])
+			if isinstance(size, tuple):
+				size = numpy.tile(numpy.asarray(size, dtype=numpy.float64), (len(coords) // 4, 1))
+			raster.draw_segments(coords, color, size, opacity)
+			pdb.gimp_progress_update(float(done+1) / float(len(todo)))
+
+		self.layer = raster.to_layer(self.image, self.layer_name)
+		return self.layer
+
+
+	# an empty buffer the size of the lines, plus room for a brush this big, or None if there's nothing to draw
+	def raster_for(self, groups, brush_size):
+		points = [g.reshape(-1, 2) for g in groups if len(g) >= 4]
+		if not points:
+			return None
+
+		points = numpy.concatenate(points)
+		margin = max(LAYER_MARGIN, int(math.ceil(brush_size)) + 2)
+		left, top, width, height = layer_bounds(self.image, tuple(points.min(axis=0)) + tuple(points.max(axis=0)), margin)
+		return Raster(width, height, left, top)
+
+
+	# draws everything into one buffer the size of the lines (plus a bit), then adds that as a new layer
+	def rasterize(self, groups, joined, before=None):
+		groups = [as_array(g) for g in groups]
+		raster = self.raster_for(groups, pdb.gimp_context_get_brush_size())
+		if raster is None:
+			return None
+		pdb.gimp_progress_update(0.0)
+
+		for index, coords in enumerate(groups):
+			if before is not None:
+				before(index)
+			color = pdb.gimp_context_get_foreground()
+			width = pdb.gimp_context_get_brush_size()
+			opacity = pdb.gimp_context_get_opacity() / 100.0
+
+			if joined:
+				raster.draw_polyline(coords, color, width, opacity)
+			else:
+				raster.draw_segments(coords, color, width, opacity)
+			pdb.gimp_progress_update(float(index+1) / float(len(groups)))
+
+		self.layer = raster.to_layer(self.image, self.layer_name)
+		return self.layer
+
+
+	# strokes a list of vectors instead; before(index) gets called ahead of each one so the brush/color can change, and
+	# lines are what the items were made from (flat coord lists or PointBuffers), for sizing a new layer to fit them
+	def stroke_items(self, items, before=None, lines=None):
+		if self.layer is None:
+			self.make_layer(lines)
+		pdb.gimp_progress_update(0.0)
+
+		for index, item in enumerate(items):
+			if before is not None:
+				before(index)
+			pdb.gimp_drawable_edit_stroke_item(self.layer, item)
+			pdb.gimp_progress_update(float(index+1) / float(len(items)))
+
+
+	# strokes a list of vectors with a (color, brush size) style each, only touching the context when the style changes
+	# - still one stroke per vectors, so it's as many passes as there are styles (see style_groups)
+	def stroke_styled(self, items, styles, lines=None):
+		if self.layer is None:
+			self.make_layer(lines, max(LAYER_MARGIN, int(math.ceil(largest_brush(styles))) + 2))
+		pdb.gimp_progress_update(0.0)
+
+		for index, (item, (color, size)) in enumerate(zip(items, styles)):
+			self.set_style(color, size)
+			pdb.gimp_drawable_edit_stroke_item(self.layer, item)
+			pdb.gimp_progress_update(float(index+1) / float(len(items)))
+
+
+	# fills closed shapes (see tapered_shapes) with the color of their style, through the selection - only where the
+	# user's own selection allows, and putting that back afterwards. shapes has a list of overlap_batches per style; each
+	# batch goes over as one path and gets added to the selection, then it's one fill per style however many shapes
+	# there are, which is far cheaper than stroking them all with a big brush. The paths go again once they're selected,
+	# and the selection is antialiased whatever the user had, which goes back afterwards too.
+	def fill_styled(self, shapes, styles, lines=None):
+		if self.layer is None:
+			self.make_layer(lines, max(LAYER_MARGIN, int(math.ceil(largest_brush(styles))) + 2))
+		saved = None if pdb.gimp_selection_is_empty(self.image) else pdb.gimp_selection_save(self.image)
+		antialias = pdb.gimp_context_get_antialias()
+		pdb.gimp_context_set_antialias(True)
+
+		todo = sum(len(batches) for batches in shapes)
+		done = 0
+		pdb.gimp_progress_update(0.0)
+
+		for batches, (color, size) in zip(shapes, styles):
+			if not batches:
+				continue
+
+			operation = CHANNEL_OP_REPLACE
+			for path_data in batches:
+				vectors = import_vectors(self.image, self.layer_name, path_data)
+				pdb.gimp_image_select_item(self.image, operation, vectors)
+				pdb.gimp_image_remove_vectors(self.image, vectors)
+				operation = CHANNEL_OP_ADD
+
+				done += 1
+				pdb.gimp_progress_update(float(done) / float(todo))
+
+			if saved is not None:
+				pdb.gimp_image_select_item(self.image, CHANNEL_OP_INTERSECT, saved)
+			self.set_style(color)
+			pdb.gimp_drawable_edit_fill(self.layer, FILL_FOREGROUND)
+
+		if saved is not None:
+			pdb.gimp_image_select_item(self.image, CHANNEL_OP_REPLACE, saved)
+			pdb.gimp_image_remove_channel(self.image, saved)
+		else:
+			pdb.gimp_selection_none(self.image)
+		pdb.gimp_context_set_antialias(antialias)
+
+
+	# the foreground color and (unless it's None) brush size, skipping whichever the context already has from last time
+	def set_style(self, color, size=None):
+		if color != self.style[0]:
+			pdb.gimp_context_set_foreground(color)
+		if size is not None and size != self.style[1]:
+			pdb.gimp_context_set_brush_size(size)
+		self.style = (color, size if size is not None else self.style[1])
@@ -27,11 +27,22 @@ sys.stderr = open(this_directory + 'gimpfu_debug.txt', 'a')
 
 import random
 from gimpfu import *
+from classes.strokes import *
+from classes.raster import *
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+PROGRESS_STEPS = 100				# progress bar updates while plotting, rather than one per ellipse
 
 
 class Ellipses(object):
-	def __init__(self, image, center_x, center_y, radius_x, radius_y, in_percent, angle, depth, decrease, offset_x, offset_y):
+	def __init__(self, image, center_x, center_y, radius_x, radius_y, in_percent, angle, depth, decrease, offset_x, offset_y, renderer=DRAW_WITH_GIMP):
 		self.image = image
+		self.raster = use_raster(renderer)
 
 		self.width = pdb.gimp_image_width(self.image)
 		self.height = pdb.gimp_image_height(self.image)
@@ -57,8 +68,8 @@ class Ellipses(object):
 		self.offset_x = max(0.00, min(1.00, float(offset_x) * 0.01))
 		self.offset_y = max(0.00, min(1.00, float(offset_y) * 0.01))
 
-		self.vectors = pdb.gimp_vectors_new(self.image, "Ellipses")
-		pdb.gimp_image_insert_vectors(self.image, self.vectors, None, 0)
+		self.ellipses = []	# (cx,cy, rx,ry) of every ellipse plotted
+		self.vectors = None
 
 		# progress counter so we don't get bored during the recursion...
 		self.count = 0
@@ -66,31 +77,18 @@ class Ellipses(object):
 	pass
 
 
+	# pure python all the way down, so the recursion doesn't cost any pdb calls (bar the odd progress update)
 	def plot_ellipse(self, cx=None, cy=None, rx=None, ry=None, depth=1):
-		pdb.gimp_image_undo_freeze(self.image)
-
 		cx = cx if cx is not None else self.center_x
 		cy = cy if cy is not None else self.center_y
 		rx = rx if rx is not None else self.radius_x
 		ry = ry if ry is not None else self.radius_y
 		
-		# for some unknown-to-me reason, vector ellipses aren't made right (in 2.10.8 at least)
-		stroke_id = pdb.gimp_vectors_bezier_stroke_new_ellipse(self.vectors, cx,cy, rx,ry, 0)
-
-		# so this replaces the incorrect Y value at the start with its counterpart on the opposite side and remakes the path
-		stroke_type, num_points, controlpoints, closed = pdb.gimp_vectors_stroke_get_points(self.vectors, stroke_id)
-		pdb.gimp_vectors_remove_stroke(self.vectors, stroke_id)
-		controlpoints = list(controlpoints)
-		controlpoints[1] = controlpoints[17]
-		controlpoints = tuple(controlpoints)
-		stroke_id = pdb.gimp_vectors_stroke_new_from_points(self.vectors, stroke_type, num_points, controlpoints, closed)
-		
-		# but this simple fix messes up angled ellipses so we separately rotate the path to correct the correction
-		angle = - math.degrees(self.angle) # which of course isn't in radians anti-clockwise but degrees clockwise because god knows we don't want any consistency in an api...
-		pdb.gimp_vectors_stroke_rotate(self.vectors, stroke_id, cx,cy, angle)
+		self.ellipses.append((cx,cy, rx,ry))
 
 		self.count+= 1
-		pdb.gimp_progress_update(float(self.count)/float(self.max_count))
+		if self.count % max(1, self.max_count // PROGRESS_STEPS) == 0:
+			pdb.gimp_progress_update(float(self.count)/float(self.max_count))
 
 		# now get on with plotting the next ellipse
 		if self.decrease < 1 and depth <= self.max_depth:
@@ -126,8 +124,48 @@ class Ellipses(object):
 					#self.plot_ellipse(cx - ox,cy + oy, rx,ry, depth+1)
 					#self.plot_ellipse(cx - ox,cy - oy, rx,ry, depth+1)
 
-		pdb.gimp_image_undo_thaw(self.image)
+	pass
+
+	# every ellipse as a closed bezier of four quarters, its control points worked out here and turned by the angle -
+	# as svg path data, so the whole lot goes over in one pdb call. (gimp_vectors_bezier_stroke_new_ellipse gets the
+	# first handle wrong in 2.10.8 at least, which used to take another four calls per ellipse to put right.)
+	def ellipse_path_data(self):
+		c, s = math.cos(-self.angle), math.sin(-self.angle)		# gimp's angles go clockwise, this one anti-clockwise
+		quarters = ((1, 0), (0, 1), (-1, 0), (0, -1))				# cos,sin at each anchor
+		k = BEZIER_KAPPA
+
+		paths = []
+		for cx,cy, rx,ry in self.ellipses:
+			def at(x, y):
+				return (cx + (x * c) - (y * s), cy + (x * s) + (y * c))
+
+			anchors = [at(rx*u, ry*v) for u,v in quarters]
+			handles_out = [at((rx*u) - (k*rx*v), (ry*v) + (k*ry*u)) for u,v in quarters]		# along the tangent ...
+			handles_in = [at((rx*u) + (k*rx*v), (ry*v) - (k*ry*u)) for u,v in quarters]		# ... and back against it
+
+			path = 'M%.2f,%.2f' % anchors[0]
+			for i in range(4):
+				path += 'C%.2f,%.2f %.2f,%.2f %.2f,%.2f' % (handles_out[i] + handles_in[(i+1) % 4] + anchors[(i+1) % 4])
+			paths.append(path + 'Z')
+
+		return ' '.join(paths)
+	pass
 
+	# every ellipse as short (2px or so) straight segments, rotated the same as the vectors - [x0,y0, x1,y1, ...]
+	def ellipse_segments(self):
+		e = numpy.array(self.ellipses, dtype=numpy.float64)
+		steps = numpy.maximum(16, numpy.ceil(math.pi * (e[:,2] + e[:,3]) / 2.0)).astype(numpy.int64)
+		which = numpy.repeat(numpy.arange(len(e)), steps)
+		step = numpy.arange(len(which)) - numpy.repeat(numpy.cumsum(steps) - steps, steps)
+
+		c, s = math.cos(-self.angle), math.sin(-self.angle)
+		def around(theta):
+			x = e[which,2] * numpy.cos(theta)
+			y = e[which,3] * numpy.sin(theta)
+			return (e[which,0] + (x * c) - (y * s), e[which,1] + (x * s) + (y * c))
+
+		theta = (2 * math.pi) * step / steps[which]
+		return numpy.column_stack(around(theta) + around(theta + (2 * math.pi) / steps[which])).ravel()
 	pass
 
 	def draw_ellipse(self):
@@ -136,8 +174,18 @@ class Ellipses(object):
 		pdb.gimp_context_set_brush_size(1)
 		pdb.gimp_context_set_brush_hardness(1)
 
-		layer = pdb.gimp_layer_new(self.image, self.image.width, self.image.height, RGBA_IMAGE, "Ellipses", 100.00, LAYER_MODE_NORMAL)
-		pdb.gimp_image_insert_layer(self.image, layer, None, 0)
+		if self.raster:
+			submitter = StrokeSubmitter(self.image, None, "Ellipses", renderer=DRAW_WITH_RASTER)
+			submitter.draw_groups([self.ellipse_segments()])
+			return
+
+		# a layer just big enough for every ellipse, whichever way they're turned
+		corners = [(cx - max(rx,ry), cy - max(rx,ry), cx + max(rx,ry), cy + max(rx,ry)) for cx,cy, rx,ry in self.ellipses]
+		layer = new_layer(self.image, "Ellipses", layer_bounds(self.image, lines_bounds(corners), 2))
+
+		pdb.gimp_image_undo_freeze(self.image)
+		self.vectors = import_vectors(self.image, "Ellipses", self.ellipse_path_data())
+		pdb.gimp_image_undo_thaw(self.image)
 
 		pdb.gimp_drawable_edit_stroke_item(layer, self.vectors)
 	pass
@@ -145,10 +193,10 @@ class Ellipses(object):
 pass
 
 
-def python_kd_concentric_ellipses(image, layer, center_x, center_y, radius_x, radius_y, in_percent, angle, depth, decrease, offset_x, offset_y):
+def python_kd_concentric_ellipses(image, layer, center_x, center_y, radius_x, radius_y, in_percent, angle, depth, decrease, offset_x, offset_y, renderer=DRAW_WITH_GIMP):
 	pdb.gimp_image_undo_group_start(image)
 
-	ellipses = Ellipses(image, center_x, center_y, radius_x, radius_y, in_percent, angle, depth, decrease, offset_x, offset_y)
+	ellipses = Ellipses(image, center_x, center_y, radius_x, radius_y, in_percent, angle, depth, decrease, offset_x, offset_y, renderer)
 
 	pdb.gimp_progress_init("Plotting ellipses ...", None)
 	ellipses.plot_ellipse()
@@ -181,6 +229,7 @@ register(
 
 		(PF_INT, "offset_x", "X Radius Offset %", 100),
 		(PF_INT, "offset_y", "Y Radius Offset %", 100),
+		(PF_OPTION, "renderer", "Draw With", DRAW_WITH_GIMP, RENDERERS),
 	],
 	[],
 	python_kd_concentric_ellipses)
@@ -27,9 +27,20 @@ sys.stderr = open(this_directory + 'gimpfu_debug.txt', 'a')
 from classes.mygtk import *
 from classes.colorful import *
 from classes.point import *
+from classes.strokes import *
+from classes.raster import *
+from classes.geometry import *
+from array import array
+from itertools import izip
 import random
 
 
+MAX_DEPTH = 15			# iterations allowed - it's the culling and merging that keeps the deep ones to a sensible size
+LOD_PIXELS = 1.0		# a branch that would land within this of one already plotted (subtree and all) gets merged into it
+DEPTH_BUDGET = 65536	# most branches plotted at any one depth; past that they get merged over more pixels until it fits
+FILL_BATCHES = 12		# most paths a tapered depth gets filled through before it's stroked instead (see make_shapes)
+
+
 class FractalTree(object):
 	def __init__(self, image, args):
 		self.image = image
@@ -46,101 +57,199 @@ class FractalTree(object):
 		self.angle = -90 # initial angle (up)
 
 		self.depth = 0
-		self.max_depth = max(1, min(10, int(args['max_depth'])))
+		self.max_depth = max(1, min(MAX_DEPTH, int(args['max_depth'])))
 
 		self.length = max(100, int(args['length'])) # self.height * 0.25 # initial height
 		self.decrease = 1.0 - float(max(1, min(100, int(args['decrease']))) * 0.01)  # keep this much of the branch each depth
 
-		self.vectors = []
-
-
-	def plot_tree(self, base=None, depth=None, angle=None, length=None):
-		base = base if base is not None else self.base
-		depth = depth if depth is not None else self.depth
-		angle = angle if angle is not None else self.angle
-		length = length if length is not None else self.length
+		self.vectors = []		# a gimp path per depth, made from the segments if gimp's doing the drawing
+		self.segments = []		# the branches as start/end pairs, a PointBuffer per depth
+		self.culled = []		# per depth, branches left out (along with everything growing from them) for being off the canvas
+		self.merged = []		# per depth, branches left out for being too close to one already plotted (see merge)
 
-		if depth < self.max_depth and length > 2:
-			pdb.gimp_image_undo_freeze(self.image)
-
-			tip = base.make_point(length, math.radians(angle))
-			if self.branches == 1:
-				tip.check_bounds(self.width, self.height)
 
+	# how far from its base a branch at each depth can reach, counting everything that grows from it
+	def reaches(self):
+		lengths, length = [], self.length
+		for depth in range(self.depth, self.max_depth):
+			if length <= 2:
+				break
+			lengths.append(length)
 			length *= self.decrease
-
-			if len(self.vectors) <= depth:
-				self.vectors.append(pdb.gimp_vectors_new(self.image, "Fractal Tree "+str(depth)))
-				pdb.gimp_image_insert_vectors(self.image, self.vectors[depth], None, 0)
-
-			#half = base.halfway_to(tip)
-			#points = [base.x,base.y] * 3 + [half.x+random.uniform(-10,10),half.y] * 3 + [tip.x,tip.y] * 3
-			points = [base.x,base.y] * 3 + [tip.x,tip.y] * 3
-
-			stroke_id = pdb.gimp_vectors_stroke_new_from_points(self.vectors[depth], VECTORS_STROKE_TYPE_BEZIER, len(points), points, 0)
-
-			if self.branches > 0:
-				noof_branches = self.branches
-			else:
-				noof_branches = random.randint(2, 4)
-
-			if self.branch_angle > 0:
-				degrees_offset = (sum((i * self.branch_angle) for i in range(1, noof_branches, 1)) / noof_branches)
-				for i in range(noof_branches):
-					theta = (i * self.branch_angle) - degrees_offset
-					self.plot_tree(tip, depth+1, angle + theta, length)
+		return [sum(lengths[i:]) for i in range(len(lengths))] + [0.0]
+
+	# whether a circle round (x,y) misses the canvas completely
+	def off_canvas(self, x, y, radius):
+		dx = max(0.0 - x, 0.0, x - self.width)
+		dy = max(0.0 - y, 0.0, y - self.height)
+		return (dx * dx) + (dy * dy) > (radius * radius)
+
+
+	# breadth first, a depth at a time, so each depth's branches go straight into that depth's buffer - the next depth's
+	# branches wait as flat columns of base x, base y and angle (they all share the one length), not an object apiece
+	def plot_tree(self):
+		bases_x, bases_y, angles = array('d', [self.base.x]), array('d', [self.base.y]), array('d', [self.angle])
+		length = self.length
+		reaches = self.reaches()
+		cull = self.branches != 1			# a single branch gets kept on the canvas, so nothing can be written off
+
+		for depth in range(len(reaches) - 1):
+			if not angles:
+				break
+
+			# everything that can still reach the canvas (its whole subtree, and the brush round it), with its tip
+			margin = reaches[depth] + (self.brush_width(depth) / 2.0) + 1
+			tips_x, tips_y, kept_x, kept_y, kept_angles = array('d'), array('d'), array('d'), array('d'), array('d')
+			culled = 0
+			for base_x, base_y, angle in izip(bases_x, bases_y, angles):
+				if cull and self.off_canvas(base_x, base_y, margin):
+					culled += 1
+					continue
+
+				radians = math.radians(angle)
+				tip_x, tip_y = base_x + (length * math.cos(radians)), base_y + (length * math.sin(radians))
+				if self.branches == 1:
+					tip = Point(tip_x, tip_y)
+					tip.check_bounds(self.width, self.height)
+					tip_x, tip_y = tip.x, tip.y
+
+				kept_x.append(base_x)
+				kept_y.append(base_y)
+				kept_angles.append(angle)
+				tips_x.append(tip_x)
+				tips_y.append(tip_y)
+			bases_x, bases_y, angles = kept_x, kept_y, kept_angles
+
+			# merge branches a pixel apart, or as many pixels as it takes to keep the depth within budget
+			cell = LOD_PIXELS
+			kept = self.merge(bases_x, bases_y, tips_x, tips_y, angles, reaches[depth+1], cell)
+			while kept is None:
+				cell *= 1.5
+				kept = self.merge(bases_x, bases_y, tips_x, tips_y, angles, reaches[depth+1], cell)
+
+			segments = PointBuffer()
+			next_x, next_y, next_angles = array('d'), array('d'), array('d')
+			for i in kept:
+				base_x, base_y, tip_x, tip_y, angle = bases_x[i], bases_y[i], tips_x[i], tips_y[i], angles[i]
+				segments.append(base_x, base_y)
+				segments.append(tip_x, tip_y)
+
+				for theta in self.child_angles(base_x, base_y, tip_x, tip_y):
+					next_x.append(tip_x)
+					next_y.append(tip_y)
+					next_angles.append(angle + theta)
+
+			self.segments.append(segments)
+			self.culled.append(culled)
+			self.merged.append(len(angles) - len(kept))
+			bases_x, bases_y, angles = next_x, next_y, next_angles
+			length *= self.decrease
+			pdb.gimp_progress_update(float(depth+1) / float(len(reaches) - 1))
+
+
+	# indices of the branches to keep, leaving out any with both ends in the same cell as one already kept and near
+	# enough the same angle that nothing growing from it (reach pixels at most) could end up more than a cell or so away
+	# either - it'd only draw over what's there. Or None if that leaves more than DEPTH_BUDGET, so cells this size won't do.
+	def merge(self, bases_x, bases_y, tips_x, tips_y, angles, reach, cell):
+		twist = math.radians(1) * reach / cell			# how many cells a turn of one degree moves the furthest twig
+		seen, kept = set(), []
+		for i in xrange(len(angles)):
+			key = (int(bases_x[i] // cell), int(bases_y[i] // cell), int(tips_x[i] // cell), int(tips_y[i] // cell), int(round(angles[i] * twist)))
+			if key in seen:
+				continue
+			seen.add(key)
+			kept.append(i)
+			if len(kept) > DEPTH_BUDGET:
+				return None
+		return kept
+
+
+	# the turn (in degrees) from a branch to each of the branches growing from its tip
+	def child_angles(self, base_x, base_y, tip_x, tip_y):
+		if self.branches > 0:
+			noof_branches = self.branches
+		else:
+			noof_branches = random.randint(2, 4)
+
+		if self.branch_angle > 0:
+			degrees_offset = (sum((i * self.branch_angle) for i in range(1, noof_branches, 1)) / noof_branches)
+			return [(i * self.branch_angle) - degrees_offset for i in range(noof_branches)]
+
+		sd = 20 if noof_branches == 1 else 50
+		mu = math.atan2(tip_y - base_y, tip_x - base_x)
+		return [random.gauss(mu, sd) for i in range(noof_branches)]
+
+
+	# brush size at the base of each depth's branches, when they're tapered (which is the widest they get drawn)
+	def brush_width(self, depth):
+		return ((self.max_depth - depth) * 2) + 3
+
+	# the same for every depth plotted, and the last depth's tips
+	def widths(self):
+		return [self.brush_width(depth) for depth in range(len(self.segments) + 1)]
+
+
+	# one gimp path per style, holding every depth drawn that way with a stroke for each branch - handed over as svg,
+	# so it's one pdb call per style; returns the style of each path. depths says which depth each style is for, if
+	# it's not all of them in order. The color ramp gives every depth a color of its own, so in practice that's a path
+	# (and a stroke) per depth - max_depth + 1 of them, however many branches there are.
+	def make_vectors(self, styles, depths=None):
+		pdb.gimp_image_undo_freeze(self.image)
+
+		groups = style_groups(styles)
+		for style, indices in groups:
+			depths_here = [depths[i] for i in indices] if depths is not None else indices
+			path_data = ' '.join(filter(None, [segments_path_data(self.segments[depth]) for depth in depths_here]))
+			self.vectors.append(import_vectors(self.image, "Fractal Tree "+', '.join(str(depth) for depth in depths_here), path_data))
+
+		pdb.gimp_image_undo_thaw(self.image)
+		return [style for style, indices in groups]
+
+	# tapered branches as round ended shapes, in batches that gimp can fill (see overlap_batches) - returns the batches
+	# for each style and the styles. A depth so crowded it'd take more than FILL_BATCHES paths to fill gets stroked at its
+	# average width instead (round ended too, so it still joins up), as (depth, style) pairs in the last list.
+	def make_shapes(self, styles):
+		shapes, filled, stroked = [], [], []
+		for (color, size), depths in style_groups(styles):
+			batches = overlap_batches([shape for depth in depths for shape in tapered_shapes(self.segments[depth], *size)], FILL_BATCHES)
+			if batches is None:
+				stroked.extend((depth, (color, sum(size) / 2.0)) for depth in depths)
 			else:
-				sd = 20 if noof_branches == 1 else 50
-
-				for i in range(noof_branches):
-					mu = tip.angle_of(base)
-					theta = random.gauss(mu, sd)
-					#pdb.gimp_message("{} {} = {} {} {}".format(depth, length, angle, mu, theta))
-					self.plot_tree(tip, depth+1, angle + theta, length)
-
-
-			pdb.gimp_image_undo_thaw(self.image)
+				shapes.append(batches)
+				filled.append((color, size))
+		return shapes, filled, stroked
 	
 
 ##### end of class #####
 
 
-def FractalTreeWrapper(args):
-	
-	image, layer, args = args
-
+# everything up to the drawing, which is all pure python - see headless/farm.py for doing lots of these at once
+def FractalTreePlot(image, args):
 	tree = FractalTree(image, args)
-	
 	if args['branches'] == 1:
 		tree.angle = random.gauss(tree.angle,20)
 
 	pdb.gimp_progress_init("Plotting tree ...", None)
 	tree.plot_tree()
 
+	return [({ 'depth': depth, 'culled': culled, 'merged': merged }, segments) for depth, (segments, culled, merged) in enumerate(zip(tree.segments, tree.culled, tree.merged))]
 
-	pdb.gimp_progress_set_text("Drawing lines ...")
-	tools = {
-		'gimp-airbrush': pdb.gimp_airbrush_default,
-		'gimp-paintbrush': pdb.gimp_paintbrush_default,
-		'gimp-pencil': pdb.gimp_pencil,
-		#'gimp-convolve': pdb.gimp_convolve_default,
-		#'gimp-dodge-burn': pdb.gimp_dodgeburn_default,
-		#'gimp-eraser': pdb.gimp_eraser_default,
-		#'gimp-smudge': pdb.gimp_smudge_default,
-	}
-	need_new_layer = ['gimp-airbrush', 'gimp-paintbrush', 'gimp-pencil']
-	
-	current_tool = pdb.gimp_context_get_paint_method()
-	if current_tool not in tools:
-		#pdb.gimp_message(current_tool)
-		current_tool = 'gimp-pencil'
-		pdb.gimp_context_set_paint_method(current_tool)
+
+def FractalTreeWrapper(args):
 	
-	if current_tool in need_new_layer:
-		layer_type = RGBA_IMAGE if image.base_type is RGB else GRAYA_IMAGE
-		layer = pdb.gimp_layer_new(image, image.width, image.height, layer_type, 'Fractal Tree', 100.00, LAYER_MODE_NORMAL)
-		pdb.gimp_image_insert_layer(image, layer, None, 0)
+	image, layer, args = args
 
+	tree = FractalTree(image, args)
+	submitter = StrokeSubmitter(image, layer, 'Fractal Tree', tools=['gimp-airbrush', 'gimp-paintbrush', 'gimp-pencil'], renderer=args['renderer'])
+
+	segments = geometry_for(image, args)
+	if segments is None:
+		segments = FractalTreePlot(image, args)
+	tree.segments = [points for details, points in segments]
+
+	culled = sum(details.get('culled', 0) for details, points in segments)
+	merged = sum(details.get('merged', 0) for details, points in segments)
+	pdb.gimp_progress_set_text("Drawing {} branches ({} off the canvas left out, and {} merged into their neighbours) ...".format(sum(len(points) for points in tree.segments) / 2, culled, merged))
 
 	#first_color = Colorful(pdb.gimp_context_get_foreground())
 	#second_color = Colorful(pdb.gimp_context_get_background())
@@ -149,17 +258,28 @@ def FractalTreeWrapper(args):
 
 	#pdb.gimp_message("contrast ratio = {}".format(first_color.contrast_ratio(second_color)))
 
-	for index, vectors in enumerate(tree.vectors):
-		size = 3 #((tree.max_depth-index) * 2) + 3
-		pdb.gimp_context_set_brush_size(size)
+	# the color and brush size of each depth, worked out up front so the drawing doesn't have to stop between depths -
+	# tapered, each depth thins from its own width to the next one's, and gets filled as shapes rather than stroked.
+	# No two depths share a color, so gimp still gets a pass (a fill or a stroke) per depth, just not one per branch
+	colors = first_color.ramp(second_color, [float(depth)/float(tree.max_depth) for depth in range(len(tree.segments))])
+	if args['taper']:
+		widths = tree.widths()
+		styles = [(color, (widths[depth], widths[depth+1])) for depth, color in enumerate(colors)]
+	else:
+		styles = [(color, 3) for color in colors]
+
+	if submitter.raster:
+		submitter.draw_styled(tree.segments, styles)
+	elif args['taper']:
+		shapes, filled, stroked = tree.make_shapes(styles)
+		submitter.fill_styled(shapes, filled, tree.segments)
+		if stroked:
+			styles = tree.make_vectors([style for depth, style in stroked], [depth for depth, style in stroked])
+			submitter.stroke_styled(tree.vectors, styles, tree.segments)
+	else:
+		styles = tree.make_vectors(styles)
+		submitter.stroke_styled(tree.vectors, styles, tree.segments)
 
-		amount = float(index)/float(tree.max_depth)
-		first_color.blend(second_color, amount)
-		first_color.set_foreground()
-		
-		pdb.gimp_drawable_edit_stroke_item(layer, vectors)
-		#tools[current_tool](layer, len(coords), coords)
-		
 
 
 
@@ -219,6 +339,14 @@ plugin = PythonFu(
 			'type'		: ColorPicker,
 			'default'	: BACKGROUND,
 		},
+		{
+			'variable'	: 'renderer',
+			'label'		: 'Draw With',
+			'tooltip'	: 'GIMP\'s paint tools, or draw the branches here and add them as a finished layer (needs NumPy).',
+			'type'		: DropDown,
+			'options'	: RENDERERS,
+			'default'	: DRAW_WITH_GIMP,
+		},
 
 		{
 			'tab'		: 2,
@@ -257,15 +385,23 @@ plugin = PythonFu(
 			'label_width' : 140,
 			'tooltip'	: '',
 			'type'		: IntSlider,
-			'range'		: (1,10),
+			'range'		: (1,MAX_DEPTH),
 			'step'		: (1,1),
 			'default'	: 5,
 		},
+		{
+			'variable'	: 'taper',
+			'label'		: 'Taper Branches',
+			'tooltip'	: 'Thick at the trunk, thinning out to the twigs - filled as shapes rather than stroked, so it\'s quick even with thousands of branches.',
+			'type'		: Toggle,
+			'default'	: False,
+		},
 	],
 	help_text = {
 		'label' : ('Draws a tree ala https://natureofcode.com/book/chapter-8-fractals/#85-trees - set branches or branch angle to zero to randomize either parameter.'),
 	},
-	code_function = FractalTreeWrapper
+	code_function = FractalTreeWrapper,
+	plot_function = FractalTreePlot
 )
 
 plugin.main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Fake gimp, gimpfu, gtk etc. modules so the plugins can be run (and timed, and
+# tested) without gimp - see run.py. Lives in its own folder so gimp doesn't
+# try to register any of it as a plugin.
+#
+
+import os, sys
+this_directory = os.path.dirname(os.path.realpath(__file__)) + os.sep
+
+FAKES_DIRECTORY = os.path.join(this_directory, 'fakes')
+
+
+# puts the fake modules ahead of anything real called the same - call before importing any plugin
+def install():
+	if FAKES_DIRECTORY not in sys.path:
+		sys.path.insert(0, FAKES_DIRECTORY)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless Benchmark v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Runs the plugins headless across a grid of iterations, image sizes, sides,
+# bolts etc. and records, for each phase of each run, the time taken, the peak
+# memory while it ran (on linux), and the pdb calls and bytes sent - eg.
+#
+#   python headless/benchmark.py run --output before.json
+#   ... change something ...
+#   python headless/benchmark.py run --output after.json
+#   python headless/benchmark.py compare before.json after.json
+#
+# A phase is whatever the plugin has put in the progress bar ("Plotting lines",
+# "Rotating lines" etc.). Each run gets a process of its own, so the memory
+# figures are for that run alone and a runaway setting can be timed out.
+#
+
+import os, sys, json, time, platform, itertools, argparse, subprocess
+this_directory = os.path.dirname(os.path.realpath(__file__)) + os.sep
+repo_directory = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + os.sep
+if repo_directory not in sys.path:
+	sys.path.insert(0, repo_directory)
+
+
+SIZES = (1024, 2048, 4096, 8192, 16384)
+QUICK_SIZES = (1024, 4096)
+DEFAULT_TIMEOUT = 300			# seconds before a run is given up on
+DEFAULT_SEED = 1
+DEFAULT_THRESHOLD = 1.25		# compare: flag anything this much slower (calls and bytes are flagged on any rise)
+
+RENDERERS = [0, 1]				# gimp's paint tools, the local rasterizer
+
+# plugin: (settings to sweep, settings that follow the image size); iterations go as deep as each plugin allows
+GRID = {
+	'koch'		: ({'max_depth': range(0, 9), 'sides': [1, 3, 6, 10], 'renderer': RENDERERS}, lambda size: {'size': size / 3}),
+	'sierpinski': ({'max_depth': range(0, 7), 'renderer': RENDERERS}, lambda size: {'size': size / 3}),
+	'tree'		: ({'max_depth': range(1, 11), 'branches': [2, 3], 'renderer': RENDERERS}, lambda size: {'length': size / 6}),
+	'ellipses'	: ({'depth': range(1, 6), 'renderer': RENDERERS}, None),
+	'lightning'	: ({'n_main': [1, 3, 10], 'n_side': [0, 5, 20], 'renderer': RENDERERS}, None),
+	'tiling'	: ({'direction': [0, 1]}, None),
+}
+QUICK_GRID = {
+	'koch'		: {'max_depth': [2, 6], 'sides': [3], 'renderer': RENDERERS},
+	'sierpinski': {'max_depth': [2, 5], 'renderer': RENDERERS},
+	'tree'		: {'max_depth': [4, 8], 'branches': [2], 'renderer': RENDERERS},
+	'ellipses'	: {'depth': [2, 4], 'renderer': RENDERERS},
+	'lightning'	: {'n_main': [1], 'n_side': [0, 5], 'renderer': RENDERERS},
+	'tiling'	: {'direction': [0]},
+}
+
+METRICS = ('seconds', 'peak_rss_kb', 'calls', 'bytes_in')
+
+
+
+def case_key(case):
+	settings = ' '.join('{}={}'.format(k, v) for k, v in sorted(case['args'].items()))
+	return '{} {}x{} {}'.format(case['plugin'], case['size'], case['size'], settings).strip()
+
+
+# every combination of the swept settings, at every size
+def make_cases(plugins, sizes, quick=False, seed=DEFAULT_SEED):
+	cases = []
+	for plugin in plugins:
+		sweep, follow = GRID[plugin]
+		if quick:
+			sweep = QUICK_GRID[plugin]
+		keys = sorted(sweep.keys())
+
+		for size in sizes:
+			for values in itertools.product(*[sweep[k] for k in keys]):
+				args = dict(zip(keys, values))
+				if follow is not None:
+					args.update(follow(size))
+				cases.append({ 'plugin': plugin, 'size': size, 'args': args, 'seed': seed })
+	return cases
+
+
+# adds up the phases with the same name (the lightning one loops through them once per bolt)
+def merge_phases(phases):
+	merged = {}
+	for phase in phases:
+		total = merged.setdefault(phase['name'], { 'seconds': 0.0, 'calls': 0, 'bytes_in': 0, 'bytes_out': 0, 'peak_rss_kb': None, 'order': len(merged) })
+		for key in ('seconds', 'calls', 'bytes_in', 'bytes_out'):
+			total[key] += phase[key]
+		total['peak_rss_kb'] = max(total['peak_rss_kb'], phase['peak_rss_kb'])
+	return merged
+
+
+# runs one case in this process - see run_case for the normal way in
+def measure(case):
+	from headless import run
+	from headless.recorder import recorder
+
+	results, image = run.run_plugin(case['plugin'], case['size'], case['size'], case['args'], case['seed'])
+	totals = results['pdb']['totals']
+	return {
+		'status'		: 'ok',
+		'seconds'		: results['seconds'],
+		'peak_rss_kb'	: recorder.peak_rss(),
+		'calls'			: totals['calls'],
+		'bytes_in'		: totals['bytes_in'],
+		'bytes_out'		: totals['bytes_out'],
+		'phases'		: merge_phases(results['pdb']['phases']),
+		'layers'		: len(results['image']['layers']),
+		'messages'		: results['messages'],
+	}
+
+
+# runs one case in a new python process, so it starts with a clean slate and can be killed if it runs away
+def run_case(case, timeout=DEFAULT_TIMEOUT):
+	command = [sys.executable, os.path.realpath(__file__), 'case', json.dumps(case)]
+	process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=repo_directory)
+
+	started = time.time()
+	while process.poll() is None:
+		if time.time() - started > timeout:
+			process.kill()
+			process.wait()
+			return { 'status': 'timeout', 'seconds': time.time() - started }
+		time.sleep(0.05)
+
+	stdout, stderr = process.communicate()
+	if process.returncode != 0:
+		return { 'status': 'error', 'error': stderr.strip().splitlines()[-1] if stderr.strip() else 'exit code {}'.format(process.returncode) }
+	return json.loads(stdout.strip().splitlines()[-1])
+
+
+def environment():
+	try:
+		commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_directory, stderr=subprocess.STDOUT).strip()
+	except (OSError, subprocess.CalledProcessError):
+		commit = None
+	try:
+		import numpy
+		numpy_version = numpy.__version__
+	except ImportError:
+		numpy_version = None
+
+	return {
+		'commit'	: commit,
+		'date'		: time.strftime('%Y-%m-%d %H:%M:%S'),
+		'python'	: platform.python_version(),
+		'numpy'		: numpy_version,
+		'machine'	: platform.platform(),
+	}
+
+
+def format_row(key, result):
+	if result['status'] != 'ok':
+		return "{:<70} {}".format(key, result['status'].upper() + (': ' + result['error'] if 'error' in result else ''))
+	return "{:<70} {:>9.3f}s {:>9} KB {:>8} calls {:>12} bytes".format(key, result['seconds'], result['peak_rss_kb'], result['calls'], result['bytes_in'])
+
+
+def run_benchmarks(options):
+	plugins = options.plugins.split(',') if options.plugins else sorted(GRID.keys())
+	sizes = [int(s) for s in options.sizes.split(',')] if options.sizes else (SIZES if options.full else QUICK_SIZES)
+	cases = make_cases(plugins, sizes, quick=not options.full, seed=options.seed)
+
+	results = []
+	for case in cases:
+		key = case_key(case)
+		result = run_case(case, options.timeout)
+		result['key'] = key
+		result['case'] = case
+		results.append(result)
+		print format_row(key, result)
+		sys.stdout.flush()
+
+		if options.phases and result['status'] == 'ok':
+			for name, phase in sorted(result['phases'].items(), key=lambda item: item[1]['order']):
+				print "    {:<66} {:>9.3f}s {:>9} KB {:>8} calls {:>12} bytes".format(name, phase['seconds'], phase['peak_rss_kb'], phase['calls'], phase['bytes_in'])
+
+	if options.output:
+		with open(options.output, 'w') as f:
+			json.dump({ 'environment': environment(), 'results': results }, f, indent=1, sort_keys=True)
+	return 0
+
+
+# new/old for each metric of every case found in both files; returns how many got worse
+def compare(old_file, new_file, threshold=DEFAULT_THRESHOLD):
+	old = dict((r['key'], r) for r in json.load(open(old_file))['results'])
+	new = dict((r['key'], r) for r in json.load(open(new_file))['results'])
+
+	worse = 0
+	print "{:<70} {:>9} {:>9} {:>9} {:>9}".format('', *METRICS)
+	for key in sorted(set(old) & set(new)):
+		before, after = old[key], new[key]
+		if before['status'] != 'ok' or after['status'] != 'ok':
+			print "{:<70} {} -> {}".format(key, before['status'], after['status'])
+			worse += after['status'] != 'ok' and before['status'] == 'ok'
+			continue
+
+		ratios, flags = [], []
+		for metric in METRICS:
+			if not before.get(metric) or after.get(metric) is None:
+				ratios.append('-')
+				continue
+			ratio = float(after[metric]) / float(before[metric])
+			ratios.append('{:.2f}x'.format(ratio))
+			if (metric in ('seconds', 'peak_rss_kb') and ratio > threshold) or (metric in ('calls', 'bytes_in') and ratio > 1.0):
+				flags.append(metric)
+
+		print "{:<70} {:>9} {:>9} {:>9} {:>9} {}".format(key, *(ratios + ['WORSE: ' + ', '.join(flags) if flags else '']))
+		worse += bool(flags)
+
+	for key in sorted(set(old) ^ set(new)):
+		print "{:<70} only in {}".format(key, 'old' if key in old else 'new')
+	return worse
+
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmarks the plugins without gimp.')
+	commands = parser.add_subparsers(dest='command')
+
+	runner = commands.add_parser('run', help='run the benchmarks')
+	runner.add_argument('--plugins', help='comma separated, any of: {} (default all)'.format(', '.join(sorted(GRID.keys()))))
+	runner.add_argument('--sizes', help='comma separated image sizes (square), default {} or with --full {}'.format(QUICK_SIZES, SIZES))
+	runner.add_argument('--full', action='store_true', help='sweep every setting, not just a couple of each')
+	runner.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds before a run is given up on')
+	runner.add_argument('--seed', type=int, default=DEFAULT_SEED)
+	runner.add_argument('--phases', action='store_true', help='print each phase as well')
+	runner.add_argument('--output', metavar='FILE', help='write the results here as JSON')
+
+	comparer = commands.add_parser('compare', help='compare two sets of results')
+	comparer.add_argument('old')
+	comparer.add_argument('new')
+	comparer.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='time/memory ratio that counts as worse')
+
+	single = commands.add_parser('case', help=argparse.SUPPRESS)
+	single.add_argument('case')
+
+	options = parser.parse_args(argv)
+
+	if options.command == 'case':
+		print json.dumps(measure(json.loads(options.case)))
+		return 0
+	if options.command == 'compare':
+		return 1 if compare(options.old, options.new, options.threshold) else 0
+	return run_benchmarks(options)
+
+
+if __name__ == '__main__':
+	sys.exit(main())
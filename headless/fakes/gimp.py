@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gimp module - see headless/run.py
+#
+
+from headless.model import Color, Item, Channel, Vectors
+from headless import model
+from headless.procedures import pdb
+
+
+procedures = {}		# everything installed, proc_name: details (and 'run' once gimp.main has seen it)
+_installing = []
+_images = []
+
+
+
+class Image(model.Image):
+	def __init__(self, width, height, base_type=model.RGB):
+		super(Image, self).__init__(width, height, base_type)
+		_images.append(self)
+
+class Layer(model.Layer):
+	pass
+
+class GroupLayer(model.GroupLayer):
+	pass
+
+
+
+# the real one asks gimp what to do and then calls query or run; here it just registers everything, ready to be run later
+def main(init, quit, query, run):
+	del _installing[:]
+	if query is not None:
+		query()
+	for proc_name in _installing:
+		procedures[proc_name]['run'] = run
+
+def install_procedure(proc_name, blurb, help, author, copyright, date, label, image_types, proc_type, params, return_vals):
+	procedures[proc_name] = {
+		'kind'		: 'pythonfu',
+		'label'		: label,
+		'image_types' : image_types,
+		'params'	: params,
+		'return_vals' : return_vals,
+	}
+	_installing.append(proc_name)
+
+def menu_register(proc_name, menu_path):
+	procedures[proc_name]['menu'] = menu_path
+
+def image_list():
+	return list(_images)
+
+def message(text):
+	pdb.procedures.messages.append(text)
@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gimpcolor module - see headless/run.py
+#
+
+from headless.model import Color as RGB
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gimpenums module - see headless/run.py
+#
+
+# only the enums the plugins use, with gimp 2.10's values
+
+from headless.model import RGB, GRAY, INDEXED, RGB_IMAGE, RGBA_IMAGE, GRAY_IMAGE, GRAYA_IMAGE
+
+PDB_INT32, PDB_INT16, PDB_INT8, PDB_FLOAT, PDB_STRING = 0, 1, 2, 3, 4
+PDB_INT32ARRAY, PDB_INT16ARRAY, PDB_INT8ARRAY, PDB_FLOATARRAY, PDB_STRINGARRAY = 5, 6, 7, 8, 9
+PDB_COLOR, PDB_ITEM, PDB_DISPLAY, PDB_IMAGE, PDB_LAYER, PDB_CHANNEL, PDB_DRAWABLE = 10, 11, 12, 13, 14, 15, 16
+PDB_SELECTION, PDB_COLORARRAY, PDB_VECTORS, PDB_PARASITE, PDB_STATUS = 17, 18, 19, 20, 21
+
+INTERNAL, PLUGIN, EXTENSION, TEMPORARY = 0, 1, 2, 3
+RUN_INTERACTIVE, RUN_NONINTERACTIVE, RUN_WITH_LAST_VALS = 0, 1, 2
+
+LAYER_MODE_NORMAL_LEGACY = 0
+LAYER_MODE_NORMAL = 28
+LAYER_MODE_MULTIPLY = 30
+LAYER_MODE_SCREEN = 31
+LAYER_MODE_OVERLAY = 23
+LAYER_MODE_ADDITION = 33
+LAYER_MODE_HARDLIGHT = 44
+LAYER_MODE_SOFTLIGHT = 45
+
+EXPAND_AS_NECESSARY, CLIP_TO_IMAGE, CLIP_TO_BOTTOM_LAYER, FLATTEN_IMAGE = 0, 1, 2, 3
+CHANNEL_OP_ADD, CHANNEL_OP_SUBTRACT, CHANNEL_OP_REPLACE, CHANNEL_OP_INTERSECT = 0, 1, 2, 3
+FILL_FOREGROUND, FILL_BACKGROUND, FILL_WHITE, FILL_TRANSPARENT, FILL_PATTERN = 0, 1, 2, 3, 4
+
+ADD_MASK_WHITE, ADD_MASK_BLACK, ADD_MASK_ALPHA = 0, 1, 2
+ADD_WHITE_MASK, ADD_BLACK_MASK, ADD_ALPHA_MASK = ADD_MASK_WHITE, ADD_MASK_BLACK, ADD_MASK_ALPHA
+MASK_APPLY, MASK_DISCARD = 0, 1
+
+GRADIENT_LINEAR, GRADIENT_BILINEAR, GRADIENT_RADIAL = 0, 1, 2
+PAINT_CONSTANT, PAINT_INCREMENTAL = 0, 1
+VECTORS_STROKE_TYPE_BEZIER = 0
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gimpfu module - see headless/run.py
+#
+
+import math
+import gimp, gimpcolor
+from gimpenums import *
+
+pdb = gimp.pdb
+
+
+PF_INT8, PF_INT16, PF_INT32, PF_FLOAT, PF_STRING = PDB_INT8, PDB_INT16, PDB_INT32, PDB_FLOAT, PDB_STRING
+PF_INT, PF_VALUE = PF_INT32, PF_STRING
+PF_COLOR, PF_ITEM, PF_DISPLAY, PF_IMAGE, PF_LAYER = PDB_COLOR, PDB_ITEM, PDB_DISPLAY, PDB_IMAGE, PDB_LAYER
+PF_CHANNEL, PF_DRAWABLE, PF_VECTORS = PDB_CHANNEL, PDB_DRAWABLE, PDB_VECTORS
+PF_COLOUR = PF_COLOR
+PF_TOGGLE, PF_SLIDER, PF_SPINNER, PF_FONT, PF_FILE, PF_BRUSH = 1000, 1001, 1002, 1003, 1004, 1005
+PF_PATTERN, PF_GRADIENT, PF_RADIO, PF_TEXT, PF_PALETTE = 1006, 1007, 1008, 1009, 1010
+PF_FILENAME, PF_DIRNAME, PF_OPTION = 1011, 1012, 1013
+PF_BOOL, PF_ADJUSTMENT = PF_TOGGLE, PF_SPINNER
+
+
+
+def register(proc_name, blurb, help, author, copyright, date, label, imagetypes, params, results, function, menu=None, domain=None, on_query=None, on_run=None):
+	proc_name = proc_name.replace('_', '-')
+	if not proc_name.startswith(('python-', 'extension-', 'plug-in-', 'file-')):
+		proc_name = 'python-fu-' + proc_name
+
+	gimp.procedures[proc_name] = {
+		'kind'		: 'gimpfu',
+		'label'		: label,
+		'image_types' : imagetypes,
+		'params'	: params,
+		'return_vals' : results,
+		'function'	: function,
+	}
+
+def main():
+	pass
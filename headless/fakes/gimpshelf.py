@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gimpshelf module - see headless/run.py
+#
+
+shelf = {}		# the real one keeps settings for the rest of the gimp session; a dict does that here
@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gimpui module - see headless/run.py
+#
+
+import gtk
+
+
+class ProgressBar(gtk.Widget): pass
+class ColorSelector(gtk.Widget): pass
@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gobject module - see headless/run.py
+#
+
+# nothing waits for the gui to go idle here, so things just run straight away
+def idle_add(function, *args):
+	function(*args)
+	return 0
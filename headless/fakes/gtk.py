@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless stand-in for gimp's gtk module - see headless/run.py
+#
+
+# Just enough for the widget classes to be defined; no dialog ever gets shown
+
+
+JUSTIFY_LEFT, JUSTIFY_RIGHT, JUSTIFY_CENTER, JUSTIFY_FILL = 0, 1, 2, 3
+WIN_POS_NONE, WIN_POS_CENTER, WIN_POS_MOUSE, WIN_POS_CENTER_ALWAYS, WIN_POS_CENTER_ON_PARENT = 0, 1, 2, 3, 4
+POS_LEFT, POS_RIGHT, POS_TOP, POS_BOTTOM = 0, 1, 2, 3
+SHADOW_NONE = 0
+MESSAGE_ERROR = 3
+BUTTONS_CLOSE = 2
+RESPONSE_OK, RESPONSE_CANCEL, RESPONSE_HELP = -5, -6, -11
+STOCK_OK, STOCK_CANCEL, STOCK_HELP = 'gtk-ok', 'gtk-cancel', 'gtk-help'
+
+
+
+# every method any widget might call just does nothing
+class Widget(object):
+	def __init__(self, *args, **kwargs):
+		pass
+
+	def __getattr__(self, name):
+		if name.startswith('__'):
+			raise AttributeError(name)
+		return lambda *args, **kwargs: None
+
+class HBox(Widget): pass
+class VBox(Widget): pass
+class Label(Widget): pass
+class Button(Widget): pass
+class ToggleButton(Widget): pass
+class ColorButton(Widget): pass
+class Entry(Widget): pass
+class HScale(Widget): pass
+class HSeparator(Widget): pass
+class Alignment(Widget): pass
+class Notebook(Widget): pass
+class ProgressBar(Widget): pass
+class Dialog(Widget): pass
+class MessageDialog(Widget): pass
+
+
+class ComboBox(Widget):
+	def __init__(self, *args, **kwargs):
+		self.items = []
+		self.active = -1
+
+	def append_text(self, text):
+		self.items.append(text)
+
+	def set_active(self, index):
+		self.active = index
+
+	def get_active(self):
+		return self.active
+
+def combo_box_new_text():
+	return ComboBox()
+
+
+class gdk(object):
+	class Color(object):
+		def __init__(self, red=0.0, green=0.0, blue=0.0):
+			self.red_float, self.green_float, self.blue_float = red, green, blue
+
+
+def main():
+	pass
+
+def main_quit(*args):
+	pass
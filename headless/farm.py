@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless Farm v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Plots the lines for a whole file of parameter sets at once, outside of gimp
+# and on every core, leaving gimp nothing to do but draw them, eg.
+#
+#   python headless/farm.py koch sets.csv --size 4000x4000 --output plotted/
+#   gimp -i -b '(python-fu-koch_curves-batch RUN-NONINTERACTIVE "plotted/sets.json" "4000x4000" "out/{set}.png")' -b '(gimp-quit 0)'
+#
+# The parameter sets are the same JSON or CSV files that the batch procedures
+# take (see classes/batch.py). Each set's lines get saved to a geometry file as
+# soon as its worker is done with it, and sets.json lists them all, along with
+# the rest of each set's settings, ready for the batch procedure to draw.
+#
+# Works with any MyGTK plugin that has a plot_function; that's lightning, koch,
+# sierpinski and tree. The geometry is plotted for the one image size, so draw it on an
+# image of that size too.
+#
+
+import os, sys, json, time, argparse, multiprocessing
+this_directory = os.path.dirname(os.path.realpath(__file__)) + os.sep
+repo_directory = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + os.sep
+if repo_directory not in sys.path:
+	sys.path.insert(0, repo_directory)
+
+import headless
+headless.install()
+
+
+DEFAULT_SIZE = (1920, 1080)
+
+_plugin = None				# each worker's copy of the plugin
+
+
+
+# loads the plugin into a worker process, just the once
+def start_worker(name):
+	global _plugin
+	from headless import run
+	procedure, proc_name = run.load_plugin(name)
+	_plugin = procedure['run'].im_self
+	if _plugin.plot_function is None:
+		raise ValueError("{} can't be plotted separately from drawing".format(name))
+
+
+# plots one set of parameters; returns (its number, the geometry file's bytes, seconds taken)
+def plot_set(job):
+	import random
+	import gimp
+	from gimpenums import RGB, RGB_IMAGE
+	from headless.procedures import pdb
+	from classes.geometry import geometry_bytes
+
+	number, values, (width, height) = job
+	started = time.time()
+
+	settings, name, seed = _plugin.batch_values(values)
+	if seed is not None:
+		random.seed(seed)
+		try:
+			import numpy
+			numpy.random.seed(seed)
+		except ImportError:
+			pass
+
+	pdb.procedures.reset()
+	image = gimp.Image(width, height, RGB)
+	image.insert_layer(gimp.Layer(image, 'Background', width, height, RGB_IMAGE))
+
+	items = _plugin.plot_function(image, settings)
+	info = { 'plugin': _plugin.proc_name, 'width': width, 'height': height }
+	return number, geometry_bytes(info, items), time.time() - started
+
+
+# each set's name (or its number, if it hasn't one) for its geometry file - which have to differ, even to a filesystem
+# that ignores case, or one set's file would overwrite another's
+def set_names(sets):
+	names = ['{}'.format(values.get('name', '{:03d}'.format(number + 1))) for number, values in enumerate(sets)]
+	seen, duplicates = set(), []
+	for name in names:
+		if name.lower() in seen and name not in duplicates:
+			duplicates.append(name)
+		seen.add(name.lower())
+	if duplicates:
+		raise ValueError("Every set needs a name of its own, but {} came up more than once".format(', '.join(duplicates)))
+	return names
+
+
+def farm(name, parameters, size, output, jobs=None):
+	import classes.mygtk							# always first; it and widgets import each other
+	from classes.batch import read_parameter_sets
+
+	sets = read_parameter_sets(parameters)
+	names = set_names(sets)
+	if not os.path.isdir(output):
+		os.makedirs(output)
+
+	pool = multiprocessing.Pool(jobs, start_worker, (name,))
+	started = time.time()
+	manifest = [None] * len(sets)
+	try:
+		for number, data, seconds in pool.imap_unordered(plot_set, [(i, values, size) for i, values in enumerate(sets)]):
+			values = dict(sets[number])
+			set_name = names[number]
+			filename = os.path.abspath(os.path.join(output, '{}.geometry'.format(set_name)))
+			with open(filename, 'wb') as f:
+				f.write(data)
+
+			values['name'] = set_name
+			values['geometry'] = filename
+			manifest[number] = values
+			print "{:<40} {:>8.3f}s {:>12} bytes".format(set_name, seconds, len(data))
+			sys.stdout.flush()
+	finally:
+		pool.terminate()
+		pool.join()
+
+	with open(os.path.join(output, 'sets.json'), 'w') as f:
+		json.dump({ 'size': size, 'sets': manifest }, f, indent=1, sort_keys=True)
+	print "{} sets in {:.3f}s".format(len(sets), time.time() - started)
+	return manifest
+
+
+
+def main(argv=None):
+	plottable = ['lightning', 'koch', 'sierpinski', 'tree']
+
+	parser = argparse.ArgumentParser(description='Plots lots of sets of plugin lines at once, ready for gimp to draw.')
+	parser.add_argument('plugin', choices=plottable)
+	parser.add_argument('parameters', help='JSON or CSV file of parameter sets')
+	parser.add_argument('--size', default='{}x{}'.format(*DEFAULT_SIZE), help='image size, WIDTHxHEIGHT')
+	parser.add_argument('--output', default='plotted', help='folder for the geometry files and sets.json')
+	parser.add_argument('--jobs', type=int, default=None, help='worker processes (default one per core)')
+	options = parser.parse_args(argv)
+
+	size = tuple(int(n) for n in options.size.lower().split('x'))
+	farm(options.plugin, options.parameters, size, options.output, options.jobs)
+
+
+if __name__ == '__main__':
+	main()
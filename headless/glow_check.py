@@ -0,0 +1,526 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Glow Check v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Checks that the glow the Local Rasterizer works out round a main lightning
+# bolt (draw_glow) still looks like the one gimp makes with its own blurs, zooms
+# and pinches (draw_beziers_lighting) - both underlay layers, against reference
+# renders of them in headless/references, eg.
+#
+#   python headless/glow_check.py
+#   gimp -i --batch-interpreter python-fu-eval -b "import sys; sys.argv = ['glow_check.py', 'make', '--gimp']; execfile('headless/glow_check.py', {'__file__': 'headless/glow_check.py', '__name__': '__main__'})" -b "pdb.gimp_quit(0)"
+#
+# The first draws each case headless and compares; the second (re)makes the
+# references in gimp, with its paint tools and filters. Each reference is a PNG
+# of the one layer on a transparent, image sized canvas, and references.json
+# keeps the settings, each layer's opacity and mode, and what drew them. Running
+# make without --gimp draws them with a model of gimp 2.10's filters and merges
+# instead (draw_stack) - every blur, brightness/contrast, merge, zoom and pinch
+# the plugin asks gimp for, one pass at a time on a whole 8 bit layer, the way
+# gegl does them, and none of the rasterizer's shortcuts. That's what the
+# references here were made with, and compare says so - only gimp itself can
+# say whether the model is right.
+#
+# Differences are in 0-255 levels. A layer passes if its alpha is on average
+# no more than ALPHA_TOLERANCE out (ZOOMED_ALPHA_TOLERANCE for the second
+# underlay, as the rasterizer zooms it on a coarse grid) where the blurs,
+# zooms and pinch put the glow, the color of its visible pixels (alpha of
+# VISIBLE or more) no more than COLOR_TOLERANCE out on average (the
+# brightness/contrast steps) and no more than BIAS_TOLERANCE lighter or darker
+# overall (the hard light merge, which only shifts it a little - but all one
+# way, unlike rounding), and no more than OUTLIER_SHARE of its pixels have
+# their alpha, or a visible color, more than OUTLIER_TOLERANCE out. Its
+# opacity and mode have to match exactly. --output saves the rasterizer's
+# layers and a difference image of each, to see where any of it went wrong.
+#
+
+import os, sys, math, json, zlib, struct, argparse
+this_directory = os.path.dirname(os.path.realpath(__file__)) + os.sep
+repo_directory = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + os.sep
+if repo_directory not in sys.path:
+	sys.path.insert(0, repo_directory)
+
+import numpy
+
+
+REFERENCES = os.path.join(this_directory, 'references')
+REFERENCE_FILE = os.path.join(REFERENCES, 'references.json')
+PROCEDURE = 'python-fu-lightning'
+
+ALPHA_TOLERANCE = 0.5		# average alpha difference, over the whole layer
+ZOOMED_ALPHA_TOLERANCE = 2.0	# the same for the second underlay, whose zooms the rasterizer works out on a coarse grid
+COLOR_TOLERANCE = 1.5		# average color difference, over the visible pixels
+BIAS_TOLERANCE = 0.4		# how much lighter or darker those can be, on average
+VISIBLE = 16				# the least alpha a pixel's color is compared at
+OUTLIER_TOLERANCE = 24		# any pixel with a channel further out than this is an outlier
+OUTLIER_SHARE = 0.01		# and up to this much of the layer can be outliers
+
+LAYERS = ('Main Bolt (Underlay)', 'Main Bolt (Underlay 2)')
+
+# what gets checked, and the most each can be out by
+CHECKS = {
+	LAYERS[0]	: (('alpha', ALPHA_TOLERANCE), ('color', COLOR_TOLERANCE), ('bias', BIAS_TOLERANCE), ('outliers', OUTLIER_SHARE)),
+	LAYERS[1]	: (('alpha', ZOOMED_ALPHA_TOLERANCE), ('color', COLOR_TOLERANCE), ('bias', BIAS_TOLERANCE), ('outliers', OUTLIER_SHARE)),
+}
+
+# every setting the plugin has, so gimp can be handed the lot without loading the plugin itself; one main bolt and
+# no side bolts, so the underlays are all there is to them
+SETTINGS = {
+	'start_x'				: 10,
+	'start_y'				: 50,
+	'mid_x'					: 40,
+	'mid_y'					: 40,
+	'end_x'					: 90,
+	'end_y'					: 60,
+	'n_main'				: 1,
+	'n_side'				: 0,
+	'side_style'			: 0,
+	'renderer'				: 0,
+	'compact_layers'		: False,
+	'move_end_point_a_bit'	: True,
+	'seed'					: 1,
+	'color_bolt'			: '#ffffff',
+	'color_lighting'		: '#5a82ff',
+}
+
+# name, image size, changes to the settings above - wider than tall and taller than wide, for the pinch's scaling
+CASES = [
+	('landscape',	(400, 300),	{}),
+	('portrait',	(300, 400),	{'start_x': 50, 'start_y': 5, 'mid_x': 35, 'mid_y': 45, 'end_x': 60, 'end_y': 95, 'seed': 7}),
+]
+
+PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+
+# how the stack model (see draw_stack) does gimp 2.10's filters and merges
+RADIUS_TO_SIGMA = 0.32		# plug_in_gauss radius -> gegl:gaussian-blur std-dev
+GAUSS_EXTENT = 3			# and its kernel reaches out this many (rounded up) std-devs
+ZOOM_LENGTH = 256.0			# plug_in_mblur zoom length -> gegl:motion-blur-zoom factor
+ZOOM_NOMINAL = 100			# motion-blur-zoom takes a sample per pixel along each line, up to this many
+ZOOM_MOST = 200				# and past that only sqrt(the rest) more, up to this many
+
+
+
+# "#rrggbb" -> (r, g, b)
+def to_rgb(value):
+	return tuple(int(value.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
+
+
+def reference_name(case, layer_name):
+	return '{}-{}.png'.format(case, 'underlay-2' if layer_name.endswith('2)') else 'underlay')
+
+
+# 8 bit RGB or RGBA, not interlaced (as gimp saves them) -> (height, width, 4) uint8 array
+def read_png(filename):
+	with open(filename, 'rb') as f:
+		data = f.read()
+	if data[:8] != PNG_SIGNATURE:
+		raise ValueError("{} isn't a PNG".format(filename))
+
+	position, chunks = 8, []
+	while position < len(data):
+		length, kind = struct.unpack('>I4s', data[position:position+8])
+		body = data[position+8:position+8+length]
+		position += length + 12
+		if kind == 'IHDR':
+			width, height, depth, color, compression, filtering, interlace = struct.unpack('>IIBBBBB', body)
+			if depth != 8 or color not in (2, 6) or interlace:
+				raise ValueError("{} needs to be 8 bit RGB(A) and not interlaced".format(filename))
+		elif kind == 'IDAT':
+			chunks.append(body)
+		elif kind == 'IEND':
+			break
+
+	channels = 4 if color == 6 else 3
+	rows = numpy.frombuffer(zlib.decompress(''.join(chunks)), dtype=numpy.uint8).reshape(height, width * channels + 1)
+	pixels = numpy.zeros((height, width * channels), dtype=numpy.int32)
+	above = numpy.zeros(width * channels, dtype=numpy.int32)
+	for y in xrange(height):
+		kind, line = rows[y,0], rows[y,1:].astype(numpy.int32)
+		if kind == 0:
+			row = line
+		elif kind == 1:
+			row = numpy.cumsum(line.reshape(width, channels), axis=0).ravel() & 255
+		elif kind == 2:
+			row = (line + above) & 255
+		else:
+			# average and paeth both need the pixel to the left already done, so a pixel at a time
+			row = numpy.zeros(width * channels, dtype=numpy.int32)
+			left = numpy.zeros(channels, dtype=numpy.int32)
+			corner = numpy.zeros(channels, dtype=numpy.int32)
+			for x in xrange(0, width * channels, channels):
+				up = above[x:x+channels]
+				if kind == 3:
+					guess = (left + up) // 2
+				else:
+					p = left + up - corner
+					pa, pb, pc = numpy.abs(p - left), numpy.abs(p - up), numpy.abs(p - corner)
+					guess = numpy.where((pa <= pb) & (pa <= pc), left, numpy.where(pb <= pc, up, corner))
+				left = (line[x:x+channels] + guess) & 255
+				row[x:x+channels] = left
+				corner = up
+		pixels[y] = above = row
+
+	pixels = pixels.reshape(height, width, channels).astype(numpy.uint8)
+	if channels == 3:
+		pixels = numpy.concatenate((pixels, numpy.empty((height, width, 1), dtype=numpy.uint8)), axis=2)
+		pixels[:,:,3] = 255
+	return pixels
+
+
+# (height, width, 4) uint8 array -> RGBA PNG, unfiltered
+def write_png(filename, pixels):
+	height, width = pixels.shape[:2]
+	rows = numpy.concatenate((numpy.zeros((height, 1), dtype=numpy.uint8), pixels.reshape(height, width * 4)), axis=1)
+
+	def chunk(kind, body):
+		return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body) & 0xffffffff)
+
+	with open(filename, 'wb') as f:
+		f.write(PNG_SIGNATURE)
+		f.write(chunk('IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+		f.write(chunk('IDAT', zlib.compress(rows.tostring(), 9)))
+		f.write(chunk('IEND', ''))
+
+
+# how far out one layer is from another, as {check: amount} (see CHECKS) plus the worst single difference
+def difference(pixels, reference):
+	diff = pixels.astype(numpy.float64) - reference
+	visible = numpy.maximum(pixels[:,:,3], reference[:,:,3]) >= VISIBLE
+	color = diff[:,:,:3][visible] if visible.any() else numpy.zeros(1)
+	return {
+		'alpha'		: numpy.abs(diff[:,:,3]).mean(),
+		'color'		: numpy.abs(color).mean(),
+		'bias'		: abs(color.mean()),
+		'outliers'	: (numpy.maximum(numpy.abs(diff[:,:,3]), numpy.abs(diff[:,:,:3]).max(axis=2) * visible) > OUTLIER_TOLERANCE).mean(),
+		'worst'		: max(numpy.abs(diff[:,:,3]).max(), numpy.abs(color).max()),
+	}
+
+
+
+# 8 bit srgb (as 0-1 floats) <-> linear light
+def to_linear(values):
+	return numpy.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+def to_srgb(values):
+	values = numpy.clip(values, 0, 1)
+	return numpy.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+
+
+# what gimp keeps after each step of an 8 bit image - straight (not premultiplied) srgb colors and alpha, rounded
+def store(pixels):
+	return numpy.floor(numpy.clip(pixels, 0, 1) * 255 + 0.5) / 255
+
+# straight srgb <-> premultiplied linear, which is what gegl blurs and samples in
+def premultiplied(pixels):
+	return numpy.concatenate((to_linear(pixels[:,:,:3]) * pixels[:,:,3:], pixels[:,:,3:]), axis=2)
+
+def straightened(pixels):
+	alpha = pixels[:,:,3:]
+	rgb = numpy.where(alpha > 0, pixels[:,:,:3] / numpy.maximum(alpha, 1e-12), 0)
+	return store(numpy.concatenate((to_srgb(rgb), alpha), axis=2))
+
+
+# plug_in_gauss - gegl:gaussian-blur's own kernel, one direction at a time, with the layer's edge pixels carried on
+# past it (its default "clamp" abyss policy)
+def stack_gauss(pixels, radius):
+	sigma = radius * RADIUS_TO_SIGMA
+	half = int(math.ceil(sigma)) * GAUSS_EXTENT
+	kernel = numpy.exp(-0.5 * (numpy.arange(-half, half + 1) / sigma) ** 2)
+	kernel /= kernel.sum()
+
+	blurred = premultiplied(pixels)
+	for axis in (0, 1):
+		pad = [(0, 0)] * 3
+		pad[axis] = (half, half)
+		padded = numpy.pad(blurred, pad, 'edge')
+		size = blurred.shape[axis]
+		blurred = sum(weight * padded.take(numpy.arange(i, i + size), axis=axis) for i, weight in enumerate(kernel))
+	return straightened(blurred)
+
+
+# gimp_drawable_brightness_contrast - gimp:brightness-contrast on the straight srgb colors, where the brightness only
+# goes half way (-1 to 1 is -0.5 to 0.5 of the range) and the contrast turns the slope through 0-90 degrees
+def stack_brightness_contrast(pixels, brightness, contrast):
+	rgb = pixels[:,:,:3]
+	brightness /= 2.0
+	rgb = rgb * (1.0 + brightness) if brightness < 0 else rgb + (1.0 - rgb) * brightness
+	rgb = (rgb - 0.5) * math.tan((contrast + 1.0) * math.pi / 4) + 0.5
+	return store(numpy.concatenate((rgb, pixels[:,:,3:]), axis=2))
+
+
+# gimp_image_merge_down of top onto bottom (the same size); gimp 2.10 composites in linear light, normal layers as a
+# union and hard light ones clipped to what's below them, with the hard light blend itself done on the srgb colors
+def stack_merge(top, bottom, mode):
+	top_alpha, alpha = top[:,:,3:], bottom[:,:,3:]
+	upper, lower = to_linear(top[:,:,:3]), to_linear(bottom[:,:,:3])
+
+	if mode == 'hard light':
+		a, b = top[:,:,:3], bottom[:,:,:3]
+		blend = to_linear(numpy.where(a <= 0.5, 2.0 * a * b, 1.0 - 2.0 * (1.0 - a) * (1.0 - b)))
+		rgb = lower + (blend - lower) * top_alpha
+		out = numpy.concatenate((rgb, alpha), axis=2)
+	else:
+		new_alpha = top_alpha + alpha * (1.0 - top_alpha)
+		rgb = (upper * top_alpha + lower * alpha * (1.0 - top_alpha)) / numpy.maximum(new_alpha, 1e-12)
+		out = numpy.concatenate((rgb, new_alpha), axis=2)
+
+	out[:,:,:3] = numpy.where(out[:,:,3:] > 0, to_srgb(out[:,:,:3]), 0)
+	return store(out)
+
+
+# premultiplied pixels looked up bilinearly at (any number of) positions, where pixel x,y is centred on x,y, with
+# nothing beyond the edges
+def sample(pixels, x, y):
+	height, width = pixels.shape[:2]
+	padded = numpy.zeros((height + 2, width + 2, 4))
+	padded[1:-1,1:-1] = pixels
+
+	x, y = numpy.clip(x + 1, 0, width + 1), numpy.clip(y + 1, 0, height + 1)
+	x0, y0 = numpy.minimum(numpy.floor(x), width).astype(numpy.intp), numpy.minimum(numpy.floor(y), height).astype(numpy.intp)
+	fx, fy = (x - x0)[...,None], (y - y0)[...,None]
+	return (padded[y0, x0] * (1 - fx) * (1 - fy) + padded[y0, x0 + 1] * fx * (1 - fy) +
+			padded[y0 + 1, x0] * (1 - fx) * fy + padded[y0 + 1, x0 + 1] * fx * fy)
+
+
+# plug_in_mblur's zoom - gegl:motion-blur-zoom, averaging samples along each pixel's line towards cx,cy, one per
+# pixel of its length (at least 3, and fewer for the longest), of a whole image sized layer
+def stack_zoom(pixels, cx, cy, length):
+	height, width = pixels.shape[:2]
+	factor = min(1.0, length / ZOOM_LENGTH)
+	y, x = numpy.mgrid[0:height, 0:width].astype(numpy.float64)
+	dx, dy = (cx - 0.5 - x) * factor, (cy - 0.5 - y) * factor
+
+	count = numpy.maximum(numpy.ceil(numpy.hypot(dx, dy) + 1), 3)
+	count = numpy.where(count > ZOOM_NOMINAL, numpy.minimum(ZOOM_NOMINAL + numpy.floor(numpy.sqrt(numpy.maximum(count - ZOOM_NOMINAL, 0))), ZOOM_MOST), count)
+
+	source, total = premultiplied(pixels), 0
+	for i in xrange(int(count.max())):
+		step = i / count
+		total = total + numpy.where((i < count)[...,None], sample(source, x + dx * step, y + dy * step), 0)
+	return straightened(total / count[...,None])
+
+
+# plug_in_whirl_pinch with no whirl - gegl:whirl-pinch, each pixel inside the radius (scaled to a circle) taken
+# from further out along the line from the middle of the layer, so the middle bulges
+def stack_pinch(pixels, pinch, radius):
+	height, width = pixels.shape[:2]
+	cx, cy = width / 2.0, height / 2.0
+	scale_x, scale_y = (float(height) / width, 1.0) if width < height else (1.0, float(width) / height)
+	radius2 = (max(cx, cy) * radius) ** 2
+
+	y, x = numpy.mgrid[0:height, 0:width] + 0.5
+	dx, dy = (x - cx) * scale_x, (y - cy) * scale_y
+	d = dx * dx + dy * dy
+	inside = d < radius2
+	factor = numpy.ones_like(d)
+	factor[inside] = numpy.sin(math.pi / 2 * numpy.sqrt(d[inside] / radius2)).clip(1e-9) ** -pinch
+	return straightened(sample(premultiplied(pixels), cx + dx * factor / scale_x - 0.5, cy + dy * factor / scale_y - 0.5))
+
+
+# stands in for the lightning's draw_glow while the references are made: the glow the way draw_beziers_lighting
+# has gimp do it, a filter at a time over full size 8 bit layers, rather than the rasterizer's one pass
+def draw_stack(bolt, group):
+	from classes.raster import Raster
+	lightning = sys.modules[bolt.__module__]
+
+	bolt.set_brush()
+	left, top, width, height = bolt.bounds(lightning.GLOW_LAYERS[-1][0])
+	color = lightning.pdb.gimp_context_get_foreground()
+	stroke = Raster(width, height, left, top)
+	stroke.draw_polyline(bolt.path, color, bolt.brush_size)
+	stroke = numpy.frombuffer(stroke.to_bytes(), dtype=numpy.uint8).reshape(height, width, 4) / 255.0
+
+	layers = []
+	for radius, brightness, contrast in lightning.GLOW_LAYERS:
+		layer = stack_gauss(stroke, radius)
+		if brightness or contrast:
+			layer = stack_brightness_contrast(layer, brightness, contrast)
+		layers.append(layer)
+
+	underlay, mode = layers[0], 'hard light'
+	for layer in layers[1:]:
+		underlay, mode = stack_merge(underlay, layer, mode), 'normal'
+
+	# the copies for the second underlay are the whole image
+	image_width, image_height = bolt.image.width, bolt.image.height
+	whole = numpy.zeros((image_height, image_width, 4))
+	whole[top:top+height, left:left+width] = underlay
+
+	zooms = []
+	for length, adjustments in lightning.GLOW_ZOOMS:
+		zoom = stack_pinch(stack_zoom(whole, bolt.start.x, bolt.start.y, length), *lightning.GLOW_PINCH)
+		for brightness, contrast in adjustments:
+			zoom = stack_brightness_contrast(zoom, brightness, contrast)
+		zooms.append(zoom)
+	underlay2 = stack_merge(zooms[0], zooms[1], 'normal')
+
+	layers = []
+	for pixels, (x, y), name, position, opacity in ((underlay, (left, top), "Main Bolt (Underlay)", 1, 100.0), (underlay2, (0, 0), "Main Bolt (Underlay 2)", 2, 40.0)):
+		raster = Raster(pixels.shape[1], pixels.shape[0], x, y)
+		raster.pixels[:] = numpy.concatenate((pixels[:,:,:3] * pixels[:,:,3:], pixels[:,:,3:]), axis=2)
+		layers.append(raster.to_layer(bolt.image, name, group, position, opacity=opacity))
+	return tuple(layers)
+
+
+# the layers from one headless run of a case, each as an image sized rgba array along with its opacity and mode
+def draw_headless(size, settings):
+	from headless import run
+
+	results, image = run.run_plugin('lightning', size[0], size[1], settings)
+	layers = dict((layer.name, layer) for layer in image.all_layers())
+	drawn = {}
+	for name in LAYERS:
+		layer = layers[name]
+		canvas = numpy.zeros((size[1], size[0], 4), dtype=numpy.uint8)
+		for x, y, w, h, data in layer.regions:
+			area = numpy.frombuffer(data, dtype=numpy.uint8).reshape(h, w, layer.bpp)
+			left, top = x + layer.offsets[0], y + layer.offsets[1]
+			x0, y0, x1, y1 = max(0, left), max(0, top), min(size[0], left + w), min(size[1], top + h)
+			if x1 > x0 and y1 > y0:
+				canvas[y0:y1, x0:x1] = area[y0 - top:y1 - top, x0 - left:x1 - left]
+		drawn[name] = (canvas, layer.opacity, layer.mode)
+	return drawn
+
+
+# the same, but with the glow done by draw_stack instead of the rasterizer
+def draw_modelled(size, settings):
+	from headless import run
+	procedure, proc_name = run.load_plugin('lightning')
+	bolts = sys.modules[procedure['run'].im_self.code_function.__module__].LightningPath
+
+	draw_glow = bolts.draw_glow
+	bolts.draw_glow = draw_stack
+	try:
+		return draw_headless(size, settings)
+	finally:
+		bolts.draw_glow = draw_glow
+
+
+# the same, in gimp, with its own tools and filters; each layer is saved straight to its reference file
+def draw_in_gimp(case, size, settings):
+	from gimpfu import pdb, RGB, RGB_IMAGE, RGBA_IMAGE, LAYER_MODE_NORMAL, FILL_BACKGROUND, RUN_NONINTERACTIVE
+
+	image = pdb.gimp_image_new(size[0], size[1], RGB)
+	background = pdb.gimp_layer_new(image, size[0], size[1], RGB_IMAGE, 'Background', 100.0, LAYER_MODE_NORMAL)
+	pdb.gimp_image_insert_layer(image, background, None, 0)
+	pdb.gimp_drawable_fill(background, FILL_BACKGROUND)
+
+	procedure = pdb[PROCEDURE]
+	values = [to_rgb(settings[name]) if name.startswith('color_') else settings[name] for kind, name, description in procedure.params[3:]]
+	procedure(RUN_NONINTERACTIVE, image, background, *values)
+
+	drawn = {}
+	for name in LAYERS:
+		layer = pdb.gimp_image_get_layer_by_name(image, name)
+		single = pdb.gimp_image_new(size[0], size[1], RGB)
+		copy = pdb.gimp_layer_new_from_drawable(layer, single)
+		pdb.gimp_image_insert_layer(single, copy, None, 0)
+		copy.opacity, copy.mode = 100.0, LAYER_MODE_NORMAL
+		pdb.gimp_layer_resize_to_image_size(copy)
+		filename = os.path.join(REFERENCES, reference_name(case, name))
+		pdb.file_png_save_defaults(single, copy, filename, filename)
+		pdb.gimp_image_delete(single)
+		drawn[name] = (None, layer.opacity, layer.mode)
+
+	pdb.gimp_image_delete(image)
+	return drawn
+
+
+
+# (re)makes every reference, with gimp's tools when run inside it or the stack model otherwise
+def make_references(in_gimp):
+	if not os.path.isdir(REFERENCES):
+		os.makedirs(REFERENCES)
+
+	cases = []
+	for case, size, changes in CASES:
+		settings = dict(SETTINGS, **changes)
+		if in_gimp:
+			drawn = draw_in_gimp(case, size, settings)
+		else:
+			drawn = draw_modelled(size, dict(settings, renderer=1))
+			for name, (pixels, opacity, mode) in drawn.items():
+				write_png(os.path.join(REFERENCES, reference_name(case, name)), pixels)
+
+		cases.append({
+			'name'		: case,
+			'size'		: size,
+			'settings'	: settings,
+			'layers'	: [{ 'name': name, 'file': reference_name(case, name), 'opacity': drawn[name][1], 'mode': drawn[name][2] } for name in LAYERS],
+		})
+		print "made {} ({}x{})".format(case, size[0], size[1])
+
+	with open(REFERENCE_FILE, 'w') as f:
+		json.dump({ 'made_with': 'gimp' if in_gimp else 'stack model', 'cases': cases }, f, indent=1, sort_keys=True, separators=(',', ': '))
+
+
+# draws every case headless with the rasterizer and checks each layer against its reference; returns how many failed
+def compare_references(output=None):
+	with open(REFERENCE_FILE) as f:
+		references = json.load(f)
+	if references['made_with'] != 'gimp':
+		print "NB: these references are glow_check.py's model of gimp's filters, not gimp itself - remake them in gimp to check against the real thing"
+	if output and not os.path.isdir(output):
+		os.makedirs(output)
+
+	failed = 0
+	for case in references['cases']:
+		drawn = draw_headless(case['size'], dict(case['settings'], renderer=1))
+		for layer in case['layers']:
+			pixels, opacity, mode = drawn[layer['name']]
+			reference = read_png(os.path.join(REFERENCES, layer['file']))
+			amounts = difference(pixels, reference)
+
+			checks = CHECKS[layer['name']]
+			problems = [check for check, tolerance in checks if amounts[check] > tolerance]
+			if abs(opacity - layer['opacity']) > 0.01 or mode != layer['mode']:
+				problems.append('opacity/mode {}/{} not {}/{}'.format(opacity, mode, layer['opacity'], layer['mode']))
+			failed += bool(problems)
+
+			print "{:<10} {:<24} {}  worst {:>3.0f}  {}".format(case['name'], layer['name'], '  '.join('{} {:.2f} (<= {})'.format(check, amounts[check], tolerance) for check, tolerance in checks), amounts['worst'], ', '.join(problems) or 'ok')
+
+			if output:
+				stem = os.path.join(output, os.path.splitext(layer['file'])[0])
+				write_png(stem + '.png', pixels)
+				diff = numpy.minimum(255, numpy.abs(pixels.astype(numpy.int32) - reference).max(axis=2) * 4).astype(numpy.uint8)
+				write_png(stem + '-diff.png', numpy.dstack((diff, diff, diff, numpy.full_like(diff, 255))))
+
+	return failed
+
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Checks the rasterized lightning glow against reference renders.')
+	parser.add_argument('command', nargs='?', default='compare', choices=('compare', 'make'))
+	parser.add_argument('--gimp', action='store_true', help='make: running inside gimp, so draw the references with its own tools')
+	parser.add_argument('--output', metavar='DIR', help='compare: save the rasterized layers, and their differences from the references, here')
+	options = parser.parse_args(argv)
+
+	if not options.gimp:
+		import headless
+		headless.install()
+
+	if options.command == 'make':
+		make_references(options.gimp)
+		return 0
+
+	failed = compare_references(options.output)
+	print "{} layer(s) out of tolerance".format(failed) if failed else "all within tolerance"
+	return 1 if failed else 0
+
+
+if __name__ == '__main__':
+	status = main(sys.argv[1:])
+	if status:
+		sys.exit(status)			# not when it's all fine, as gimp's python-fu-eval takes any exit as an error
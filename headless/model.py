@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless Model v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Just enough of gimp's images, layers, channels and paths to keep track of what
+# the plugins do to them when there's no gimp around - does nothing on its own
+#
+
+import math, weakref
+from headless.recorder import recorder
+
+
+# the gimp 2.10 numbers for the types the plugins use
+RGB, GRAY, INDEXED = 0, 1, 2
+RGB_IMAGE, RGBA_IMAGE, GRAY_IMAGE, GRAYA_IMAGE = 0, 1, 2, 3
+BYTES_PER_PIXEL = { RGB_IMAGE: 3, RGBA_IMAGE: 4, GRAY_IMAGE: 1, GRAYA_IMAGE: 2 }
+
+
+
+# a gimpcolor.RGB; floats 0-1 as attributes but 0-255 ints when indexed, same as the real one
+class Color(object):
+	def __init__(self, r=0.0, g=0.0, b=0.0, a=1.0):
+		self.r, self.g, self.b, self.a = [self.channel(c) for c in (r, g, b, a)]
+
+	@staticmethod
+	def channel(value):
+		if isinstance(value, float):
+			return max(0.0, min(1.0, value))
+		return max(0.0, min(1.0, int(value) / 255.0))
+
+	@classmethod
+	def from_value(cls, value):
+		if isinstance(value, Color):
+			return cls(value.r, value.g, value.b, value.a)
+		if isinstance(value, basestring):
+			value = value.lstrip('#')
+			return cls(*[int(value[i:i+2], 16) for i in range(0, 6, 2)])
+		return cls(*tuple(value)[:4])
+
+	def __getitem__(self, index):
+		return int(round((self.r, self.g, self.b, self.a)[index] * 255.0))
+
+	def __len__(self):
+		return 4
+
+	def __iter__(self):
+		return (self[i] for i in range(4))
+
+	def __eq__(self, other):
+		return isinstance(other, Color) and tuple(self) == tuple(other)
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __repr__(self):
+		return "RGB({}, {}, {}, {})".format(self.r, self.g, self.b, self.a)
+
+
+
+# the paint settings that gimp_context_push/pop save and restore
+class Context(object):
+	def __init__(self):
+		self.stack = []
+		self.set_defaults()
+
+	def set_defaults(self):
+		self.foreground = Color(0, 0, 0)
+		self.background = Color(255, 255, 255)
+		self.paint_method = 'gimp-paintbrush'
+		self.brush = '2. Hardness 050'
+		self.brush_size = 51.0
+		self.brush_hardness = 0.5
+		self.antialias = True
+		self.opacity = 100.0
+		self.gradient = 'FG to BG (RGB)'
+
+	def state(self):
+		return dict((k, v) for k, v in self.__dict__.items() if k != 'stack')
+
+	def push(self):
+		self.stack.append(self.state())
+
+	def pop(self):
+		if self.stack:
+			self.__dict__.update(self.stack.pop())
+
+
+
+class Item(object):
+	last_id = 0
+	items = weakref.WeakValueDictionary()		# ID: item, for the procedures that hand back IDs rather than items
+
+	def __init__(self, image, name):
+		Item.last_id += 1
+		self.ID = Item.last_id
+		self.image = image
+		self.name = name
+		self.parent = None
+		self.visible = True
+		Item.items[self.ID] = self
+
+	def __repr__(self):
+		return "<{} {} '{}'>".format(self.__class__.__name__, self.ID, self.name)
+
+	@classmethod
+	def from_id(cls, item_id):
+		return Item.items.get(item_id)
+
+
+
+# pixel data is only kept for whatever has actually been written through a pixel region, as a list of the
+# rectangles written - so a 16k layer doesn't cost 1GB of memory just by existing
+class Drawable(Item):
+	def __init__(self, image, width, height, layer_type, name):
+		super(Drawable, self).__init__(image, name)
+		self.width, self.height = int(width), int(height)
+		self.type = layer_type
+		self.bpp = BYTES_PER_PIXEL.get(layer_type, 1)
+		self.offsets = (0, 0)
+		self.regions = []			# (x, y, width, height, bytes)
+		self.painted = 0			# coords handed to paint tools / stroke items
+
+	def get_pixel_rgn(self, x, y, width, height, dirty=True, shadow=False):
+		return PixelRegion(self, x, y, width, height)
+
+	def flush(self):
+		pass
+
+	def merge_shadow(self, undo=True):
+		pass
+
+	def update(self, x, y, width, height):
+		pass
+
+	def pixel_bytes(self):
+		return sum(len(data) for x, y, w, h, data in self.regions)
+
+	def copy_into(self, other):
+		other.offsets = self.offsets
+		other.regions = list(self.regions)
+		other.painted = self.painted
+		return other
+
+
+class Layer(Drawable):
+	def __init__(self, image, name, width, height, layer_type=RGBA_IMAGE, opacity=100.0, mode=28):
+		super(Layer, self).__init__(image, width, height, layer_type, name)
+		self.opacity = float(opacity)
+		self.mode = mode
+		self.mask = None
+
+	def set_offsets(self, x, y):
+		self.offsets = (int(x), int(y))
+
+	def translate(self, x, y):
+		self.offsets = (self.offsets[0] + int(x), self.offsets[1] + int(y))
+
+	def copy(self):
+		layer = Layer(self.image, self.name + ' copy', self.width, self.height, self.type, self.opacity, self.mode)
+		return self.copy_into(layer)
+
+
+class GroupLayer(Layer):
+	def __init__(self, image, name='Layer Group', opacity=100.0, mode=28):
+		super(GroupLayer, self).__init__(image, name, image.width if image else 0, image.height if image else 0, RGBA_IMAGE, opacity, mode)
+		self.layers = []
+
+
+class Channel(Drawable):
+	def __init__(self, image, name, width, height, opacity=100.0, color=None):
+		super(Channel, self).__init__(image, width, height, GRAY_IMAGE, name)
+		self.opacity = float(opacity)
+		self.color = color
+		self.selection = None		# what a saved selection saved, as Image.selection
+
+
+
+# a path; each stroke is kept as its flat control point list, same as gimp_vectors_stroke_get_points hands back
+class Vectors(Item):
+	def __init__(self, image, name):
+		super(Vectors, self).__init__(image, name)
+		self.strokes = {}
+		self.last_stroke = 0
+
+	def new_stroke(self, stroke_type, points, closed):
+		self.last_stroke += 1
+		self.strokes[self.last_stroke] = [stroke_type, [float(p) for p in points], bool(closed)]
+		return self.last_stroke
+
+	def points(self):
+		return sum(len(s[1]) for s in self.strokes.values()) / 2
+
+	# (x, y, width, height) around every control point, or None if there aren't any
+	def bounds(self):
+		points = [p for s in self.strokes.values() for p in s[1]]
+		if not points:
+			return None
+		left, top = int(math.floor(min(points[0::2]))), int(math.floor(min(points[1::2])))
+		return left, top, int(math.ceil(max(points[0::2]))) - left, int(math.ceil(max(points[1::2]))) - top
+
+	def rotate_stroke(self, stroke_id, cx, cy, degrees):
+		# gimp's angle is in degrees clockwise, which with y pointing down is the usual rotation matrix
+		radians = math.radians(degrees)
+		c, s = math.cos(radians), math.sin(radians)
+		points = self.strokes[stroke_id][1]
+		for i in range(0, len(points), 2):
+			x, y = points[i] - cx, points[i+1] - cy
+			points[i], points[i+1] = cx + (x * c) - (y * s), cy + (x * s) + (y * c)
+
+
+
+class Image(object):
+	last_id = 0
+
+	def __init__(self, width, height, base_type=RGB):
+		Image.last_id += 1
+		self.ID = Image.last_id
+		self.width, self.height = int(width), int(height)
+		self.base_type = base_type
+		self.layers = []
+		self.vectors = []
+		self.channels = []
+		self.guides = []
+		self.active_layer = None
+		self.selection = None		# (x, y, width, height) or None for everything
+		self.undo_frozen = 0
+		self.undo_groups = 0
+		self.filename = None
+		self.deleted = False
+
+	def __repr__(self):
+		return "<Image {} {}x{}>".format(self.ID, self.width, self.height)
+
+	def container(self, item):
+		return item.parent.layers if item.parent is not None else self.layers
+
+	def insert_layer(self, layer, parent=None, position=0):
+		layer.image = self
+		layer.parent = parent if parent is not None and hasattr(parent, 'layers') else None
+		siblings = self.container(layer)
+		position = max(0, min(position, len(siblings)))		# -1 is "above the active layer" to gimp; the top will do here
+		siblings.insert(position, layer)
+		self.active_layer = layer
+
+	def remove_layer(self, layer):
+		self.container(layer).remove(layer)
+		if self.active_layer is layer:
+			self.active_layer = self.layers[0] if self.layers else None
+
+	# a copy of the image and its top level layers (which is all the plugins ever give it)
+	def duplicate(self):
+		image = Image(self.width, self.height, self.base_type)
+		image.filename = self.filename
+		for layer in reversed(self.layers):
+			copy = layer.copy()
+			copy.name = layer.name
+			image.insert_layer(copy)
+		image.active_layer = image.layers[self.layers.index(self.active_layer)] if self.active_layer in self.layers else None
+		return image
+
+	# every layer merged into one image sized one; returns the new layer
+	def flatten(self):
+		layer = Layer(self, 'Background', self.width, self.height, RGB_IMAGE)
+		for other in self.all_layers():
+			layer.regions += other.regions
+			layer.painted += other.painted
+		self.layers = []
+		self.insert_layer(layer)
+		return layer
+
+	def position(self, item):
+		return self.container(item).index(item)
+
+	def all_layers(self, layers=None):
+		for layer in (layers if layers is not None else self.layers):
+			yield layer
+			if hasattr(layer, 'layers'):
+				for child in self.all_layers(layer.layers):
+					yield child
+
+	# flat summary of everything in the image - handy for comparing two runs
+	def summary(self):
+		return {
+			'width'		: self.width,
+			'height'	: self.height,
+			'layers'	: [{
+				'name'		: layer.name,
+				'size'		: (layer.width, layer.height),
+				'offsets'	: layer.offsets,
+				'opacity'	: layer.opacity,
+				'mode'		: layer.mode,
+				'painted'	: layer.painted,
+				'pixel_bytes' : layer.pixel_bytes(),
+			} for layer in self.all_layers()],
+			'vectors'	: [{
+				'name'		: vectors.name,
+				'strokes'	: len(vectors.strokes),
+				'points'	: vectors.points(),
+			} for vectors in self.vectors],
+			'guides'	: len(self.guides),
+		}
+
+
+
+# layer.get_pixel_rgn(); writes are kept on the layer and counted as traffic to gimp, reads hand back whatever was written
+class PixelRegion(object):
+	def __init__(self, drawable, x, y, width, height):
+		self.drawable = drawable
+		self.x, self.y, self.w, self.h = int(x), int(y), int(width), int(height)
+		self.bpp = drawable.bpp
+
+	@staticmethod
+	def bounds(index, start, length):
+		if isinstance(index, slice):
+			lo = start if index.start is None else index.start
+			hi = start + length if index.stop is None else index.stop
+			return lo, hi
+		return index, index + 1
+
+	def __setitem__(self, index, data):
+		(x0, x1), (y0, y1) = [self.bounds(i, s, n) for i, s, n in zip(index, (self.x, self.y), (self.w, self.h))]
+		expected = (x1 - x0) * (y1 - y0) * self.bpp
+		if len(data) != expected:
+			raise ValueError("pixel region wants {} bytes, got {}".format(expected, len(data)))
+		self.drawable.regions.append((x0, y0, x1 - x0, y1 - y0, bytes(data)))
+		recorder.record('gimp-pixel-rgn-set', len(data), 0, 0.0)
+
+	def __getitem__(self, index):
+		(x0, x1), (y0, y1) = [self.bounds(i, s, n) for i, s, n in zip(index, (self.x, self.y), (self.w, self.h))]
+		for x, y, w, h, data in reversed(self.drawable.regions):
+			if (x, y, w, h) == (x0, y0, x1 - x0, y1 - y0):
+				return data
+		return '\0' * ((x1 - x0) * (y1 - y0) * self.bpp)
@@ -0,0 +1,473 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless Procedures v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# A stand-in for gimp's pdb covering the procedures that the plugins call; each
+# one updates the model and gets counted by the recorder - does nothing on its own
+#
+# Anything not in here raises an AttributeError, just as gimp would for a
+# procedure it doesn't have, so a plugin calling something new fails loudly
+# rather than quietly doing nothing.
+#
+
+import re, math, time
+from headless.model import *
+from headless.recorder import recorder, size_of
+
+
+ELLIPSE_KAPPA = 0.5522847498		# bezier handle length for a quarter circle
+LOADED_SIZE = (1920, 1080)			# what size every "loaded" image file is
+SVG_PATH = re.compile(r'<path\b[^>]*?\sd="([^"]*)"', re.DOTALL)
+SVG_COMMAND = re.compile(r'([MLCZmlcz])([^MLCZmlcz]*)')
+
+
+
+class Procedures(object):
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		self.context = Context()
+		self.messages = []
+		self.progress = []			# (text, fraction) as the plugin sets them
+		self.clipboard = None
+		self.saved = []				# (image, filename) for every gimp_file_save
+
+
+	##### images and layers #####
+
+	def gimp_image_new(self, width, height, base_type):
+		return Image(width, height, base_type)
+
+	def gimp_image_duplicate(self, image):
+		return image.duplicate()
+
+	def gimp_image_delete(self, image):
+		image.deleted = True
+
+	def gimp_image_flatten(self, image):
+		return image.flatten()
+
+	# no pixels are read; the headless image is just a blank one of LOADED_SIZE with a single layer
+	def gimp_file_load(self, filename, raw_filename):
+		image = Image(*LOADED_SIZE)
+		image.filename = filename
+		image.insert_layer(Layer(image, filename, image.width, image.height, RGB_IMAGE))
+		return image
+
+	# nothing gets written either, it's just noted down
+	def gimp_file_save(self, image, drawable, filename, raw_filename):
+		image.filename = filename
+		self.saved.append((image, filename))
+
+	def gimp_image_width(self, image):
+		return image.width
+
+	def gimp_image_height(self, image):
+		return image.height
+
+	def gimp_image_get_active_layer(self, image):
+		return image.active_layer
+
+	def gimp_image_get_active_drawable(self, image):
+		return image.active_layer
+
+	def gimp_image_get_item_position(self, image, item):
+		return image.position(item)
+
+	def gimp_image_insert_layer(self, image, layer, parent, position):
+		image.insert_layer(layer, parent, position)
+
+	def gimp_image_reorder_item(self, image, item, parent, position):
+		image.remove_layer(item)
+		image.insert_layer(item, parent, position)
+
+	def gimp_item_get_parent(self, item):
+		return item.parent
+
+	def gimp_image_remove_layer(self, image, layer):
+		image.remove_layer(layer)
+
+	def gimp_image_merge_down(self, image, layer, merge_type):
+		siblings = image.container(layer)
+		position = siblings.index(layer)
+		if position + 1 >= len(siblings):
+			raise RuntimeError("gimp-image-merge-down: there is no layer below '{}' to merge with".format(layer.name))
+
+		below = siblings[position + 1]
+		below.regions = below.regions + layer.regions
+		below.painted += layer.painted
+		if merge_type == 1:							# CLIP_TO_IMAGE
+			below.width, below.height, below.offsets = image.width, image.height, (0, 0)
+		elif merge_type == 0:						# EXPAND_AS_NECESSARY
+			left, top = min(layer.offsets[0], below.offsets[0]), min(layer.offsets[1], below.offsets[1])
+			right = max(layer.offsets[0] + layer.width, below.offsets[0] + below.width)
+			bottom = max(layer.offsets[1] + layer.height, below.offsets[1] + below.height)
+			below.width, below.height, below.offsets = right - left, bottom - top, (left, top)
+		image.remove_layer(layer)
+		image.active_layer = below
+		return below
+
+	def gimp_image_select_rectangle(self, image, operation, x, y, width, height):
+		image.selection = (int(x), int(y), int(width), int(height))
+
+	# the selection here is only ever a rectangle, so an item selects its bounds (and a saved selection what it saved),
+	# and adding to it selects the rectangle round both
+	def gimp_image_select_item(self, image, operation, item):
+		box = item.selection if isinstance(item, Channel) else item.bounds()
+		current = image.selection
+		if operation in (0, 3) and (box is None or current is None):		# CHANNEL_OP_ADD/INTERSECT, when either is empty
+			box = current if box is None else box
+		elif operation == 0:
+			left, top = min(box[0], current[0]), min(box[1], current[1])
+			right, bottom = max(box[0] + box[2], current[0] + current[2]), max(box[1] + box[3], current[1] + current[3])
+			box = (left, top, right - left, bottom - top)
+		elif operation == 3:
+			left, top = max(box[0], current[0]), max(box[1], current[1])
+			right, bottom = min(box[0] + box[2], current[0] + current[2]), min(box[1] + box[3], current[1] + current[3])
+			box = (left, top, max(0, right - left), max(0, bottom - top))
+		image.selection = box
+
+	def gimp_selection_is_empty(self, image):
+		return image.selection is None
+
+	def gimp_selection_none(self, image):
+		image.selection = None
+
+	def gimp_selection_save(self, image):
+		channel = Channel(image, 'Selection Mask copy', image.width, image.height)
+		channel.selection = image.selection
+		image.channels.append(channel)
+		return channel
+
+	def gimp_image_remove_channel(self, image, channel):
+		image.channels.remove(channel)
+
+	def gimp_image_add_hguide(self, image, y):
+		image.guides.append(('h', y))
+		return len(image.guides)
+
+	def gimp_image_add_vguide(self, image, x):
+		image.guides.append(('v', x))
+		return len(image.guides)
+
+	def gimp_image_undo_freeze(self, image):
+		image.undo_frozen += 1
+
+	def gimp_image_undo_thaw(self, image):
+		image.undo_frozen -= 1
+
+	def gimp_image_undo_disable(self, image):
+		image.undo_frozen += 1
+		return True
+
+	def gimp_image_undo_group_start(self, image):
+		image.undo_groups += 1
+
+	def gimp_image_undo_group_end(self, image):
+		image.undo_groups -= 1
+
+	def gimp_layer_new(self, image, width, height, layer_type, name, opacity, mode):
+		return Layer(image, name, width, height, layer_type, opacity, mode)
+
+	def gimp_layer_copy(self, layer, add_alpha):
+		return layer.copy()
+
+	def gimp_layer_resize(self, layer, width, height, offset_x, offset_y):
+		layer.width, layer.height = int(width), int(height)
+		layer.translate(-offset_x, -offset_y)
+
+	def gimp_layer_resize_to_image_size(self, layer):
+		layer.width, layer.height, layer.offsets = layer.image.width, layer.image.height, (0, 0)
+
+	def gimp_layer_translate(self, layer, offset_x, offset_y):
+		layer.translate(offset_x, offset_y)
+
+	def gimp_layer_set_offsets(self, layer, offset_x, offset_y):
+		layer.set_offsets(offset_x, offset_y)
+
+	def gimp_layer_create_mask(self, layer, mask_type):
+		return Channel(layer.image, layer.name + ' mask', layer.width, layer.height)
+
+	def gimp_layer_add_mask(self, layer, mask):
+		layer.mask = mask
+
+	def gimp_layer_remove_mask(self, layer, mode):
+		layer.mask = None
+
+	def gimp_drawable_fill(self, drawable, fill_type):
+		pass
+
+	def gimp_drawable_is_layer(self, drawable):
+		return isinstance(drawable, Layer)
+
+	def gimp_edit_copy(self, drawable):
+		self.clipboard = drawable.image.selection or (drawable.offsets[0], drawable.offsets[1], drawable.width, drawable.height)
+		return True
+
+	def gimp_edit_paste(self, drawable, paste_into):
+		x, y, width, height = self.clipboard
+		layer = Layer(drawable.image, 'Pasted Layer', width, height, drawable.type)
+		layer.set_offsets(x, y)
+		drawable.image.insert_layer(layer, drawable.parent, drawable.image.position(drawable))
+		return layer
+
+	def gimp_floating_sel_to_layer(self, layer):
+		pass
+
+
+	##### paths #####
+
+	def gimp_vectors_new(self, image, name):
+		return Vectors(image, name)
+
+	def gimp_image_insert_vectors(self, image, vectors, parent, position):
+		vectors.image = image
+		image.vectors.insert(max(0, position), vectors)
+
+	def gimp_image_remove_vectors(self, image, vectors):
+		image.vectors.remove(vectors)
+
+	def gimp_vectors_stroke_new_from_points(self, vectors, stroke_type, num_points, points, closed):
+		if num_points != len(points):
+			raise ValueError("gimp-vectors-stroke-new-from-points: num_points is {} but there are {} coords".format(num_points, len(points)))
+		return vectors.new_stroke(stroke_type, points, closed)
+
+	def gimp_vectors_bezier_stroke_new_ellipse(self, vectors, x, y, radius_x, radius_y, angle):
+		kx, ky = radius_x * ELLIPSE_KAPPA, radius_y * ELLIPSE_KAPPA
+		points = [
+			x + radius_x, y - ky,	x + radius_x, y,	x + radius_x, y + ky,
+			x + kx, y + radius_y,	x, y + radius_y,	x - kx, y + radius_y,
+			x - radius_x, y + ky,	x - radius_x, y,	x - radius_x, y - ky,
+			x - kx, y - radius_y,	x, y - radius_y,	x + kx, y - radius_y,
+		]
+		stroke_id = vectors.new_stroke(0, points, True)
+		if angle:
+			vectors.rotate_stroke(stroke_id, x, y, math.degrees(angle))
+		return stroke_id
+
+	def gimp_vectors_stroke_get_points(self, vectors, stroke_id):
+		stroke_type, points, closed = vectors.strokes[stroke_id]
+		return stroke_type, len(points), tuple(points), closed
+
+	def gimp_vectors_remove_stroke(self, vectors, stroke_id):
+		del vectors.strokes[stroke_id]
+
+	def gimp_vectors_stroke_rotate(self, vectors, stroke_id, center_x, center_y, angle):
+		vectors.rotate_stroke(stroke_id, center_x, center_y, angle)
+
+	# only the absolute M, L, C and Z that the plugins write; each subpath becomes a bezier stroke, as gimp makes them
+	def gimp_vectors_import_from_string(self, image, svg_string, length, merge, scale):
+		if length != len(svg_string):
+			raise ValueError("gimp-vectors-import-from-string: length is {} but the string is {}".format(length, len(svg_string)))
+
+		imported = []
+		for number, path_data in enumerate(SVG_PATH.findall(svg_string)):
+			if not imported or not merge:
+				imported.append(Vectors(image, "Imported Path" if not number else "Imported Path #{}".format(number)))
+
+			points, closed = [], False
+			for command, numbers in SVG_COMMAND.findall(path_data) + [('M', '')]:
+				coords = [float(n) for n in re.findall(r'-?[\d.]+(?:e-?\d+)?', numbers)]
+				if command in 'Mm' and points:
+					if closed and len(points) > 6 and points[-4:-2] == points[2:4]:
+						points = points[-6:-4] + points[2:-6]		# closed back onto the start, so that's one anchor, not two
+					imported[-1].new_stroke(0, points, closed)
+					points, closed = [], False
+				if command in 'Mm':
+					points = coords[:2] * 2 + coords[:2]
+					for i in xrange(2, len(coords), 2):
+						points.extend(coords[i:i+2] * 3)
+				elif command in 'Ll':
+					for i in xrange(0, len(coords), 2):
+						points.extend(coords[i:i+2] * 3)
+				elif command in 'Cc':
+					for i in xrange(0, len(coords), 6):
+						points[-2:] = coords[i:i+2]
+						points.extend(coords[i+2:i+4] + coords[i+4:i+6] * 2)
+				else:
+					closed = True
+
+		for vectors in imported:
+			self.gimp_image_insert_vectors(image, vectors, None, 0)
+		return len(imported), tuple(vectors.ID for vectors in imported)
+
+
+	##### painting and filters #####
+
+	def paint(self, drawable, num_strokes, strokes):
+		if num_strokes != len(strokes):
+			raise ValueError("num_strokes is {} but there are {} coords".format(num_strokes, len(strokes)))
+		drawable.painted += num_strokes / 2
+
+	def gimp_pencil(self, drawable, num_strokes, strokes):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_paintbrush(self, drawable, fade_out, num_strokes, strokes, method, gradient_length):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_paintbrush_default(self, drawable, num_strokes, strokes):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_airbrush_default(self, drawable, num_strokes, strokes):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_convolve_default(self, drawable, num_strokes, strokes):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_dodgeburn_default(self, drawable, num_strokes, strokes):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_eraser_default(self, drawable, num_strokes, strokes):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_smudge_default(self, drawable, num_strokes, strokes):
+		self.paint(drawable, num_strokes, strokes)
+
+	def gimp_drawable_edit_stroke_item(self, drawable, item):
+		drawable.painted += item.points()
+
+	def gimp_drawable_edit_fill(self, drawable, fill_type):
+		pass
+
+	def gimp_drawable_edit_gradient_fill(self, drawable, gradient_type, offset, supersample, supersample_max_depth, supersample_threshold, dither, x1, y1, x2, y2):
+		pass
+
+	def gimp_drawable_brightness_contrast(self, drawable, brightness, contrast):
+		pass
+
+	def gimp_brightness_contrast(self, drawable, brightness, contrast):
+		pass
+
+	def plug_in_gauss(self, image, drawable, horizontal, vertical, method):
+		pass
+
+	def plug_in_mblur(self, image, drawable, blur_type, length, angle, center_x, center_y):
+		pass
+
+	def plug_in_whirl_pinch(self, image, drawable, whirl, pinch, radius):
+		pass
+
+
+	##### context #####
+
+	def gimp_context_push(self):
+		self.context.push()
+
+	def gimp_context_pop(self):
+		self.context.pop()
+
+	def gimp_context_set_defaults(self):
+		self.context.set_defaults()
+
+	def gimp_context_get_foreground(self):
+		return Color.from_value(self.context.foreground)
+
+	def gimp_context_set_foreground(self, color):
+		self.context.foreground = Color.from_value(color)
+
+	def gimp_context_get_background(self):
+		return Color.from_value(self.context.background)
+
+	def gimp_context_set_background(self, color):
+		self.context.background = Color.from_value(color)
+
+	def gimp_context_get_paint_method(self):
+		return self.context.paint_method
+
+	def gimp_context_set_paint_method(self, name):
+		self.context.paint_method = name
+
+	def gimp_context_set_brush(self, name):
+		self.context.brush = name
+
+	def gimp_context_get_brush_size(self):
+		return self.context.brush_size
+
+	def gimp_context_set_brush_size(self, size):
+		self.context.brush_size = float(size)
+
+	def gimp_context_set_brush_hardness(self, hardness):
+		self.context.brush_hardness = float(hardness)
+
+	def gimp_context_get_antialias(self):
+		return self.context.antialias
+
+	def gimp_context_set_antialias(self, antialias):
+		self.context.antialias = bool(antialias)
+
+	def gimp_context_get_opacity(self):
+		return self.context.opacity
+
+	def gimp_context_set_opacity(self, opacity):
+		self.context.opacity = float(opacity)
+
+	def gimp_context_set_gradient_fg_bg_rgb(self):
+		self.context.gradient = 'FG to BG (RGB)'
+
+
+	##### messages and progress #####
+
+	def gimp_message(self, message):
+		self.messages.append(message)
+
+	def gimp_progress_init(self, message, display):
+		self.progress.append((message, 0.0))
+		recorder.start_phase(message)
+
+	def gimp_progress_set_text(self, message):
+		self.progress.append((message, self.progress[-1][1] if self.progress else 0.0))
+		recorder.start_phase(message)
+
+	def gimp_progress_update(self, percentage):
+		if self.progress:
+			self.progress[-1] = (self.progress[-1][0], percentage)
+
+	def gimp_progress_end(self):
+		pass
+
+	def gimp_displays_flush(self):
+		pass
+
+
+
+# a callable procedure, as handed out by pdb.whatever
+class Procedure(object):
+	def __init__(self, proc_name, function):
+		self.proc_name = proc_name
+		self.function = function
+
+	def __call__(self, *args):
+		started = time.time()
+		result = self.function(*args)
+		recorder.record(self.proc_name, size_of(args), size_of(result), time.time() - started)
+		return result
+
+
+
+class Pdb(object):
+	def __init__(self):
+		self.procedures = Procedures()
+
+	def __getattr__(self, name):
+		function = getattr(self.procedures, name, None)
+		if function is None or name.startswith('_') or not (name.startswith('gimp_') or name.startswith('plug_in_')):
+			raise AttributeError("headless pdb has no procedure '{}'".format(name.replace('_', '-')))
+		return Procedure(name.replace('_', '-'), function)
+
+	def __getitem__(self, proc_name):
+		return getattr(self, proc_name.replace('-', '_'))
+
+
+pdb = Pdb()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless Recorder v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Counts every pdb call the plugins make, along with how much data went over to
+# gimp and back - does nothing on its own
+#
+
+import re, time
+from array import array
+
+try:
+	import resource
+except ImportError:
+	resource = None					# windows
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# roughly what a value costs to send over gimp's wire protocol
+def size_of(value):
+	if value is None:
+		return 0
+	if isinstance(value, bool) or isinstance(value, (int, long)):
+		return 4
+	if isinstance(value, float):
+		return 8
+	if isinstance(value, basestring):
+		return len(value) + 1
+	if isinstance(value, array):
+		return 8 * len(value)						# FLOATARRAYs always go as doubles
+	if numpy is not None and isinstance(value, numpy.ndarray):
+		return 8 * value.size
+	if isinstance(value, (list, tuple)):
+		if value and isinstance(value[0], (int, long, float)):
+			return 8 * len(value)
+		return sum(size_of(v) for v in value)
+	if hasattr(value, 'r') and hasattr(value, 'a'):
+		return 32									# GimpRGB, four doubles
+	return 4										# images, layers, vectors etc. only send their ID
+
+
+# the process' memory high water mark, in KB - since the last reset_peak_rss, where that worked (None where python
+# can't tell)
+def peak_rss():
+	try:
+		with open('/proc/self/status') as f:
+			for line in f:
+				if line.startswith('VmHWM:'):
+					return int(line.split()[1])
+	except (IOError, ValueError):
+		pass
+	if resource is None:
+		return None
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+# brings the high water mark back down to what's in use now, so the next peak_rss is for what happens from here on;
+# only linux can do this, elsewhere it stays the peak since the process started and this returns False
+def reset_peak_rss():
+	try:
+		with open('/proc/self/clear_refs', 'w') as f:
+			f.write('5')
+		return True
+	except (IOError, OSError):
+		return False
+
+
+# "Drawing lines (123 duplicate edges skipped) ..." -> "Drawing lines"
+def phase_name(text):
+	return re.sub(r'\s*\(.*?\)|[\s.]+$', '', text or '').strip() or 'unnamed'
+
+
+
+class Recorder(object):
+	def __init__(self):
+		self.keep_calls = True		# False just keeps the per procedure totals, for runs with millions of calls
+		self.reset()
+
+	def reset(self):
+		self.calls = []				# (procedure, bytes sent, bytes returned, seconds, when)
+		self.stats = {}				# procedure: [calls, bytes sent, bytes returned, seconds]
+		self.phases = []			# in order, one for each change of the progress text
+		self.phase = None
+		self.started = time.time()
+		self.highest = None			# the peak before the high water mark was last reset, so the whole run's is still known
+
+	def record(self, name, bytes_in, bytes_out, seconds):
+		if self.keep_calls:
+			self.calls.append((name, bytes_in, bytes_out, seconds, time.time() - self.started))
+
+		stats = self.stats.setdefault(name, [0, 0, 0, 0.0])
+		stats[0] += 1
+		stats[1] += bytes_in
+		stats[2] += bytes_out
+		stats[3] += seconds
+
+		if self.phase is not None:
+			self.phase['calls'] += 1
+			self.phase['bytes_in'] += bytes_in
+			self.phase['bytes_out'] += bytes_out
+
+
+	# the plugins say what they're up to through the progress bar, so each new bit of text starts a new phase
+	def start_phase(self, text):
+		name = phase_name(text)
+		if self.phase is not None and self.phase['name'] == name:
+			return
+
+		now = time.time()
+		self.end_phase(now)
+		self.highest = self.peak_rss()
+		self.phase = { 'name': name, 'started': now - self.started, 'seconds': 0.0, 'calls': 0, 'bytes_in': 0, 'bytes_out': 0, 'peak_rss_kb': None }
+		self.phase_peak = reset_peak_rss()		# or the phase would just get the peak of every phase before it too
+		self.phases.append(self.phase)
+
+	def end_phase(self, now=None):
+		if self.phase is not None:
+			self.phase['seconds'] = (now or time.time()) - self.started - self.phase['started']
+			self.phase['peak_rss_kb'] = peak_rss() if self.phase_peak else None
+			self.phase = None
+
+	# the process' memory high water mark, however many times a phase has reset it
+	def peak_rss(self):
+		return max(self.highest, peak_rss())
+
+	def totals(self):
+		total = [0, 0, 0, 0.0]
+		for stats in self.stats.values():
+			total = [t + s for t, s in zip(total, stats)]
+		return dict(zip(('calls', 'bytes_in', 'bytes_out', 'seconds'), total))
+
+	def as_dict(self):
+		return {
+			'totals'		: self.totals(),
+			'procedures'	: dict((name, dict(zip(('calls', 'bytes_in', 'bytes_out', 'seconds'), stats))) for name, stats in self.stats.items()),
+			'phases'		: self.phases,
+		}
+
+	# plain text table, busiest procedures first
+	def report(self, top=None):
+		rows = sorted(self.stats.items(), key=lambda item: (-item[1][0], item[0]))
+		if top:
+			rows = rows[:top]
+
+		lines = ["{:<44} {:>10} {:>14} {:>12}".format('procedure', 'calls', 'bytes sent', 'bytes back')]
+		for name, (calls, bytes_in, bytes_out, seconds) in rows:
+			lines.append("{:<44} {:>10} {:>14} {:>12}".format(name, calls, bytes_in, bytes_out))
+
+		total = self.totals()
+		lines.append("{:<44} {:>10} {:>14} {:>12}".format('total', total['calls'], total['bytes_in'], total['bytes_out']))
+		return "\n".join(lines)
+
+
+recorder = Recorder()
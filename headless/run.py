@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Headless Runner v0.1
+#
+# Copyright 2019, Keith Drakard; Released under the 3-Clause BSD License
+# See https://opensource.org/licenses/BSD-3-Clause for details
+#
+#
+# Change Log
+# ----------
+# 0.1: Initial release
+#
+# ------------------------------------------------------------------------------
+#
+# Runs the plugins outside of gimp, against the fake modules in headless/fakes,
+# and reports how many pdb calls they made and how much data they sent, eg.
+#
+#   python headless/run.py koch --size 4000x4000 --set max_depth=7 --set sides=6
+#   python headless/run.py all --calls
+#
+# Settings not given keep the plugin's own defaults. Needs the same Python 2 that
+# gimp uses (and NumPy, if you want the NumPy code paths).
+#
+
+import os, sys, imp, json, time, random, argparse
+this_directory = os.path.dirname(os.path.realpath(__file__)) + os.sep
+repo_directory = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + os.sep
+if repo_directory not in sys.path:
+	sys.path.insert(0, repo_directory)
+
+import headless
+headless.install()
+
+import gimp, gimpshelf
+from gimpenums import *
+from headless.model import Color
+from headless.procedures import pdb
+from headless.recorder import recorder
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+DEFAULT_SIZE = (1920, 1080)
+
+# short name, plugin file
+PLUGINS = [
+	('lightning',	'weather_lightning.py'),
+	('koch',		'koch_curves.py'),
+	('tree',		'fractal_tree.py'),
+	('sierpinski',	'sierpinski_triangles.py'),
+	('ellipses',	'concentric_ellipses.py'),
+	('tiling',		'tile_layer.py'),
+	('guides',		'image_guides.py'),
+]
+PLUGIN_FILES = dict(PLUGINS)
+
+PF_COLOR = PDB_COLOR
+
+_loaded = {}
+
+
+
+# imports a plugin file (just the once) and hands back the procedure it registered, and its name
+def load_plugin(name):
+	if name not in _loaded:
+		before = set(gimp.procedures)
+		stderr = sys.stderr
+		try:
+			imp.load_source('headless_plugin_' + name, os.path.join(repo_directory, PLUGIN_FILES[name]))
+		finally:
+			sys.stderr = stderr				# every plugin points stderr at gimpfu_debug.txt
+		_loaded[name] = [proc_name for proc_name in gimp.procedures if proc_name not in before and not proc_name.endswith('-batch')][0]
+
+	return gimp.procedures[_loaded[name]], _loaded[name]
+
+
+# the settings a plugin would run with if nobody changed anything, and which of them are colors
+def default_args(procedure):
+	if procedure['kind'] == 'gimpfu':
+		values = dict((param[1], param[3]) for param in procedure['params'])
+		colors = [param[1] for param in procedure['params'] if param[0] == PF_COLOR]
+		return values, colors
+
+	plugin = procedure['run'].im_self
+	colors = [param[1] for param in procedure['params'] if param[0] == PF_COLOR]
+	return plugin.defaults(), colors
+
+
+# "5" -> 5, "true" -> True, "#ff0000" -> "#ff0000" etc.
+def parse_value(text):
+	try:
+		return json.loads(text)
+	except ValueError:
+		return text
+
+
+def printable(value):
+	if isinstance(value, Color):
+		return '#{:02x}{:02x}{:02x}'.format(value[0], value[1], value[2])
+	return value
+
+
+# runs one plugin on a new image with a single background layer; returns (results, image)
+def run_plugin(name, width=DEFAULT_SIZE[0], height=DEFAULT_SIZE[1], args=None, seed=None):
+	procedure, proc_name = load_plugin(name)
+
+	pdb.procedures.reset()
+	image = gimp.Image(width, height, RGB)
+	background = gimp.Layer(image, 'Background', width, height, RGB_IMAGE, 100.0, LAYER_MODE_NORMAL)
+	image.insert_layer(background)
+
+	values, colors = default_args(procedure)
+	for key, value in (args or {}).items():
+		values[key] = Color.from_value(value) if key in colors else value
+
+	random.seed(seed)
+	if numpy is not None:
+		numpy.random.seed(seed)
+
+	recorder.reset()
+	recorder.start_phase('Starting')
+	started = time.time()
+
+	if procedure['kind'] == 'gimpfu':
+		procedure['function'](image, background, *[values[param[1]] for param in procedure['params']])
+	else:
+		gimpshelf.shelf['python-fu-save--' + proc_name] = values
+		procedure['run'](proc_name, (RUN_NONINTERACTIVE, image, background))
+
+	recorder.end_phase()
+	results = {
+		'plugin'	: name,
+		'procedure'	: proc_name,
+		'size'		: (width, height),
+		'args'		: dict((key, printable(value)) for key, value in values.items()),
+		'seed'		: seed,
+		'seconds'	: time.time() - started,
+		'pdb'		: recorder.as_dict(),
+		'image'		: image.summary(),
+		'messages'	: list(pdb.procedures.messages),
+	}
+	return results, image
+
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Runs the plugins without gimp and counts their pdb calls.')
+	parser.add_argument('plugins', nargs='+', metavar='plugin', help='any of: {} (or all)'.format(', '.join(name for name, filename in PLUGINS)))
+	parser.add_argument('--size', default='{}x{}'.format(*DEFAULT_SIZE), help='image size, WIDTHxHEIGHT')
+	parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='change one of the plugin settings')
+	parser.add_argument('--seed', type=int, default=None, help='random seed, for repeatable runs')
+	parser.add_argument('--calls', action='store_true', help='list the pdb procedures each plugin called')
+	parser.add_argument('--json', metavar='FILE', help='write the full results here')
+	options = parser.parse_args(argv)
+
+	names = [name for name, filename in PLUGINS] if options.plugins == ['all'] else options.plugins
+	for name in names:
+		if name not in PLUGIN_FILES:
+			parser.error("unknown plugin '{}'".format(name))
+
+	width, height = [int(n) for n in options.size.lower().split('x')]
+	args = dict((key, parse_value(value)) for key, value in (item.split('=', 1) for item in options.set))
+
+	everything = []
+	for name in names:
+		results, image = run_plugin(name, width, height, args, options.seed)
+		everything.append(results)
+
+		totals = results['pdb']['totals']
+		print "{:<12} {:>8.3f}s {:>8} pdb calls {:>12} bytes sent {:>4} layers".format(name, results['seconds'], totals['calls'], totals['bytes_in'], len(results['image']['layers']))
+		for message in results['messages']:
+			print "    message: {}".format(message)
+		if options.calls:
+			print recorder.report()
+			print
+
+	if options.json:
+		with open(options.json, 'w') as f:
+			json.dump(everything, f, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+	main()
@@ -13,7 +13,7 @@
 #
 # ------------------------------------------------------------------------------
 #
-# Draws a Koch curve with an angle between -90 to 90 degrees, up to 6 iterations
+# Draws a Koch curve with an angle between -90 to 90 degrees, up to 8 iterations
 # deep, and then rotates this line to create a 1-10 sided shape centered in the
 # middle of the image.
 #
@@ -21,6 +21,7 @@
 
 # https://gitlab.gnome.org/GNOME/gimp/issues/1542
 import os, sys
+from collections import OrderedDict
 this_directory = os.path.dirname(os.path.realpath(__file__)) + os.sep
 sys.path.append(this_directory)
 
@@ -28,10 +29,24 @@ sys.stderr = open(this_directory + 'gimpfu_debug.txt', 'a')
 
 from classes.mygtk import *
 from classes.point import *
+from classes.strokes import *
+from classes.raster import *
+from classes.geometry import *
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+MAX_DEPTH = 8					# 6 is as far as you need for normal resolution, 8 gets the segments down to a pixel or so for 8k/print sizes
+UNIT_CURVE_CACHE = 4			# unit curves kept for reuse (a batch run of several sets) - at 8 iterations each one is 4^8 points
 
 
 
 class KochCurve(object):
+	unit_curves = OrderedDict()	# the last few normalized curves built this session, keyed by (angle, depth)
+
 	def __init__(self, image, args):
 		self.image = image
 		self.width = pdb.gimp_image_width(self.image)
@@ -46,9 +61,9 @@ class KochCurve(object):
 
 		self.n_sides = max(1, min(10, int(args['sides'])))
 		self.side_rotation = 360 / self.n_sides							# (note: 7 sides doesn't divide nicely)
-		self.sides = [[] for i in range(self.n_sides)]					# turn a single koch line (self.points) into as many sides as wanted
+		self.sides = [PointBuffer() for i in range(self.n_sides)]		# turn a single koch line (self.points) into as many sides as wanted
 		
-		self.max_depth = max(0, min(6, int(args['max_depth'])))			# 6 is as far as you need for normal resolution, unless you really want this in 8k etc
+		self.max_depth = max(0, min(MAX_DEPTH, int(args['max_depth'])))
 
 		base_x = int((self.width - args['size']) / 2)
 		base_y = int(self.height * 0.50)								# doesn't matter as we have to reposition it vertically anyway
@@ -56,59 +71,100 @@ class KochCurve(object):
 		self.start = Point(base_x, base_y)
 		self.end = Point(base_x + args['size'], base_y)
 
-		self.points = [Point(base_x, base_y)]							# ... python variable references
+		self.points = PointBuffer()
 	
 
-	def plot_lines(self, depth=0, start=None, end=None):
-		start = start if start is not None else self.start
-		end = end if end is not None else self.end
-
-		if depth < self.max_depth:
-			length = start.distance_from(end) * self.line_scale
-			angle = math.degrees(end.angle_of(start))
-
-			pA = start
-			pB = pA.make_point(length, math.radians(angle))
-			pC = pB.make_point(length, math.radians(angle-self.koch_angle))
-			pD = pC.make_point(length, math.radians(angle+self.koch_angle))
-			pE = end
-
-			self.plot_lines(depth+1, pA, pB)
-			self.plot_lines(depth+1, pB, pC)
-			self.plot_lines(depth+1, pC, pD)
-			self.plot_lines(depth+1, pD, pE)
-
+	# the curve only depends on the angle and depth, so build it once as a line from (0,0) to (1,0) and then just
+	# scale/rotate/move copies of that into place; only the most recently used few are kept
+	def unit_curve(self):
+		key = (self.koch_angle, self.max_depth)
+		if key in KochCurve.unit_curves:
+			points = KochCurve.unit_curves.pop(key)
 		else:
-			self.points.append(Point(end.x, end.y))						# only need to append end as we already have the previous point
-
-	# given a side (i, 0=top) work out point rotation/reflection - note that the next side uses the modified coords (... python variable references)
-	def next_side(self, i, item):
-		if i % 2 == 1: # odd
-			item.rotate(math.radians(self.side_rotation), self.start)
-			item.reflect_x(self.start)
-		elif i > 0: # even
-			item.reflect_x(self.start.halfway_to(self.end))
-		return [item.x, item.y]
+			points = PointBuffer([0.0, 0.0, 1.0, 0.0])
+			for depth in xrange(self.max_depth):
+				points = self.expand(points)
+			while len(KochCurve.unit_curves) >= UNIT_CURVE_CACHE:
+				KochCurve.unit_curves.popitem(last=False)
+		KochCurve.unit_curves[key] = points						# (back) to the most recently used end
+		return points
+
+	# one iteration deeper, done a whole level at a time instead of recursing - every A->E becomes A->B->C->D->E
+	def expand(self, points):
+		rads = math.radians(self.koch_angle)
+
+		if numpy is not None:
+			xy = points._view()
+			pA, pE = xy[:-1], xy[1:]
+			length = numpy.hypot(pE[:,0] - pA[:,0], pE[:,1] - pA[:,1]) * self.line_scale
+			angle = numpy.arctan2(pE[:,1] - pA[:,1], pE[:,0] - pA[:,0])
+
+			pB = pA + numpy.column_stack((length * numpy.cos(angle), length * numpy.sin(angle)))
+			pC = pB + numpy.column_stack((length * numpy.cos(angle-rads), length * numpy.sin(angle-rads)))
+			pD = pC + numpy.column_stack((length * numpy.cos(angle+rads), length * numpy.sin(angle+rads)))
+
+			out = numpy.empty((len(pA) * 4 + 1, 2))
+			out[0:-1:4], out[1::4], out[2::4], out[3::4] = pA, pB, pC, pD
+			out[-1] = xy[-1]
+			return PointBuffer(out)
+
+		out = PointBuffer()
+		for i in xrange(len(points) - 1):
+			pA, pE = points[i], points[i+1]
+			length = pA.distance_from(pE) * self.line_scale
+			angle = pE.angle_of(pA)
+
+			pB = pA.make_point(length, angle)
+			pC = pB.make_point(length, angle-rads)
+			pD = pC.make_point(length, angle+rads)
+			out.extend([pA, pB, pC, pD])
+		out.extend([points[-1]])
+		return out
+
+	# scale/rotate/move (a slice of) the unit curve onto our real start->end line
+	def place(self, unit):
+		points = unit.copy()
+		points.scale(self.start.distance_from(self.end))
+		points.rotate(self.end.angle_of(self.start))
+		points.translate(self.start.x, self.start.y)
+		return points
+
+	def plot_lines(self):
+		self.points = self.place(self.unit_curve())
+
+	# given a side (i, 0=top) work out its rotation/reflection - each side builds on the one before, so chain the
+	# matrices together here and then every side can be made straight from the base curve
+	def side_transforms(self):
+		rotation = math.radians(self.side_rotation)
+		middle = self.start.halfway_to(self.end)
+		matrix = affine_identity()
+
+		for i in range(self.n_sides):
+			if i % 2 == 1: # odd
+				matrix = affine_multiply(affine_rotate(rotation, self.start), matrix)
+				matrix = affine_multiply(affine_reflect_x(self.start), matrix)
+			elif i > 0: # even
+				matrix = affine_multiply(affine_reflect_x(middle), matrix)
+			yield matrix
 
 	def rotate_lines(self):
-		for item in self.points:
-			for i in range(self.n_sides):
-				self.sides[i].extend(self.next_side(i, item))
+		for i, matrix in enumerate(self.side_transforms()):
+			self.sides[i] = self.points.copy()
+			self.sides[i].transform(matrix)
 
 	def center_vertically(self):
-		y_min = min([y for coords in self.sides for y in coords[1::2]])
-		y_max = max([y for coords in self.sides for y in coords[1::2]])
+		bounds = [side.bounds() for side in self.sides if len(side)]
+		y_min = min(b[1] for b in bounds)
+		y_max = max(b[3] for b in bounds)
 		y_mod = (self.height / 2) - ((y_max-y_min) / 2) - y_min			# required height adjustment to vertically center the points
 
-		for coords in self.sides:
-			coords[1::2] = [y + y_mod for y in coords[1::2]]			# correct the height
+		for side in self.sides:
+			side.translate(0, y_mod)									# correct the height
 		
 
 
-def KochWrapper(args):
-		
-	image, layer, args = args
-	
+# everything up to the drawing, which is all pure python - see headless/farm.py for doing lots of these at once
+def KochPlot(image, args):
 	koch = KochCurve(image, args)
 
 	pdb.gimp_progress_init("Plotting lines ...", None)
@@ -118,33 +174,20 @@ def KochWrapper(args):
 	koch.rotate_lines()
 	koch.center_vertically()
 
-	pdb.gimp_progress_set_text("Drawing lines ...")
-	tools = {
-		'gimp-airbrush': pdb.gimp_airbrush_default,
-		'gimp-paintbrush': pdb.gimp_paintbrush_default,
-		'gimp-pencil': pdb.gimp_pencil,
-		'gimp-convolve': pdb.gimp_convolve_default,
-		'gimp-dodge-burn': pdb.gimp_dodgeburn_default,
-		'gimp-eraser': pdb.gimp_eraser_default,
-		'gimp-smudge': pdb.gimp_smudge_default,
-	}
-	need_new_layer = ['gimp-airbrush', 'gimp-paintbrush', 'gimp-pencil']
-	
-	current_tool = pdb.gimp_context_get_paint_method()
-	if current_tool not in tools:
-		#pdb.gimp_message(current_tool)
-		current_tool = "gimp-pencil"
-		pdb.gimp_context_set_paint_method(current_tool)
-	
-	if current_tool in need_new_layer:
-		layer_type = RGBA_IMAGE if image.base_type is RGB else GRAYA_IMAGE
-		layer = pdb.gimp_layer_new(image, image.width, image.height, layer_type, "Koch Curve", 100.00, LAYER_MODE_NORMAL)
-		pdb.gimp_image_insert_layer(image, layer, None, 0)
-
-	for coords in koch.sides:
-		if len(coords):
-			tools[current_tool](layer, len(coords), coords)
+	return [({ 'side': i }, side) for i, side in enumerate(koch.sides)]
+
+
+def KochWrapper(args):
 		
+	image, layer, args = args
+	
+	sides = geometry_for(image, args)
+	if sides is None:
+		sides = KochPlot(image, args)
+
+	pdb.gimp_progress_set_text("Drawing lines ...")
+	submitter = StrokeSubmitter(image, layer, "Koch Curve", renderer=args['renderer'])
+	submitter.draw([points for details, points in sides])
 
 
 
@@ -176,7 +219,7 @@ plugin = PythonFu(
 			'tooltip'	: 'Number of iterations to run.',
 			'label_width' : 100,
 			'type'		: IntSlider,
-			'range'		: (0,6),
+			'range'		: (0,MAX_DEPTH),
 			'step'		: (1,1),
 			'default'	: 4,
 		},
@@ -198,11 +241,21 @@ plugin = PythonFu(
 			'type'		: IntEntry,
 			'default'	: 200,
 		},
+		{
+			'variable'	: 'renderer',
+			'label'		: 'Draw With',
+			'tooltip'	: 'GIMP\'s paint tools, or draw the lines here and add them as a finished layer (much quicker for big curves; needs NumPy).',
+			'label_width' : 100,
+			'type'		: DropDown,
+			'options'	: RENDERERS,
+			'default'	: DRAW_WITH_GIMP,
+		},
 	],
 	help_text = {
-		'label' : ('Draws a Koch curve with an angle between -90° and 90°, up to 6 iterations deep, and then rotates this line to create a 1-10 sided shape centered in the middle of the image.', 'Uses the current drawing options - ie. color, brush and tool (or the Pencil if the current tool can\'t draw).'),
+		'label' : ('Draws a Koch curve with an angle between -90° and 90°, up to {} iterations deep, and then rotates this line to create a 1-10 sided shape centered in the middle of the image.'.format(MAX_DEPTH), 'Uses the current drawing options - ie. color, brush and tool (or the Pencil if the current tool can\'t draw).'),
 	},
-	code_function = KochWrapper
+	code_function = KochWrapper,
+	plot_function = KochPlot
 )
 
 plugin.main()
@@ -26,8 +26,14 @@ sys.stderr = open(this_directory + 'gimpfu_debug.txt', 'a')
 import logging
 
 
-from gimpfu import *
+from classes.mygtk import *
 from classes.point import *
+from classes.strokes import *
+from classes.raster import *
+from classes.geometry import *
+
+
+MAX_DEPTH = 6					# 6 is as far as you need for normal resolution, unless you really want this in 8k etc
 
 
 
@@ -41,9 +47,9 @@ class SierpinskiTriangle(object):
 
 		self.n_sides = 3
 		self.side_rotation = 120
-		self.sides = [[], [], []]
+		self.sides = [PointBuffer(), PointBuffer(), PointBuffer()]
 		
-		self.max_depth = max(0, min(6, int(max_depth)))					# 6 is as far as you need for normal resolution, unless you really want this in 8k etc
+		self.max_depth = max(0, min(MAX_DEPTH, int(max_depth)))
 
 		base_x = int((self.width - size) / 2)
 		base_y = int(self.height * 0.50)								# doesn't matter as we have to reposition it vertically anyway
@@ -51,7 +57,9 @@ class SierpinskiTriangle(object):
 		self.start = Point(base_x, base_y)
 		self.end = Point(base_x + size, base_y)
 
-		self.points = []
+		self.mesh = EdgeMesh()											# neighbouring triangles share edges, so only keep one of each
+		self.lines = []
+		self.duplicates = 0
 	pass
 
 
@@ -80,53 +88,64 @@ class SierpinskiTriangle(object):
 			
 
 		else:
-			self.points.extend([Point(start.x, start.y), Point(end.x, end.y)])
+			self.mesh.add_edge(start.x, start.y, end.x, end.y)
 
 	pass
 
 
-	# given a side (i, 0=top) work out point rotation/reflection - note that the next side uses the modified coords (... python variable references)
-	def next_side(self, i, item):
-		if i % 2 == 1: # odd
-			item.rotate(math.radians(self.side_rotation), self.start)
-			item.reflect_x(self.start)
-		elif i > 0: # even
-			item.reflect_x(self.start.halfway_to(self.end))
-		return [item.x, item.y]
+	# given a side (i, 0=top) work out its rotation/reflection - each side builds on the one before, so chain the
+	# matrices together here and then every side can be made straight from the base points
+	def side_transforms(self):
+		rotation = math.radians(self.side_rotation)
+		middle = self.start.halfway_to(self.end)
+		matrix = affine_identity()
+
+		for i in range(self.n_sides):
+			if i % 2 == 1: # odd
+				matrix = affine_multiply(affine_rotate(rotation, self.start), matrix)
+				matrix = affine_multiply(affine_reflect_x(self.start), matrix)
+			elif i > 0: # even
+				matrix = affine_multiply(affine_reflect_x(middle), matrix)
+			yield matrix
 	pass
 
 
 	def rotate_lines(self):
-		todo = len(self.points) * self.n_sides
-		current = 0
-
-		for item in self.points:
-			for i in range(self.n_sides):
-				self.sides[i].extend(self.next_side(i, item))
+		points = self.mesh.segments()
+		for i, matrix in enumerate(self.side_transforms()):
+			self.sides[i] = points.copy()
+			self.sides[i].transform(matrix)
+			pdb.gimp_progress_update(float(i+1) / float(self.n_sides))
+
+		bounds = [side.bounds() for side in self.sides if len(side)]
+		y_min = min(b[1] for b in bounds)
+		y_max = max(b[3] for b in bounds)
+		y_mod = (self.height / 2) - ((y_max-y_min) / 2) - y_min			# required height adjustment to vertically center the points
 
-				current += 1
-				progress = float(current) / float(todo)
-				pdb.gimp_progress_update(progress)
+		for side in self.sides:
+			side.translate(0, y_mod)									# correct the height
+		
+	pass
 
 
-		y_min = min([y for coords in self.sides for y in coords[1::2]])
-		y_max = max([y for coords in self.sides for y in coords[1::2]])
-		y_mod = (self.height / 2) - ((y_max-y_min) / 2) - y_min			# required height adjustment to vertically center the points
+	# the sides can overlap each other as well, so put them all through one more mesh and then join up whatever's
+	# left into as few lines as possible - far cheaper for gimp than thousands of separate 2 point strokes
+	def join_lines(self):
+		mesh = EdgeMesh()
+		for side in self.sides:
+			mesh.add_segments(side)
 
-		for coords in self.sides:
-			coords[1::2] = [y + y_mod for y in coords[1::2]]			# correct the height
-		
+		self.lines = mesh.polylines()
+		self.duplicates = (self.mesh.duplicates * self.n_sides) + mesh.duplicates
 	pass
 
 
 pass
 
 
-def python_kd_fractals_sierpinski(image, layer, max_depth=5, size=200):
-	pdb.gimp_image_undo_group_start(image)
-	pdb.gimp_context_push()
-
-	sierpinski = SierpinskiTriangle(image, max_depth, size)
+# everything up to the drawing, which is all pure python - see headless/farm.py for doing lots of these at once
+def SierpinskiPlot(image, args):
+	sierpinski = SierpinskiTriangle(image, args['max_depth'], args['size'])
 
 	pdb.gimp_progress_init("Plotting lines ...", None)
 	sierpinski.plot_lines()
@@ -135,58 +154,72 @@ def python_kd_fractals_sierpinski(image, layer, max_depth=5, size=200):
 	pdb.gimp_progress_set_text("Rotating lines ...")
 	sierpinski.rotate_lines()
 
+	pdb.gimp_progress_set_text("Joining lines ...")
+	sierpinski.join_lines()
+	pdb.gimp_progress_set_text("Joining lines ({} duplicate edges skipped) ...".format(sierpinski.duplicates))
 
-	pdb.gimp_progress_set_text("Drawing lines ...")
-	tools = {
-		'gimp-airbrush': pdb.gimp_airbrush_default,
-		'gimp-paintbrush': pdb.gimp_paintbrush_default,
-		'gimp-pencil': pdb.gimp_pencil,
-		'gimp-convolve': pdb.gimp_convolve_default,
-		'gimp-dodge-burn': pdb.gimp_dodgeburn_default,
-		'gimp-eraser': pdb.gimp_eraser_default,
-		'gimp-smudge': pdb.gimp_smudge_default,
-	}
-	need_new_layer = ['gimp-airbrush', 'gimp-paintbrush', 'gimp-pencil']
-	
-	current_tool = pdb.gimp_context_get_paint_method()
-	if current_tool not in tools:
-		#pdb.gimp_message(current_tool)
-		current_tool = "gimp-pencil"
-		pdb.gimp_context_set_paint_method(current_tool)
-	
-	if current_tool in need_new_layer:
-		layer = pdb.gimp_layer_new(image, image.width, image.height, RGBA_IMAGE, "Sierpinski Triangles", 100.00, LAYER_MODE_NORMAL)
-		pdb.gimp_image_insert_layer(image, layer, None, 0)
-
-
-	pdb.gimp_progress_update(0.0)
-	for i, coords in enumerate(sierpinski.sides):
-		if len(coords):
-			#logging.warn("drawing coords "+str(len(coords)))
-			tools[current_tool](layer, len(coords), coords)
-			progress = float(i) / 3.0
-			pdb.gimp_progress_update(progress)
-
-
-	pdb.gimp_context_pop()	
-	pdb.gimp_image_undo_group_end(image)
-pass
+	return [({ 'line': i }, line) for i, line in enumerate(sierpinski.lines)]
 
 
-register(
-	"fractals_sierpinski_triangles",
-	"Draws Sierpinski triangles with selected tool",
-	"Draws Sierpinski triangles with selected tool",
-	"Keith Drakard",
-	"Keith Drakard",
-	"2019",
-	"<Image>/Filters/Render/Fractals/Sierpinski Triangles...",
-	"*",
-	[
-		(PF_SPINNER, "max_depth", "Iterations", 3, (0, 6, 1)),
-		(PF_INT, "size", "Side Length (px)", 200),
-	],
-	[],
-	python_kd_fractals_sierpinski)
+def SierpinskiWrapper(args):
 
-main()
\ No newline at end of file
+	image, layer, args = args
+
+	lines = geometry_for(image, args)
+	if lines is None:
+		lines = SierpinskiPlot(image, args)
+
+	pdb.gimp_progress_set_text("Drawing lines ...")
+	submitter = StrokeSubmitter(image, layer, "Sierpinski Triangles", renderer=args['renderer'])
+	submitter.draw([points for details, points in lines])
+
+
+
+##### end of the real code #####
+
+
+plugin = PythonFu(
+	title = 'Sierpinski Triangles',
+	icon = os.path.join(this_directory, 'icons', 'draw-spiral-2-32x32.png'),
+	description = 'Draws Sierpinski triangles with the currently selected tool',
+	author = 'Keith Drakard',
+	date = '2019',
+	menu = '<Image>/Filters/Render/Fractals/_Sierpinski Triangles...',
+	dialog_width = 280,
+	widgets = [
+		{
+			'variable'	: 'max_depth',
+			'label'		: 'Iterations',
+			'tooltip'	: 'Number of iterations to run.',
+			'label_width' : 100,
+			'type'		: IntSlider,
+			'range'		: (0,MAX_DEPTH),
+			'step'		: (1,1),
+			'default'	: 3,
+		},
+		{
+			'variable'	: 'size',
+			'label'		: 'Side Length',
+			'tooltip'	: 'Pixel length of each side of the outer triangle.',
+			'label_width' : 100,
+			'type'		: IntEntry,
+			'default'	: 200,
+		},
+		{
+			'variable'	: 'renderer',
+			'label'		: 'Draw With',
+			'tooltip'	: 'GIMP\'s paint tools, or draw the lines here and add them as a finished layer (much quicker for big triangles; needs NumPy).',
+			'label_width' : 100,
+			'type'		: DropDown,
+			'options'	: RENDERERS,
+			'default'	: DRAW_WITH_GIMP,
+		},
+	],
+	help_text = {
+		'label' : ('Draws Sierpinski triangles up to {} iterations deep, centered in the middle of the image.'.format(MAX_DEPTH), 'Uses the current drawing options - ie. color, brush and tool (or the Pencil if the current tool can\'t draw).'),
+	},
+	code_function = SierpinskiWrapper,
+	plot_function = SierpinskiPlot
+)
+
+plugin.main()
\ No newline at end of file
@@ -29,7 +29,32 @@ sys.stderr = open(this_directory + 'gimpfu_debug.txt', 'a')
 from classes.mygtk import *
 from classes.noise import *
 from classes.point import *
-import random
+from classes.raster import *
+from classes.geometry import *
+import math, random
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# how the side bolts get painted
+SIDE_BOLT_FADED = 0		# one stroke, faded out along its length by a gradient mask
+SIDE_BOLT_PIXELS = 1	# one paintbrush dab per pixel, each with a lower opacity - the original way, but thousands of pdb calls per bolt
+
+# the settings that change where the bolts go (and so the cache key for them); bump the version if plot_bolts changes
+GEOMETRY_SETTINGS = ('start_x', 'start_y', 'mid_x', 'mid_y', 'end_x', 'end_y', 'n_main', 'n_side', 'move_end_point_a_bit', 'seed')
+CACHE_VERSION = 2
+
+# the glow around a main bolt, as draw_beziers_lighting makes it; each layer's plug_in_gauss radius, brightness and
+# contrast, from the top (hard light) layer down
+GLOW_LAYERS = ((10, 0.0, 0.0), (20, 0.3, 0.3), (35, -0.2, 0.0), (70, -0.3, 0.0))
+# then the second underlay; each layer's plug_in_mblur zoom length and brightness/contrast steps, from the top down
+GLOW_ZOOMS = ((100, ((-0.5, -0.1), (-0.3, 0.0))), (250, ((-0.5, 0.0), (-0.5, 0.0), (-0.2, 0.0))))
+GLOW_PINCH = (-1.0, 1.2)		# plug_in_whirl_pinch's pinch and radius
+GLOW_STEP = 4					# the second underlay is all blur, so it's worked out every few pixels and scaled up
+SIDE_GLOW = 10					# plug_in_gauss radius of the copy under each side bolt
 
 
 
@@ -46,7 +71,7 @@ class LightningPath(object):
 		# minimum possible starting point for branches
 		self.branch_point = self.length - (self.length / (self.depth+1))
 
-		self.path = []
+		self.path = PointBuffer()
 
 		noise_defaults = [
 			(8, 2.5, 0.40, 0.4, 200, self.length/2),
@@ -56,6 +81,8 @@ class LightningPath(object):
 		self.octaves, self.lacunarity, self.gain, self.scale, self.amplitude, self.hgrid = noise_defaults[pick]
 
 		self.brush_size = 0
+		self.raster = False		# draw with the local rasterizer instead of gimp's paintbrush
+		self.rng = None			# this path's own random.Random, or None for the random module
 	pass
 
 	''' adds two paths together; does NOT check that they are continuous, in the same image, nor of the same depth '''
@@ -63,12 +90,33 @@ class LightningPath(object):
 		obj = LightningPath(self.image, self.start, other.end, self.depth)
 		obj.length = self.length + other.length
 		obj.path = self.path + other.path
+		obj.raster = self.raster
+		return obj
+	pass
+
+	''' what's needed to remake this path from its points alone (see from_geometry) '''
+	def geometry(self):
+		return {
+			'start'		: (self.start.x, self.start.y),
+			'end'		: (self.end.x, self.end.y),
+			'depth'		: self.depth,
+			'length'	: self.length,
+			'brush_size' : self.brush_size,
+		}
+	pass
+
+	@classmethod
+	def from_geometry(cls, image, details, points):
+		obj = cls(image, Point(*details['start']), Point(*details['end']), details['depth'])
+		obj.length = details['length']
+		obj.brush_size = details['brush_size']
+		obj.path = points
 		return obj
 	pass
 
 	''' because random.choice(path) only returns the Point object of a path and I want the index too '''
 	def random_point_along_path(self):
-		index = random.randint(0, len(self.path)-1)
+		index = (self.rng or random).randint(0, len(self.path)-1)
 		return index, self.path[index]
 	pass
 
@@ -87,28 +135,27 @@ class LightningPath(object):
 
 	''' makes a noisy wave along a straight line '''
 	def make_path(self):
-		pn = PerlinNoise(self.octaves, 0.1, self.scale)
-		for i in xrange(self.length):
-			n = int(normalize(pn.fractal(i, self.hgrid, self.lacunarity, self.gain)) * self.amplitude) - self.amplitude/2
-			self.path.append(Point(i,n))
+		pn = PerlinNoise(self.octaves, 0.1, self.scale, rng=self.rng)
+		noise = normalize_batch(pn.fractal_batch(xrange(self.length), self.hgrid, self.lacunarity, self.gain))
+		if numpy is not None:
+			noise = (noise * self.amplitude).astype(numpy.int64) - self.amplitude/2
+			self.path = PointBuffer(numpy.column_stack((numpy.arange(self.length), noise)))
+		else:
+			self.path = PointBuffer([c for i, n in enumerate(noise) for c in (i, int(n * self.amplitude) - self.amplitude/2)])
 	pass
 			
 	''' rotates that wave to follow our real start->end line '''
 	def rotate_path(self):
-		for index, item in enumerate(self.path):
-			# rotate x,y around the origin - https://en.wikipedia.org/wiki/Rotation_matrix
-			x = int(item.x * math.cos(self.angle) - item.y * math.sin(self.angle))
-			y = int(item.x * math.sin(self.angle) + item.y * math.cos(self.angle))
-			# translate x,y according to the offset
-			self.path[index] = Point(x + self.start.x, y + self.start.y)
+		# rotate x,y around the origin - https://en.wikipedia.org/wiki/Rotation_matrix
+		self.path.rotate(self.angle)
+		self.path.truncate()
+		# translate x,y according to the offset
+		self.path.translate(self.start.x, self.start.y)
 	pass
 
 	''' trebles each of the path coords so gimp can draw the curve '''
 	def make_beziers(self):
-		self.beziers = []
-		for i in self.path:
-			# add this to our curve
-			self.beziers.extend([i.x,i.y, i.x,i.y, i.x,i.y])
+		self.beziers = self.path.repeat(3).flat()
 	pass
 
 	''' plot the bezier curve as a gimp path '''
@@ -120,11 +167,29 @@ class LightningPath(object):
 		return vectors
 	pass
 
+	''' where a layer for this path goes - just the area it covers, plus the brush and margin pixels more for any blurs
+	    to come, rather than the whole image; call set_brush first '''
+	def bounds(self, margin=0):
+		return layer_bounds(self.image, self.path.bounds(), self.brush_size + 2 + margin)
+	pass
+
+	''' draw the path here and add it to the group as a finished layer '''
+	def draw_raster(self, group, name, fade=False, margin=0):
+		self.set_brush()
+		left, top, width, height = self.bounds(margin)
+
+		raster = Raster(width, height, left, top)
+		raster.draw_polyline(self.path, pdb.gimp_context_get_foreground(), self.brush_size, fade=fade)
+		return raster.to_layer(self.image, name, group, 0)
+	pass
+
 	''' and draw the bezier curve - solid color, no messing around with gradient overlays etc '''
-	def draw_beziers(self, group):
-		layer = pdb.gimp_layer_new(self.image, self.image.width, self.image.height, RGBA_IMAGE, "Main Bolt", 100.00, LAYER_MODE_NORMAL)
-		pdb.gimp_image_insert_layer(self.image, layer, group, 0)
+	def draw_beziers(self, group, margin=0):
+		if self.raster:
+			return self.draw_raster(group, "Main Bolt", margin=margin)
+
 		self.set_brush()
+		layer = new_layer(self.image, "Main Bolt", self.bounds(margin), group, 0)
 		self.make_beziers()
 		vectors = self.draw_beziers_path()
 		pdb.gimp_drawable_edit_stroke_item(layer, vectors)
@@ -133,10 +198,13 @@ class LightningPath(object):
 	pass
 
 	def draw_beziers_lighting(self, group):
+		if self.raster:
+			return self.draw_glow(group)
+
 		pdb.gimp_progress_set_text("Drawing main bolt (lighting) ...")
 		pdb.gimp_image_undo_freeze(self.image)
 
-		layerc = self.draw_beziers(group)
+		layerc = self.draw_beziers(group, GLOW_LAYERS[-1][0])		# room for the widest blur
 
 		layer1 = pdb.gimp_layer_copy(layerc, True)
 		layer2 = pdb.gimp_layer_copy(layerc, True)
@@ -159,9 +227,9 @@ class LightningPath(object):
 		pdb.gimp_drawable_brightness_contrast(layer4, -0.3, 0)
 
 		layer1.mode = LAYER_MODE_HARDLIGHT
-		layer = pdb.gimp_image_merge_down(self.image, layer1, CLIP_TO_IMAGE)
-		layer = pdb.gimp_image_merge_down(self.image, layer, CLIP_TO_IMAGE)
-		layer = pdb.gimp_image_merge_down(self.image, layer, CLIP_TO_IMAGE)
+		layer = pdb.gimp_image_merge_down(self.image, layer1, EXPAND_AS_NECESSARY)
+		layer = pdb.gimp_image_merge_down(self.image, layer, EXPAND_AS_NECESSARY)
+		layer = pdb.gimp_image_merge_down(self.image, layer, EXPAND_AS_NECESSARY)
 		layer.name = "Main Bolt (Underlay)"
 		
 		# take our now single lighting layer and do some more blurry things to it
@@ -171,6 +239,11 @@ class LightningPath(object):
 
 		pdb.gimp_image_insert_layer(self.image, layer2, group, 2)
 		pdb.gimp_image_insert_layer(self.image, layer3, group, 3)
+
+		# these get zoomed out towards the start of the bolt and pinched around the middle of the layer, so they need
+		# to be the whole image to come out the same
+		pdb.gimp_layer_resize_to_image_size(layer2)
+		pdb.gimp_layer_resize_to_image_size(layer3)
 		
 		pdb.plug_in_mblur(self.image, layer2, 2, 100, 90, self.start.x, self.start.y)
 		pdb.plug_in_mblur(self.image, layer3, 2, 250, 90, self.start.x, self.start.y)
@@ -184,49 +257,183 @@ class LightningPath(object):
 		pdb.gimp_drawable_brightness_contrast(layer3, -0.5, 0)
 		pdb.gimp_drawable_brightness_contrast(layer3, -0.2, 0) # yes, you need to repeat b/c adjustments if you want to change a layer that much
 		
-		layer2 = pdb.gimp_image_merge_down(self.image, layer2, CLIP_TO_IMAGE)
+		layer2 = pdb.gimp_image_merge_down(self.image, layer2, EXPAND_AS_NECESSARY)
 		layer2.name = "Main Bolt (Underlay 2)"
 		layer2.opacity = 40.0
 
 		pdb.gimp_image_undo_thaw(self.image)
 
-		return layer
+		return layer, layer2
+	pass
+
+	''' the same glow as above, but worked out here in one go - over just the area it can reach, each blur carrying on
+	    from the last one, and the two underlays handed to gimp as finished layers '''
+	def draw_glow(self, group):
+		pdb.gimp_progress_set_text("Drawing main bolt (lighting) ...")
+		self.set_brush()
+		left, top, width, height = self.bounds(GLOW_LAYERS[-1][0])
+
+		color = pdb.gimp_context_get_foreground()
+		raster = Raster(width, height, left, top)
+		raster.draw_polyline(self.path, color, self.brush_size)
+
+		# every layer is the one color until it's merged, so only the coverage needs blurring - and a blur of a then a
+		# blur of b is a blur of sqrt(a^2 + b^2), so each layer only needs what the last one didn't do
+		masks, colors, mask, blurred = [], [], raster.pixels[:,:,3], 0
+		for radius, brightness, contrast in GLOW_LAYERS:
+			mask = Raster.gaussian(mask, math.sqrt(radius * radius - blurred * blurred))
+			blurred = radius
+			masks.append(mask)
+			colors.append(brightness_contrast_colors(numpy.array(to_rgb(color)), brightness, contrast))
+
+		underlay = Raster(raster.width, raster.height, left, top)
+		underlay.merge_colors(masks, colors, [LAYER_MODE_HARDLIGHT] + [LAYER_MODE_NORMAL] * (len(masks) - 2))
+		pdb.gimp_progress_update(0.5)
+
+		# zoom blurred towards the start of the bolt, then bulged out from the middle of the image - both of which only
+		# move pixels about, so each point of the coarse grid just looks up where its pixels end up coming from. gimp
+		# zooms the 8 bit underlay, where the faintest edges of the blur have already rounded away to nothing, and
+		# those would otherwise add up along the longest zoom lines
+		underlay.pixels[underlay.pixels[:,:,3] < TRANSPARENT] = 0
+		width, height = self.image.width, self.image.height
+		columns, rows = int(math.ceil(width / float(GLOW_STEP))), int(math.ceil(height / float(GLOW_STEP)))
+		x, y = pinch_map(((numpy.arange(columns) + 0.5) * GLOW_STEP)[numpy.newaxis,:], ((numpy.arange(rows) + 0.5) * GLOW_STEP)[:,numpy.newaxis], width, height, *GLOW_PINCH)
+		coarse = underlay.scaled_down(GLOW_STEP)
+
+		zooms = []
+		for length, adjustments in GLOW_ZOOMS:
+			zoom = Raster(columns, rows)
+			zoom.pixels[:] = coarse.zoom_blur_at(x / GLOW_STEP, y / GLOW_STEP, self.start.x / GLOW_STEP, self.start.y / GLOW_STEP, length)
+			for brightness, contrast in adjustments:
+				zoom.brightness_contrast(brightness, contrast)
+			zooms.append(zoom)
+		zooms[1].merge(zooms[0])
+		underlay2 = zooms[1].scaled_up(GLOW_STEP, width, height)
+
+		layer = underlay.to_layer(self.image, "Main Bolt (Underlay)", group, 1)
+		if underlay2 is not None:
+			underlay2 = underlay2.to_layer(self.image, "Main Bolt (Underlay 2)", group, 2, opacity=40.0)
+		pdb.gimp_progress_update(1.0)
+		return layer, underlay2
 	pass
 
 
-	''' paint the plain x,y coords as a gradient pixel by pixel - looks better than a solid stroke but takes longer '''
-	def draw_path(self, group):
+	''' paint the plain x,y coords so they fade out along the path - looks better than a solid stroke '''
+	def draw_path(self, group, style=SIDE_BOLT_FADED, margin=0):
 		pdb.gimp_progress_set_text("Drawing child strokes ...")
+		if self.raster:
+			return self.draw_raster(group, "Side Bolt", fade=True, margin=margin)
+
 		pdb.gimp_image_undo_freeze(self.image)
 
-		layer = pdb.gimp_layer_new(self.image, self.image.width, self.image.height, RGBA_IMAGE, "Side Bolt", 100.00, LAYER_MODE_NORMAL)
-		pdb.gimp_image_insert_layer(self.image, layer, group, 0)
 		self.set_brush()
+		layer = new_layer(self.image, "Side Bolt", self.bounds(margin), group, 0)
+
+		if style == SIDE_BOLT_PIXELS:
+			self.draw_path_pixels(layer)
+		else:
+			self.draw_path_faded(layer)
+
+		pdb.gimp_image_undo_thaw(self.image)
+
+		return layer
+	pass
+
+	''' one stroke along the whole path, then a start (opaque) to end (transparent) gradient mask - the path only wiggles
+	    sideways of the start->end line, so this is the same fade as painting each pixel with a lower opacity; all of
+	    which wants coords on the layer rather than the image '''
+	def draw_path_faded(self, layer):
+		pdb.gimp_context_push()
+		pdb.gimp_context_set_opacity(100)
+
+		x, y = layer.offsets
+		coords = layer_coords(self.path.flat(), x, y)
+		if len(coords) >= 2:
+			pdb.gimp_paintbrush(layer, 0, len(coords), coords, PAINT_CONSTANT, 0)
+		pdb.gimp_progress_update(0.5)
+
+		pdb.gimp_context_set_foreground((255,255,255))
+		pdb.gimp_context_set_background((0,0,0))
+		pdb.gimp_context_set_gradient_fg_bg_rgb()
+
+		mask = pdb.gimp_layer_create_mask(layer, ADD_MASK_WHITE)
+		pdb.gimp_layer_add_mask(layer, mask)
+		pdb.gimp_drawable_edit_gradient_fill(mask, GRADIENT_LINEAR, 0, False, 1, 0, False, self.start.x - x, self.start.y - y, self.end.x - x, self.end.y - y)
+		pdb.gimp_layer_remove_mask(layer, MASK_APPLY)
+
+		pdb.gimp_context_pop()
+		pdb.gimp_progress_update(1.0)
+	pass
 
+	''' paint the plain x,y coords as a gradient pixel by pixel - slow, but kept as a fallback '''
+	def draw_path_pixels(self, layer):
+		x, y = layer.offsets
 		for index, item in enumerate(self.path):
 			percent = float(index)/float(self.length)
 			pdb.gimp_context_set_opacity((1 - percent) * 100)
-			pdb.gimp_paintbrush(layer, 0, 2, (item.x,item.y), PAINT_CONSTANT, 0)
+			pdb.gimp_paintbrush(layer, 0, 2, (item.x - x,item.y - y), PAINT_CONSTANT, 0)
 			#pdb.gimp_paintbrush(layer, 0, 2, (item.x,item.y), PAINT_CONSTANT, 0)
 			#pdb.gimp_paintbrush(layer, 0, 2, (item.x,item.y), PAINT_CONSTANT, 0)
 			pdb.gimp_progress_update(percent)
+	pass
 
-		pdb.gimp_image_undo_thaw(self.image)
 
-		return layer
+
+
+''' with compact layers on, every bolt's layers get merged into one layer per kind as soon as they're drawn - so a big
+    run ends up with a handful of layers rather than dozens of image sized ones; with it off, nothing changes '''
+class CompactLayers(object):
+	def __init__(self, image, compact=True):
+		self.image = image
+		self.compact = compact
+		self.layers = {}		# name: the layer everything of that kind has gone into so far
 	pass
 
+	def add(self, layer, name):
+		if not self.compact or layer is None:
+			return layer
+		if name not in self.layers:
+			layer.name = name
+			self.layers[name] = layer
+			return layer
+
+		# straight on top of the last one, and merged in as a normal, full strength layer - the kind's own mode and
+		# opacity stays on the merged layer (and applies to all of them together)
+		into = self.layers[name]
+		parent = pdb.gimp_item_get_parent(into)
+		position = pdb.gimp_image_get_item_position(self.image, into)
+		if pdb.gimp_item_get_parent(layer) == parent and pdb.gimp_image_get_item_position(self.image, layer) < position:
+			position -= 1			# it's a position in the list once the layer's been taken out
+		pdb.gimp_image_reorder_item(self.image, layer, parent, position)
+		layer.mode = LAYER_MODE_NORMAL
+		layer.opacity = 100.0
+		merged = pdb.gimp_image_merge_down(self.image, layer, EXPAND_AS_NECESSARY)
+		merged.name = name
+		self.layers[name] = merged
+		return merged
+	pass
 
 
 
-def WeatherLightningWrapper(args):
-	
-	image, layer, args = args
 
+''' plots every bolt - everything up to the drawing, which is all pure python (see headless/farm.py for doing lots of these at once);
+    a seed of 0 gets different bolts every time, anything else always gets the same ones, and keeps them in the cache '''
+def WeatherLightningPlot(image, args):
+
+	pdb.gimp_progress_init("Plotting bolts ...", None)
 
-	pdb.gimp_progress_init("Drawing lighting ...", None)
+	seed = int(args['seed'])
+	if seed == 0:
+		return plot_bolts(image, args, random.getrandbits(32))
 
-	#random.seed(seed)
+	key = dict((setting, args[setting]) for setting in GEOMETRY_SETTINGS)
+	key.update(size=(image.width, image.height), version=CACHE_VERSION)
+	return cached_geometry('lightning', key, lambda: plot_bolts(image, args, seed))
+
+
+''' every main bolt, side bolt and octave of noise gets a random number stream of its own, seeded from the one seed - so eg.
+    more side bolts doesn't change the main ones '''
+def plot_bolts(image, args, seed):
 	width = image.width
 	height = image.height
 
@@ -238,35 +445,31 @@ def WeatherLightningWrapper(args):
 	n_side = max(0, min(20, int(args['n_side']))) # and 0-20 side bolts
 
 
+	main_paths = []
 	side_points = []
 
-	group = gimp.GroupLayer(image)
-	group.name = "Lightning"
-	pdb.gimp_image_insert_layer(image, group, None, 0)
-
 	for i in range(n_main):
-		pdb.gimp_progress_set_text("Drawing main bolt(s) ...")
+		rng = random_stream(seed, 'main', i)
+
 		path1 = LightningPath(image, start, mid)
+		path1.rng = rng
 		path1.make_path()
 		path1.rotate_path()
 		
 		if args['move_end_point_a_bit']:
-			end.move_point(width/20, height/20) # 5% wiggle room
+			end.move_point(width/20, height/20, rng) # 5% wiggle room
 
 		path2 = LightningPath(image, mid, end)
+		path2.rng = rng
 		path2.make_path()
 		path2.rotate_path()
 		
 		main_path = path1 + path2
+		main_path.rng = rng
 
-		size_mod = random.choice([120,150,180,200])
+		size_mod = rng.choice([120,150,180,200])
 		main_path.brush_size = int(image.width/size_mod)
-
-		pdb.gimp_context_set_foreground(args['color_bolt'])
-		layer1 = main_path.draw_beziers(group)
-
-		pdb.gimp_context_set_foreground(args['color_lighting'])
-		layer2 = main_path.draw_beziers_lighting(group)
+		main_paths.append(main_path)
 
 		# need to pick points/angles here from each bolt for the side ones
 		for i in range(n_side):
@@ -274,7 +477,7 @@ def WeatherLightningWrapper(args):
 			side_next = main_path.path[j+1]
 
 			angle = side_next.angle_of(side_start)
-			distance = random.randint(int(main_path.length/15), int(main_path.length/3))
+			distance = rng.randint(int(main_path.length/15), int(main_path.length/3))
 
 			#debug.write("{}: {} {} {}\n".format(i, main_path.angle, angle, distance))
 
@@ -285,27 +488,71 @@ def WeatherLightningWrapper(args):
 			side_points.append((side_start, side_end))
 
 
+	random_stream(seed, 'sides').shuffle(side_points)
 
-	pdb.gimp_context_set_foreground(args['color_bolt']) # reset after doing the main bolt lighting
-
-	random.shuffle(side_points)
-
+	side_paths = []
 	for i in range(0, n_side): # still only picking n_side items from a list n_main*n_side long 
 
 		start, end = side_points[i]
 		
 		side_path = LightningPath(image, start, end, 2)
+		side_path.rng = random_stream(seed, 'side', i)
 		side_path.make_path()
 		side_path.rotate_path()
+		side_paths.append(side_path)
+
+	return [(path.geometry(), path.path) for path in main_paths + side_paths]
+
+
+
+def WeatherLightningWrapper(args):
+	
+	image, layer, args = args
+
+	paths = geometry_for(image, args)
+	if paths is None:
+		paths = WeatherLightningPlot(image, args)
+	paths = [LightningPath.from_geometry(image, details, points) for details, points in paths]
 
-		layer1 = side_path.draw_path(group)
+	raster = use_raster(args['renderer'])
+	for path in paths:
+		path.raster = raster
+
+	group = gimp.GroupLayer(image)
+	group.name = "Lightning"
+	pdb.gimp_image_insert_layer(image, group, None, 0)
+
+	layers = CompactLayers(image, args['compact_layers'])
+
+	for main_path in [path for path in paths if path.depth == 1]:
+		pdb.gimp_progress_set_text("Drawing main bolt(s) ...")
+
+		pdb.gimp_context_set_foreground(args['color_bolt'])
+		layer1 = main_path.draw_beziers(group)
+
+		pdb.gimp_context_set_foreground(args['color_lighting'])
+		layer2, layer3 = main_path.draw_beziers_lighting(group)
+
+		layers.add(layer1, "Main Bolts")
+		layers.add(layer2, "Main Bolts (Underlay)")
+		layers.add(layer3, "Main Bolts (Underlay 2)")
+
+
+	pdb.gimp_context_set_foreground(args['color_bolt']) # reset after doing the main bolt lighting
+
+	for side_path in [path for path in paths if path.depth > 1]:
+
+		layer1 = side_path.draw_path(group, args['side_style'], SIDE_GLOW)
 		
 		layer2 = pdb.gimp_layer_copy(layer1, True)
 		layer2.mode = LAYER_MODE_HARDLIGHT
 		pdb.gimp_image_insert_layer(image, layer2, None, 1)
-		pdb.plug_in_gauss(image, layer2, 10,10, 0)
+		pdb.plug_in_gauss(image, layer2, SIDE_GLOW,SIDE_GLOW, 0)
 		pdb.gimp_brightness_contrast(layer2, 0, 123)
 
+		layers.add(layer1, "Side Bolts")
+		layers.add(layer2, "Side Bolts (Glow)")
+
 
 
 
@@ -399,7 +646,30 @@ plugin = PythonFu(
 			'range'		: (0,20),
 			'default'	: 0,
 		},
+		{
+			'variable'	: 'side_style',
+			'label'		: 'Side Bolts Drawn',
+			'tooltip'	: 'A single faded stroke is much quicker; pixel by pixel is the original (slow) way of doing it.',
+			'type'		: DropDown,
+			'options'	: ('As One Faded Stroke', 'Pixel By Pixel'),
+			'default'	: SIDE_BOLT_FADED,
+		},
+		{
+			'variable'	: 'renderer',
+			'label'		: 'Draw With',
+			'tooltip'	: 'GIMP\'s paintbrush and filters, or draw the bolts and the main bolts\' glow here and add them as finished layers (needs NumPy).',
+			'type'		: DropDown,
+			'options'	: RENDERERS,
+			'default'	: DRAW_WITH_GIMP,
+		},
 
+		{
+			'variable'	: 'compact_layers',
+			'label'		: 'Compact layers',
+			'tooltip'	: 'Merge the bolts into one layer of each kind as they\'re drawn - far fewer layers (and a much smaller XCF) for lots of bolts, but they can\'t be tweaked one by one afterwards.',
+			'type'		: Toggle,
+			'default'	: False,
+		},
 		{
 			'variable'	: 'move_end_point_a_bit',
 			'label'		: 'Randomize end point',
@@ -410,7 +680,7 @@ plugin = PythonFu(
 		{
 			'variable'	: 'seed',
 			'label'		: 'Random Seed',
-			'tooltip'	: '',
+			'tooltip'	: 'The same seed always draws the same bolts (and only has to work them out once); 0 draws different ones every time.',
 			'type'		: IntEntry,
 			'default'	: 0,
 		},
@@ -433,7 +703,8 @@ plugin = PythonFu(
 	help_text = {
 		'label' : ('Draws a bolt of lightning.'),
 	},
-	code_function = WeatherLightningWrapper
+	code_function = WeatherLightningWrapper,
+	plot_function = WeatherLightningPlot
 )
 
 plugin.main()